@@ -1,181 +1,363 @@
 import os
-import requests
+import asyncio
 import json
-import re
-from typing import Dict, List, Optional
+import math
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Type
 from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError
+
+from .cache import ResultCache, make_cache_key
+from .chunking import select_spread, split_into_chunks, stable_size
+from .context_budget import ContextBudget
+from .http_client import DEFAULT_LLM_API_URL, LLMHTTPClient, aclosing, is_local_url
+from .metrics import CACHE_LOOKUPS, FALLBACKS, STAGE_LATENCY, UPSTREAM_TOKENS
+from .models import Flashcard, QuizQuestion, SummaryContent
+from .prompts import Prompt, PromptCachePolicy, TokenUsage, cached_tokens, flashcard_prompt, quiz_prompt, section_summary_prompt, summary_prompt, topics_prompt
+from .questions import dedupe_questions
+from .routing import ModelRouter, Route
+from .response_parser import StreamingArrayParser, StreamingStringField, parse_items, parse_model, strip_reasoning
+from .scheduler import UpstreamOverloaded, UpstreamScheduler
+from .singleflight import SingleFlight
 
 # Load environment variables
 load_dotenv()
 
+# Output reserved out of the context window for each task (tokens)
+SUMMARY_OUTPUT_TOKENS = 1500
+QUIZ_TOKENS_PER_QUESTION = 150
+FLASHCARD_TOKENS_PER_CARD = 80
+TOPICS_OUTPUT_TOKENS = 100
+# Instructions and JSON template around the document text (tokens)
+PROMPT_TOKENS = 600
+# Topic extraction only needs a representative sample of the document
+TOPICS_MAX_INPUT_TOKENS = 1500
+
 class QuizForgeAI:
-    def __init__(self):
+    def __init__(self, http_client: Optional[LLMHTTPClient] = None, cache: Optional[ResultCache] = None, scheduler: Optional[UpstreamScheduler] = None, router: Optional[ModelRouter] = None):
+        # LLM_API_URL lets the upstream be swapped for a local stub server
+        self.url = os.getenv('LLM_API_URL', DEFAULT_LLM_API_URL)
         self.api_key = os.getenv('API_KEY')
-        if not self.api_key:
+        if not self.api_key and not is_local_url(self.url):
             raise ValueError("API_KEY environment variable is required")
         
-        self.url = "https://openrouter.ai/api/v1/chat/completions"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        self.base_system_message = "You are QuizForge AI, an expert educational assistant specialized in creating summaries and quizzes from academic content. Always provide accurate, well-structured responses."
+        self.http = http_client or LLMHTTPClient.from_env()
+        self.cache = cache or ResultCache.from_env()
+        self.inflight = SingleFlight()
+        self.scheduler = scheduler or UpstreamScheduler.from_env()
+        self.model = os.getenv('LLM_MODEL', 'qwen/qwen3-32b')
+        self.router = router or ModelRouter.from_env(self.model)
+        self.budget = ContextBudget.from_env(self.model)
+        self.summary_chunk_chars = int(os.getenv('SUMMARY_CHUNK_CHARS', '12000'))
+        self.summary_chunk_overlap = int(os.getenv('SUMMARY_CHUNK_OVERLAP', '400'))
+        self.summary_map_concurrency = int(os.getenv('SUMMARY_MAP_CONCURRENCY', '4'))
+        self.quiz_batch_size = int(os.getenv('QUIZ_BATCH_SIZE', '5'))
+        self.quiz_batch_concurrency = int(os.getenv('QUIZ_BATCH_CONCURRENCY', '8'))
+        self.quiz_topup_rounds = int(os.getenv('QUIZ_TOPUP_ROUNDS', '2'))
+        self.flashcard_batch_size = int(os.getenv('FLASHCARD_BATCH_SIZE', '10'))
+        # Output reserved when fitting a document for any task, so summaries, quizzes and flashcards trim it alike
+        self.document_output_tokens = max(SUMMARY_OUTPUT_TOKENS, self.quiz_batch_size * QUIZ_TOKENS_PER_QUESTION, self.flashcard_batch_size * FLASHCARD_TOKENS_PER_CARD)
+        self.headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            self.headers["Authorization"] = f"Bearer {self.api_key}"
+        
+        self.cache_policy = PromptCachePolicy.from_env()
+        self.usage = TokenUsage()
+    
+    async def startup(self):
+        """Open the shared upstream connection pool"""
+        await self.http.start()
+    
+    async def shutdown(self):
+        """Close the shared upstream connection pool"""
+        await self.http.aclose()
+        self.cache.close()
     
-    async def _make_request(self, messages: List[Dict]) -> str:
-        """Make a request to the OpenRouter API"""
-        data = {
-            "model": "qwen/qwen3-32b",
-            "provider": {
-                "only": ["Cerebras"]
-            },
-            "messages": messages
+    async def _cache_lookup(self, cache_key: str, use_cache: bool) -> Optional[Dict]:
+        """Look a generation up in the result cache, counting the outcome per cache kind"""
+        kind = cache_key.split(":", 1)[0]
+        if not use_cache:
+            self.cache.record_bypass()
+            CACHE_LOOKUPS.inc(kind=kind, result="bypass")
+            return None
+        cached = await self.cache.get(cache_key)
+        CACHE_LOOKUPS.inc(kind=kind, result="miss" if cached is None else "hit")
+        return cached
+    
+    async def _cached_generation(self, cache_key: str, use_cache: bool, generate: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Serve a generation from the cache, or run it once for all concurrent identical callers"""
+        cached = await self._cache_lookup(cache_key, use_cache)
+        if cached is not None:
+            return cached
+        return await self.inflight.do(cache_key, generate)
+    
+    async def _fit_text(self, text_content: str, output_tokens: int, max_tokens: Optional[int] = None) -> str:
+        """Shorten text that doesn't fit the context budget to its most informative sentences"""
+        budget = self.budget.input_tokens(output_tokens, PROMPT_TOKENS)
+        if max_tokens is not None:
+            budget = min(budget, max_tokens)
+        if self.budget.estimate(text_content) <= budget:
+            return text_content
+        # Sentence ranking over a whole textbook takes a noticeable fraction of a second
+        return await asyncio.to_thread(self.budget.fit, text_content, output_tokens, PROMPT_TOKENS, max_tokens)
+    
+    async def _prepare(self, kind: str, text_content: str, output_tokens: int, params: Dict) -> Tuple[str, str]:
+        """Fit the input text to the context budget and derive the result cache key from it.
+
+        Every task fits the document to the same shared budget (unless it needs
+        more output room), so calls on one document keep the same prompt prefix.
+        """
+        text_content = await self._fit_text(text_content, max(output_tokens, self.document_output_tokens))
+        return text_content, make_cache_key(kind, text_content, params, self.model)
+    
+    def _request_payload(self, prompt: Prompt, route: Route) -> Dict:
+        return {
+            **route.payload(),
+            "messages": prompt.messages(self.cache_policy.cache_control(route.model))
         }
+    
+    def _record_usage(self, endpoint: str, usage: Optional[Dict]) -> None:
+        if usage:
+            UPSTREAM_TOKENS.inc(usage.get("prompt_tokens") or 0, task=endpoint, type="prompt")
+            UPSTREAM_TOKENS.inc(cached_tokens(usage), task=endpoint, type="cached_prompt")
+            UPSTREAM_TOKENS.inc(usage.get("completion_tokens") or 0, task=endpoint, type="completion")
+            self.usage.record(endpoint, usage)
+    
+    async def _make_request(self, prompt: Prompt, endpoint: str = "default", pool: Optional[str] = None) -> str:
+        """Make a request to the OpenRouter API on the best route of the task's pool, through the upstream scheduler"""
+        def call(route: Route) -> Awaitable[Dict]:
+            data = self._request_payload(prompt, route)
+            return self.scheduler.run(endpoint, lambda: self.http.post_json(self.url, self.headers, data))
         
         try:
-            response = requests.post(self.url, headers=self.headers, json=data)
-            response.raise_for_status()
-            response_data = response.json()
+            with STAGE_LATENCY.time(task=endpoint, stage="upstream"):
+                response_data = await self.router.run(pool or endpoint, call)
+            self._record_usage(endpoint, response_data.get("usage"))
             return response_data["choices"][0]["message"]["content"]
+        except UpstreamOverloaded:
+            raise
         except Exception as e:
             raise Exception(f"API request failed: {str(e)}")
     
-    async def generate_summary(self, text_content: str, summary_type: str, subject: Optional[str] = None) -> Dict:
-        """Generate a summary based on the specified type"""
-        
-        # Truncate content if too long (approximate token limit)
-        max_chars = 15000  # Rough estimate for token limits
-        if len(text_content) > max_chars:
-            text_content = text_content[:max_chars] + "..."
+    async def _stream_request(self, prompt: Prompt, endpoint: str = "default", pool: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream completion text deltas from the OpenRouter API, holding a scheduler slot throughout"""
+        # Streams go to the best route but can't be hedged or failed over once output has started
+        route = self.router.candidates(pool or endpoint)[0]
+        data = self._request_payload(prompt, route)
+        data["stream"] = True
+        # Ask for a final usage chunk so streamed tokens are counted too
+        data["stream_options"] = {"include_usage": True}
+        started = time.perf_counter()
+        first_token = True
         
-        subject_context = f" in the field of {subject}" if subject else ""
+        try:
+            # Partially streamed output can't be replayed, so streams are limited but not retried
+            async with self.scheduler.slot(endpoint), aclosing(self.http.stream_lines(self.url, self.headers, data)) as lines:
+                async for line in lines:
+                    # Server-sent events; comment lines (": ...") are keep-alives
+                    if not line.startswith("data:"):
+                        continue
+                    chunk = line[5:].strip()
+                    if chunk == "[DONE]":
+                        break
+                    event = json.loads(chunk)
+                    if "error" in event:
+                        raise Exception(event["error"].get("message", "upstream error"))
+                    self._record_usage(endpoint, event.get("usage"))
+                    choices = event.get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        if first_token:
+                            first_token = False
+                            STAGE_LATENCY.observe(time.perf_counter() - started, task=endpoint, stage="first_token")
+                        yield delta
+            self.router.record_success(route)
+        except UpstreamOverloaded:
+            raise
+        except Exception as e:
+            self.router.record_failure(route)
+            raise Exception(f"API request failed: {str(e)}")
+        finally:
+            STAGE_LATENCY.observe(time.perf_counter() - started, task=endpoint, stage="upstream")
+    
+    async def generate_summary(self, text_content: str, summary_type: str, subject: Optional[str] = None, use_cache: bool = True, full_document: bool = False, pages: Optional[List[str]] = None) -> Dict:
+        """Generate a summary based on the specified type"""
         
-        if summary_type == "short":
-            prompt = f"""Create a concise summary of the following text{subject_context}. 
-            Keep it to 2-3 paragraphs maximum, focusing on the most important points.
-            
-            Text: {text_content}
-            
-            Provide your response in this JSON format:
-            {{
-                "content": "your summary here",
-                "tags": ["key", "topic", "tags"]
-            }}"""
-        
-        elif summary_type == "bullet_points":
-            prompt = f"""Create a bullet-point summary of the following text{subject_context}.
-            Organize key points into clear, actionable bullet points with sub-points where needed.
-            
-            Text: {text_content}
-            
-            Provide your response in this JSON format:
-            {{
-                "content": "• Main point 1\\n  - Sub-point\\n• Main point 2\\n  - Sub-point",
-                "tags": ["key", "topic", "tags"]
-            }}"""
-        
-        elif summary_type == "detailed":
-            prompt = f"""Create a comprehensive, detailed summary of the following text{subject_context}.
-            Include all major concepts, methodologies, findings, and conclusions.
-            Organize into clear sections with headings.
+        # Shorten content that doesn't fit the model's context
+        if full_document and not self.budget.fits(text_content, SUMMARY_OUTPUT_TOKENS, PROMPT_TOKENS):
+            return await self._map_reduce_summary(text_content, summary_type, subject, use_cache, pages=pages)
+        text_content, cache_key = await self._prepare("summary", text_content, SUMMARY_OUTPUT_TOKENS, {"summary_type": summary_type, "subject": subject})
+        return await self._cached_generation(
+            cache_key, use_cache,
+            lambda: self._summary_from_llm(text_content, summary_type, subject, cache_key)
+        )
+    
+    async def _summary_from_llm(self, text_content: str, summary_type: str, subject: Optional[str], cache_key: str) -> Dict:
+        """Prompt the LLM for a summary and cache it when the response parses"""
+        with STAGE_LATENCY.time(task="summary", stage="prompt"):
+            prompt = summary_prompt(text_content, summary_type, subject)
+        response = await self._make_request(prompt, "summary", "summary_short" if summary_type == "short" else "summary")
+        
+        with STAGE_LATENCY.time(task="summary", stage="parse"):
+            summary = parse_model(response, SummaryContent)
+        if summary is not None:
+            await self.cache.set(cache_key, summary)
+            return summary
+        # Fallback if JSON parsing fails
+        FALLBACKS.inc(task="summary")
+        return {
+            "content": strip_reasoning(response).strip(),
+            "tags": ["general", "summary"]
+        }
+    
+    async def _map_reduce_summary(self, text_content: str, summary_type: str, subject: Optional[str], use_cache: bool, depth: int = 0, pages: Optional[List[str]] = None) -> Dict:
+        """Summarize every chunk of a long document concurrently, then merge the partial summaries"""
+        chunks = split_into_chunks(text_content, self.summary_chunk_chars, self.summary_chunk_overlap, pages=pages)
+        semaphore = asyncio.Semaphore(self.summary_map_concurrency)
+        
+        async def summarize_chunk(index: int, chunk: str) -> Dict:
+            # Keyed on the chunk alone so re-runs only reprocess chunks that changed
+            cache_key = make_cache_key("summary_chunk", chunk, {"subject": subject}, self.model)
             
-            Text: {text_content}
+            async def generate() -> Dict:
+                async with semaphore:
+                    return await self._chunk_summary_from_llm(chunk, index, len(chunks), subject, cache_key)
             
-            Provide your response in this JSON format:
-            {{
-                "content": "your detailed summary with sections and headings",
-                "tags": ["key", "topic", "tags"]
-            }}"""
-        
-        messages = [
-            {"role": "system", "content": self.base_system_message},
-            {"role": "user", "content": prompt}
-        ]
-        
-        response = await self._make_request(messages)
+            return await self._cached_generation(cache_key, use_cache, generate)
+        
+        partials = await asyncio.gather(*(summarize_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+        combined = "\n\n".join(
+            f"Section {i + 1} summary:\n{partial['content']}" for i, partial in enumerate(partials)
+        )
+        
+        # Very long documents can produce more partial text than one reduce call
+        # takes; summarize the summaries again before the final merge
+        if not self.budget.fits(combined, SUMMARY_OUTPUT_TOKENS, PROMPT_TOKENS) and depth < 2:
+            return await self._map_reduce_summary(combined, summary_type, subject, use_cache, depth + 1)
+        
+        summary = dict(await self.generate_summary(combined, summary_type, subject, use_cache=use_cache))
+        chunk_tags = [tag for partial in partials for tag in partial.get("tags", [])]
+        summary["tags"] = list(dict.fromkeys(summary.get("tags", []) + chunk_tags))[:10]
+        return summary
+    
+    async def _chunk_summary_from_llm(self, chunk: str, index: int, total: int, subject: Optional[str], cache_key: str) -> Dict:
+        """Summarize one section of a long document for the map step"""
+        prompt = section_summary_prompt(chunk, index, total, subject)
+        response = await self._make_request(prompt, "summary")
+        
+        with STAGE_LATENCY.time(task="summary_chunk", stage="parse"):
+            summary = parse_model(response, SummaryContent)
+        if summary is not None:
+            await self.cache.set(cache_key, summary)
+            return summary
+        FALLBACKS.inc(task="summary_chunk")
+        return {"content": strip_reasoning(response).strip(), "tags": []}
+    
+    async def generate_quiz(self, text_content: str, num_questions: int, subject: str, difficulty: str, use_cache: bool = True, pages: Optional[List[str]] = None) -> Dict:
+        """Generate a quiz based on the text content"""
         
-        try:
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
-                # Fallback if JSON parsing fails
-                return {
-                    "content": response,
-                    "tags": ["general", "summary"]
-                }
-        except json.JSONDecodeError:
+        if num_questions > self.quiz_batch_size:
+            # Keyed on the full text: batches draw questions from the whole document
+            cache_key = make_cache_key("quiz_batched", text_content, {"num_questions": num_questions, "subject": subject, "difficulty": difficulty}, self.model)
+            return await self._cached_generation(
+                cache_key, use_cache,
+                lambda: self._batched_quiz(text_content, num_questions, subject, difficulty, use_cache, pages, cache_key)
+            )
+        
+        # Shorten content that doesn't fit the model's context
+        text_content, cache_key = await self._prepare("quiz", text_content, num_questions * QUIZ_TOKENS_PER_QUESTION, {"num_questions": num_questions, "subject": subject, "difficulty": difficulty})
+        return await self._cached_generation(
+            cache_key, use_cache,
+            lambda: self._quiz_from_llm(text_content, num_questions, subject, difficulty, cache_key)
+        )
+    
+    async def _quiz_from_llm(self, text_content: str, num_questions: int, subject: str, difficulty: str, cache_key: str) -> Dict:
+        """Prompt the LLM for a quiz and cache it when the response parses"""
+        with STAGE_LATENCY.time(task="quiz", stage="prompt"):
+            prompt = quiz_prompt(text_content, num_questions, subject, difficulty)
+        response = await self._make_request(prompt, "quiz", "quiz_hard" if difficulty == "hard" else "quiz")
+        
+        # Validate and limit questions to requested number
+        with STAGE_LATENCY.time(task="quiz", stage="parse"):
+            questions = parse_items(response, "questions", QuizQuestion, num_questions)
+        if questions:
+            quiz_data = {"questions": questions}
+            await self.cache.set(cache_key, quiz_data)
+            return quiz_data
+        else:
+            # Fallback: create a simple question if parsing fails
+            FALLBACKS.inc(task="quiz")
             return {
-                "content": response,
-                "tags": ["general", "summary"]
+                "questions": [{
+                    "question": "Based on the content provided, what was the main topic discussed?",
+                    "options": ["Topic A", "Topic B", "Topic C", "Topic D"],
+                    "correct_answer": "Topic A",
+                    "explanation": "This question requires manual review as AI parsing failed."
+                }]
             }
     
-    async def generate_quiz(self, text_content: str, num_questions: int, subject: str, difficulty: str) -> Dict:
-        """Generate a quiz based on the text content"""
-        
-        # Truncate content if too long
-        max_chars = 12000  # Leave room for the prompt
-        if len(text_content) > max_chars:
-            text_content = text_content[:max_chars] + "..."
-        
-        difficulty_instructions = {
-            "easy": "Focus on basic concepts, definitions, and straightforward facts. Avoid complex reasoning.",
-            "medium": "Include some analysis and application questions. Mix factual and conceptual questions.",
-            "hard": "Focus on critical thinking, analysis, synthesis, and complex problem-solving."
-        }
-        
-        prompt = f"""Create a {difficulty} level quiz with {num_questions} multiple-choice questions based on the following {subject} content.
+    def _sections(self, text_content: str, num_batches: int, pages: Optional[List[str]], batch_output_tokens: int) -> List[str]:
+        """Pick one section of the document per batch, spread evenly across it.
 
-        Difficulty level: {difficulty}
-        Instructions: {difficulty_instructions[difficulty]}
-        
-        Content: {text_content}
-        
-        For each question:
-        1. Create a clear, specific question
-        2. Provide 4 answer options (A, B, C, D)
-        3. Mark the correct answer
-        4. Optionally provide a brief explanation
-        
-        Provide your response in this JSON format:
-        {{
-            "questions": [
-                {{
-                    "question": "What is...?",
-                    "options": ["Option A", "Option B", "Option C", "Option D"],
-                    "correct_answer": "Option B",
-                    "explanation": "Brief explanation of why this is correct"
-                }}
-            ]
-        }}
-        
-        Ensure questions are directly based on the provided content and test understanding rather than memorization."""
-        
-        messages = [
-            {"role": "system", "content": self.base_system_message},
-            {"role": "user", "content": prompt}
-        ]
-        
-        response = await self._make_request(messages)
-        
-        try:
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                quiz_data = json.loads(json_match.group())
-                
-                # Validate and limit questions to requested number
-                if "questions" in quiz_data and isinstance(quiz_data["questions"], list):
-                    quiz_data["questions"] = quiz_data["questions"][:num_questions]
-                    return quiz_data
-                else:
-                    raise ValueError("Invalid quiz format")
-            else:
-                raise ValueError("No JSON found in response")
-                
-        except (json.JSONDecodeError, ValueError) as e:
-            # Fallback: create a simple question if parsing fails
+        Section size and choice are kept stable under small edits, so after a
+        re-upload unchanged sections get the same batch cache keys as before.
+        """
+        max_section_chars = self.budget.char_limit(text_content, batch_output_tokens, PROMPT_TOKENS)
+        section_chars = stable_size(min(max_section_chars, max(2000, math.ceil(len(text_content) / num_batches))))
+        chunks = split_into_chunks(text_content, section_chars, 200, pages=pages) or [text_content]
+        return select_spread(chunks, num_batches)
+    
+    async def _batched_quiz(self, text_content: str, num_questions: int, subject: str, difficulty: str, use_cache: bool, pages: Optional[List[str]], cache_key: str) -> Dict:
+        """Fan a large quiz out into concurrent per-section batches, dedupe, and top up shortfalls"""
+        num_batches = math.ceil(num_questions / self.quiz_batch_size)
+        sections = self._sections(text_content, num_batches, pages, self.quiz_batch_size * QUIZ_TOKENS_PER_QUESTION)
+        semaphore = asyncio.Semaphore(self.quiz_batch_concurrency)
+        
+        async def run_batch(section: str, count: int, avoid: List[str], variant: int = 0) -> List[Dict]:
+            batch_key = make_cache_key("quiz_batch", section, {"count": count, "subject": subject, "difficulty": difficulty, "avoid": avoid, "variant": variant}, self.model)
+            
+            async def generate() -> Dict:
+                async with semaphore:
+                    return await self._quiz_batch_from_llm(section, count, subject, difficulty, avoid, variant, batch_key)
+            
+            try:
+                result = await self._cached_generation(batch_key, use_cache, generate)
+            except UpstreamOverloaded:
+                raise
+            except Exception:
+                # One failed batch should not sink the whole quiz; top-up covers it
+                return []
+            return result["questions"]
+        
+        # Short documents yield fewer sections than batches; batches that share
+        # a section get a distinct variant so they are neither coalesced nor
+        # served from the same cache entry
+        counts = [self.quiz_batch_size] * num_batches
+        counts[-1] = num_questions - self.quiz_batch_size * (num_batches - 1)
+        batches = await asyncio.gather(*(
+            run_batch(sections[i % len(sections)], counts[i], [], i // len(sections)) for i in range(num_batches)
+        ))
+        questions = dedupe_questions([question for batch in batches for question in batch])
+        
+        for round_index in range(self.quiz_topup_rounds):
+            missing = num_questions - len(questions)
+            if missing <= 0:
+                break
+            avoid = [question["question"] for question in questions][-30:]
+            topup_batches = math.ceil(missing / self.quiz_batch_size)
+            extra = await asyncio.gather(*(
+                run_batch(
+                    sections[(round_index + 1 + i) % len(sections)],
+                    min(self.quiz_batch_size, missing - i * self.quiz_batch_size),
+                    avoid
+                )
+                for i in range(topup_batches)
+            ))
+            questions = dedupe_questions(questions + [question for batch in extra for question in batch])
+        
+        if not questions:
+            # Fallback: create a simple question if every batch failed
+            FALLBACKS.inc(task="quiz")
             return {
                 "questions": [{
                     "question": "Based on the content provided, what was the main topic discussed?",
@@ -184,97 +366,272 @@ class QuizForgeAI:
                     "explanation": "This question requires manual review as AI parsing failed."
                 }]
             }
+        
+        quiz_data = {"questions": questions[:num_questions]}
+        await self.cache.set(cache_key, quiz_data)
+        return quiz_data
+    
+    async def _quiz_batch_from_llm(self, section: str, count: int, subject: str, difficulty: str, avoid: List[str], variant: int, cache_key: str) -> Dict:
+        """Generate one batch of questions; an unparseable response yields an empty batch"""
+        with STAGE_LATENCY.time(task="quiz_batch", stage="prompt"):
+            prompt = quiz_prompt(section, count, subject, difficulty)
+            if variant:
+                prompt.extend(f"This is question set {variant + 1} for this content. Focus on different concepts and details than the most obvious questions would.")
+            if avoid:
+                prompt.extend("Do not repeat or rephrase any of these existing questions:\n" + "\n".join(f"- {question}" for question in avoid))
+        response = await self._make_request(prompt, "quiz", "quiz_hard" if difficulty == "hard" else "quiz")
+        
+        with STAGE_LATENCY.time(task="quiz_batch", stage="parse"):
+            questions = parse_items(response, "questions", QuizQuestion, count) or []
+        batch = {"questions": questions}
+        if questions:
+            await self.cache.set(cache_key, batch)
+        else:
+            FALLBACKS.inc(task="quiz_batch")
+        return batch
+    
+    async def generate_question_pool(self, text_content: str, num_questions: int, subject: str, difficulty: str, pages: Optional[List[str]] = None, avoid: Optional[List[str]] = None, variant: int = 0) -> List[Tuple[str, Dict]]:
+        """(section, question) pairs for a question bank, drawn from sections spread across the document.
+        
+        Unlike a quiz, there is no dedupe or top-up here; the bank does both
+        against everything it already holds.
+        """
+        num_batches = math.ceil(num_questions / self.quiz_batch_size)
+        sections = self._sections(text_content, num_batches, pages, self.quiz_batch_size * QUIZ_TOKENS_PER_QUESTION)
+        semaphore = asyncio.Semaphore(self.quiz_batch_concurrency)
+        avoid = (avoid or [])[-30:]
+        
+        async def run_batch(section: str, count: int, batch_variant: int) -> List[Tuple[str, Dict]]:
+            batch_key = make_cache_key("quiz_batch", section, {"count": count, "subject": subject, "difficulty": difficulty, "avoid": avoid, "variant": batch_variant}, self.model)
+            
+            async def generate() -> Dict:
+                async with semaphore:
+                    return await self._quiz_batch_from_llm(section, count, subject, difficulty, avoid, batch_variant, batch_key)
+            
+            try:
+                result = await self._cached_generation(batch_key, True, generate)
+            except UpstreamOverloaded:
+                raise
+            except Exception:
+                return []
+            return [(section, question) for question in result["questions"]]
+        
+        counts = [self.quiz_batch_size] * num_batches
+        counts[-1] = num_questions - self.quiz_batch_size * (num_batches - 1)
+        batches = await asyncio.gather(*(
+            run_batch(sections[i % len(sections)], counts[i], variant + i // len(sections)) for i in range(num_batches)
+        ))
+        return [pair for batch in batches for pair in batch]
     
     async def extract_key_topics(self, text_content: str) -> List[str]:
         """Extract key topics from text content for tagging"""
-        prompt = f"""Analyze the following text and extract 5-8 key topics or themes.
-        Return only the topics as a comma-separated list.
-        
-        Text: {text_content[:5000]}...
-        
-        Topics:"""
-        
-        messages = [
-            {"role": "system", "content": self.base_system_message},
-            {"role": "user", "content": prompt}
-        ]
+        sample = await self._fit_text(text_content, TOPICS_OUTPUT_TOKENS, TOPICS_MAX_INPUT_TOKENS)
+        prompt = topics_prompt(sample)
         
         try:
-            response = await self._make_request(messages)
+            response = await self._make_request(prompt, "topics")
             topics = [topic.strip() for topic in response.split(',')]
             return topics[:8]  # Limit to 8 topics
         except:
+            FALLBACKS.inc(task="topics")
             return ["general"]
 
-    async def generate_flashcards(self, text_content: str, num_cards: int, subject: str, card_type: str) -> Dict:
+    async def generate_flashcards(self, text_content: str, num_cards: int, subject: str, card_type: str, use_cache: bool = True, pages: Optional[List[str]] = None) -> Dict:
         """Generate flashcards based on the text content"""
         
-        # Truncate content if too long
-        max_chars = 12000
-        if len(text_content) > max_chars:
-            text_content = text_content[:max_chars] + "..."
-        
-        card_type_instructions = {
-            "definition": "Create cards with terms/concepts on the front and their definitions on the back.",
-            "concept": "Create cards with conceptual questions on the front and explanations on the back.",
-            "fact": "Create cards with factual questions on the front and specific answers on the back.",
-            "mixed": "Create a mix of definitions, concepts, and factual questions."
-        }
-        
-        prompt = f"""Create {num_cards} flashcards based on the following {subject} content.
-
-        Card type: {card_type}
-        Instructions: {card_type_instructions[card_type]}
-        
-        Content: {text_content}
-        
-        For each flashcard:
-        1. Front: Question, term, or concept
-        2. Back: Answer, definition, or explanation
-        3. Keep both sides concise but informative
-        4. Ensure the back fully answers what's on the front
-        
-        Provide your response in this JSON format:
-        {{
-            "flashcards": [
-                {{
-                    "front": "What is photosynthesis?",
-                    "back": "The process by which plants convert light energy into chemical energy",
-                    "category": "Biology"
-                }}
-            ]
-        }}
-        
-        Make sure flashcards are directly based on the provided content and test key concepts."""
-        
-        messages = [
-            {"role": "system", "content": self.base_system_message},
-            {"role": "user", "content": prompt}
-        ]
+        if num_cards > self.flashcard_batch_size:
+            cache_key = make_cache_key("flashcards_batched", text_content, {"num_cards": num_cards, "subject": subject, "card_type": card_type}, self.model)
+            return await self._cached_generation(
+                cache_key, use_cache,
+                lambda: self._batched_flashcards(text_content, num_cards, subject, card_type, use_cache, pages, cache_key)
+            )
         
-        response = await self._make_request(messages)
-        
-        try:
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                flashcard_data = json.loads(json_match.group())
-                
-                # Validate and limit flashcards to requested number
-                if "flashcards" in flashcard_data and isinstance(flashcard_data["flashcards"], list):
-                    flashcard_data["flashcards"] = flashcard_data["flashcards"][:num_cards]
-                    return flashcard_data
-                else:
-                    raise ValueError("Invalid flashcard format")
-            else:
-                raise ValueError("No JSON found in response")
-                
-        except (json.JSONDecodeError, ValueError) as e:
+        # Truncate content if too long
+        text_content, cache_key = await self._prepare("flashcards", text_content, num_cards * FLASHCARD_TOKENS_PER_CARD, {"num_cards": num_cards, "subject": subject, "card_type": card_type})
+        return await self._cached_generation(
+            cache_key, use_cache,
+            lambda: self._flashcards_from_llm(text_content, num_cards, subject, card_type, cache_key)
+        )
+    
+    async def _flashcards_from_llm(self, text_content: str, num_cards: int, subject: str, card_type: str, cache_key: str) -> Dict:
+        """Prompt the LLM for flashcards and cache them when the response parses"""
+        with STAGE_LATENCY.time(task="flashcards", stage="prompt"):
+            prompt = flashcard_prompt(text_content, num_cards, subject, card_type)
+        response = await self._make_request(prompt, "flashcards")
+        
+        # Validate and limit flashcards to requested number
+        with STAGE_LATENCY.time(task="flashcards", stage="parse"):
+            flashcards = parse_items(response, "flashcards", Flashcard, num_cards)
+        if flashcards:
+            flashcard_data = {"flashcards": flashcards}
+            await self.cache.set(cache_key, flashcard_data)
+            return flashcard_data
+        else:
             # Fallback: create a simple flashcard if parsing fails
+            FALLBACKS.inc(task="flashcards")
             return {
                 "flashcards": [{
                     "front": "Main topic",
                     "back": "Based on the content provided, this requires manual review as AI parsing failed.",
                     "category": subject
                 }]
-            } 
\ No newline at end of file
+            }
+    
+    async def _batched_flashcards(self, text_content: str, num_cards: int, subject: str, card_type: str, use_cache: bool, pages: Optional[List[str]], cache_key: str) -> Dict:
+        """Build a large deck from concurrent per-section batches, each cached on its section"""
+        num_batches = math.ceil(num_cards / self.flashcard_batch_size)
+        sections = self._sections(text_content, num_batches, pages, self.flashcard_batch_size * FLASHCARD_TOKENS_PER_CARD)
+        semaphore = asyncio.Semaphore(self.quiz_batch_concurrency)
+        
+        async def run_batch(section: str, count: int, variant: int) -> List[Dict]:
+            batch_key = make_cache_key("flashcard_batch", section, {"count": count, "subject": subject, "card_type": card_type, "variant": variant}, self.model)
+            
+            async def generate() -> Dict:
+                async with semaphore:
+                    return await self._flashcard_batch_from_llm(section, count, subject, card_type, variant, batch_key)
+            
+            try:
+                result = await self._cached_generation(batch_key, use_cache, generate)
+            except UpstreamOverloaded:
+                raise
+            except Exception:
+                return []
+            return result["flashcards"]
+        
+        counts = [self.flashcard_batch_size] * num_batches
+        counts[-1] = num_cards - self.flashcard_batch_size * (num_batches - 1)
+        batches = await asyncio.gather(*(
+            run_batch(sections[i % len(sections)], counts[i], i // len(sections)) for i in range(num_batches)
+        ))
+        # Batches that share a section can repeat a card; keep the first of each front
+        flashcards: List[Dict] = []
+        fronts = set()
+        for card in (card for batch in batches for card in batch):
+            front = " ".join(card["front"].lower().split())
+            if front not in fronts:
+                fronts.add(front)
+                flashcards.append(card)
+        
+        if not flashcards:
+            FALLBACKS.inc(task="flashcards")
+            return {
+                "flashcards": [{
+                    "front": "Main topic",
+                    "back": "Based on the content provided, this requires manual review as AI parsing failed.",
+                    "category": subject
+                }]
+            }
+        
+        flashcard_data = {"flashcards": flashcards[:num_cards]}
+        await self.cache.set(cache_key, flashcard_data)
+        return flashcard_data
+    
+    async def _flashcard_batch_from_llm(self, section: str, count: int, subject: str, card_type: str, variant: int, cache_key: str) -> Dict:
+        """Generate one batch of flashcards; an unparseable response yields an empty batch"""
+        with STAGE_LATENCY.time(task="flashcard_batch", stage="prompt"):
+            prompt = flashcard_prompt(section, count, subject, card_type)
+            if variant:
+                prompt.extend(f"This is card set {variant + 1} for this content. Cover different concepts and details than the most obvious cards would.")
+        response = await self._make_request(prompt, "flashcards")
+        
+        with STAGE_LATENCY.time(task="flashcard_batch", stage="parse"):
+            flashcards = parse_items(response, "flashcards", Flashcard, count) or []
+        batch = {"flashcards": flashcards}
+        if flashcards:
+            await self.cache.set(cache_key, batch)
+        else:
+            FALLBACKS.inc(task="flashcard_batch")
+        return batch
+    
+    async def stream_summary(self, text_content: str, summary_type: str, subject: Optional[str] = None, use_cache: bool = True) -> AsyncIterator[Dict]:
+        """Stream a summary as {"event": "delta"} events while the model writes it"""
+        text_content, cache_key = await self._prepare("summary", text_content, SUMMARY_OUTPUT_TOKENS, {"summary_type": summary_type, "subject": subject})
+        cached = await self._cache_lookup(cache_key, use_cache)
+        if cached is not None:
+            yield {"event": "delta", "content": cached["content"]}
+            yield {"event": "tags", "tags": cached.get("tags", [])}
+            return
+        
+        field = StreamingStringField("content")
+        parts: List[str] = []
+        raw: List[str] = []
+        pool = "summary_short" if summary_type == "short" else "summary"
+        async with aclosing(self._stream_request(summary_prompt(text_content, summary_type, subject), "summary", pool)) as deltas:
+            async for delta in deltas:
+                raw.append(delta)
+                content = field.feed(delta)
+                if content:
+                    parts.append(content)
+                    yield {"event": "delta", "content": content}
+        
+        response = "".join(raw)
+        tags = ["general", "summary"]
+        summary = parse_model(response, SummaryContent)
+        if summary is not None:
+            tags = summary["tags"]
+            await self.cache.set(cache_key, summary)
+        if not parts:
+            # The model ignored the JSON format; send its raw answer instead
+            FALLBACKS.inc(task="summary")
+            yield {"event": "delta", "content": strip_reasoning(response).strip()}
+        yield {"event": "tags", "tags": tags}
+    
+    async def stream_quiz(self, text_content: str, num_questions: int, subject: str, difficulty: str, use_cache: bool = True) -> AsyncIterator[Dict]:
+        """Stream quiz questions as {"event": "question"} events as soon as each one is complete"""
+        text_content, cache_key = await self._prepare("quiz", text_content, num_questions * QUIZ_TOKENS_PER_QUESTION, {"num_questions": num_questions, "subject": subject, "difficulty": difficulty})
+        fallback = {
+            "question": "Based on the content provided, what was the main topic discussed?",
+            "options": ["Topic A", "Topic B", "Topic C", "Topic D"],
+            "correct_answer": "Topic A",
+            "explanation": "This question requires manual review as AI parsing failed."
+        }
+        prompt = quiz_prompt(text_content, num_questions, subject, difficulty)
+        pool = "quiz_hard" if difficulty == "hard" else "quiz"
+        async with aclosing(self._stream_items("question", "questions", QuizQuestion, num_questions, prompt, cache_key, use_cache, fallback, "quiz", pool)) as events:
+            async for event in events:
+                yield event
+    
+    async def stream_flashcards(self, text_content: str, num_cards: int, subject: str, card_type: str, use_cache: bool = True) -> AsyncIterator[Dict]:
+        """Stream flashcards as {"event": "flashcard"} events as soon as each one is complete"""
+        text_content, cache_key = await self._prepare("flashcards", text_content, num_cards * FLASHCARD_TOKENS_PER_CARD, {"num_cards": num_cards, "subject": subject, "card_type": card_type})
+        fallback = {
+            "front": "Main topic",
+            "back": "Based on the content provided, this requires manual review as AI parsing failed.",
+            "category": subject
+        }
+        prompt = flashcard_prompt(text_content, num_cards, subject, card_type)
+        async with aclosing(self._stream_items("flashcard", "flashcards", Flashcard, num_cards, prompt, cache_key, use_cache, fallback, "flashcards")) as events:
+            async for event in events:
+                yield event
+    
+    async def _stream_items(self, event_name: str, key: str, model: Type[BaseModel], limit: int, prompt: Prompt, cache_key: str, use_cache: bool, fallback: Dict, endpoint: str = "default", pool: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Emit each array item of a streamed JSON completion once it parses and validates"""
+        cached = await self._cache_lookup(cache_key, use_cache)
+        if cached is not None:
+            for index, item in enumerate(cached[key]):
+                yield {"event": event_name, "index": index, "data": item}
+            return
+        
+        parser = StreamingArrayParser(key)
+        items: List[Dict] = []
+        # aclosing releases the upstream response and scheduler slot as soon as we stop reading
+        async with aclosing(self._stream_request(prompt, endpoint, pool)) as deltas:
+            async for delta in deltas:
+                for candidate in parser.feed(delta):
+                    try:
+                        item = model.model_validate(candidate).model_dump()
+                    except ValidationError:
+                        continue
+                    yield {"event": event_name, "index": len(items), "data": item}
+                    items.append(item)
+                    if len(items) >= limit:
+                        break
+                if len(items) >= limit:
+                    # Stop reading (and paying for) tokens past the requested count
+                    break
+        
+        if items:
+            await self.cache.set(cache_key, {key: items})
+        else:
+            FALLBACKS.inc(task=endpoint)
+            yield {"event": event_name, "index": 0, "data": fallback}
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import os
+import time
+import zipfile
+from contextlib import ExitStack
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+from .document_store import DocumentStore
+from .pdf_ingest import PDFIngestor, PDFLimitError, read_upload
+
+
+# One file of a batch: its name and a coroutine function that reads its bytes
+BatchEntry = Tuple[str, Callable[[], Awaitable[bytes]]]
+
+
+def _is_pdf_name(name: str) -> bool:
+    return name.lower().endswith(".pdf")
+
+
+def _zip_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """PDF members of an archive, skipping directories and macOS resource forks"""
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir() and _is_pdf_name(info.filename)
+        and not info.filename.startswith("__MACOSX/") and not os.path.basename(info.filename).startswith("._")
+    ]
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: int) -> bytes:
+    """Read one archive member, stopping past max_bytes whatever its header claims"""
+    if info.file_size > max_bytes:
+        raise PDFLimitError(f"PDF exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+    with archive.open(info) as member:
+        data = member.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise PDFLimitError(f"PDF exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+    return data
+
+
+class BatchUploader:
+    """Ingests many PDFs (or zip archives of PDFs) in one request.
+
+    Files are read only once a slot is free, so at most `concurrency` files
+    are held in memory however many are sent; the rest stay in the upload's
+    spooled temporary files. Each file is extracted whole by one process-pool
+    worker, and files with identical bytes are extracted and stored once.
+    """
+
+    def __init__(self, ingestor: PDFIngestor, store: DocumentStore, concurrency: Optional[int] = None, max_files: int = 500):
+        self.ingestor = ingestor
+        self.store = store
+        self.concurrency = concurrency or ingestor.workers
+        self.max_files = max_files
+        self.counters = {"batches": 0, "files": 0, "duplicates": 0, "failed": 0}
+
+    @classmethod
+    def from_env(cls, ingestor: PDFIngestor, store: DocumentStore) -> "BatchUploader":
+        """Build an uploader from PDF_BATCH_* environment variables"""
+        concurrency = os.getenv("PDF_BATCH_CONCURRENCY")
+        return cls(
+            ingestor,
+            store,
+            concurrency=int(concurrency) if concurrency else None,
+            max_files=int(os.getenv("PDF_BATCH_MAX_FILES", "500")),
+        )
+
+    async def entries(self, files: List[UploadFile], archives: ExitStack) -> Tuple[List[BatchEntry], List[Dict]]:
+        """(entries to ingest, results for files rejected up front) for the uploaded files.
+
+        Zip archives are expanded from their central directory; no member is
+        decompressed until it is ingested, so archives are opened on
+        `archives`, which must stay open until the entries are ingested.
+        """
+        entries: List[BatchEntry] = []
+        rejected: List[Dict] = []
+        max_bytes = self.ingestor.max_bytes
+        for upload in files:
+            name = upload.filename or "upload"
+            if _is_pdf_name(name):
+                entries.append((name, lambda upload=upload: read_upload(upload, max_bytes)))
+            elif name.lower().endswith(".zip"):
+                try:
+                    archive = archives.enter_context(await asyncio.to_thread(zipfile.ZipFile, upload.file))
+                except zipfile.BadZipFile:
+                    rejected.append({"filename": name, "status": "error", "error": "Not a valid zip archive"})
+                    continue
+                for info in _zip_members(archive):
+                    entries.append((
+                        f"{name}/{info.filename}",
+                        lambda archive=archive, info=info: asyncio.to_thread(_read_member, archive, info, max_bytes)
+                    ))
+            else:
+                rejected.append({"filename": name, "status": "error", "error": "Only PDF files and zip archives of PDFs are allowed"})
+        if len(entries) > self.max_files:
+            raise PDFLimitError(f"Batch has {len(entries)} PDFs; the limit is {self.max_files}")
+        self.counters["files"] += len(rejected)
+        self.counters["failed"] += len(rejected)
+        return entries, rejected
+
+    async def ingest(self, entries: List[BatchEntry], include_text: bool = False) -> List[Dict]:
+        """Per-file results, in input order"""
+        slots = asyncio.Semaphore(self.concurrency)
+        first_seen: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+        async def ingest_one(name: str, read: Callable[[], Awaitable[bytes]]) -> Dict:
+            started = time.perf_counter()
+            async with slots:
+                timings = {"wait_ms": (time.perf_counter() - started) * 1000}
+                try:
+                    stage = time.perf_counter()
+                    data = await read()
+                    timings["read_ms"] = (time.perf_counter() - stage) * 1000
+                    stage = time.perf_counter()
+                    digest = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+                    timings["hash_ms"] = (time.perf_counter() - stage) * 1000
+                except Exception as e:
+                    return {"filename": name, "status": "error", "error": str(e)}
+
+                if digest not in first_seen:
+                    outcome = asyncio.get_running_loop().create_future()
+                    first_seen[digest] = (name, outcome)
+                    try:
+                        result = await self.ingestor.ingest_whole(data)
+                        del data
+                        stage = time.perf_counter()
+                        filename = os.path.basename(name)
+                        document_id = await self.store.put(result["text_content"], result["pages"], filename, result["fingerprints"], result["sources"])
+                        timings["store_ms"] = (time.perf_counter() - stage) * 1000
+                    except Exception as e:
+                        outcome.set_result({"error": str(e)})
+                        return {"filename": name, "status": "error", "sha256": digest, "error": str(e)}
+                    text_content = result["text_content"]
+                    summary = {
+                        "document_id": document_id,
+                        "page_count": result["page_count"],
+                        "word_count": len(text_content.split()),
+                    }
+                    outcome.set_result(summary)
+                    timings.update(result["timings"])
+                    timings["total_ms"] = (time.perf_counter() - started) * 1000
+                    return {
+                        "filename": name,
+                        "status": "ok",
+                        "sha256": digest,
+                        **summary,
+                        "text_content": text_content if include_text else None,
+                        "timings": {stage: round(value, 2) for stage, value in timings.items()},
+                    }
+                del data
+
+            # A duplicate gives its slot back before waiting on the original
+            original, outcome = first_seen[digest]
+            summary = await asyncio.shield(outcome)
+            if "error" in summary:
+                return {"filename": name, "status": "error", "sha256": digest, "duplicate_of": original, "error": summary["error"]}
+            timings["total_ms"] = (time.perf_counter() - started) * 1000
+            return {
+                "filename": name,
+                "status": "duplicate",
+                "sha256": digest,
+                "duplicate_of": original,
+                **summary,
+                "text_content": None,
+                "timings": {stage: round(value, 2) for stage, value in timings.items()},
+            }
+
+        results = await asyncio.gather(*(ingest_one(name, read) for name, read in entries))
+        self.counters["batches"] += 1
+        self.counters["files"] += len(results)
+        self.counters["duplicates"] += sum(1 for result in results if result["status"] == "duplicate")
+        self.counters["failed"] += sum(1 for result in results if result["status"] == "error")
+        return results
+
+    def stats(self) -> Dict:
+        return {**self.counters, "concurrency": self.concurrency, "max_files": self.max_files}
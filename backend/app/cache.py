@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def make_cache_key(kind: str, text: str, params: Dict[str, Any], model: str) -> str:
+    """Content-addressed key over the (already truncated) text, parameters and model"""
+    digest = hashlib.sha256()
+    for part in (kind, model, json.dumps(params, sort_keys=True, default=str)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(text.encode("utf-8", errors="surrogatepass"))
+    return f"{kind}:{digest.hexdigest()}"
+
+
+class MemoryCache:
+    """In-memory LRU tier with a TTL and both entry-count and byte-size bounds"""
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024, ttl: float = 86400.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def set(self, key: str, payload: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+        if len(payload) > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, payload)
+        self._bytes += len(payload)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+
+class SQLiteCache:
+    """Optional on-disk tier that survives restarts"""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 7 * 86400.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            " key TEXT PRIMARY KEY, payload TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS result_cache_accessed ON result_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE result_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, payload: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, payload, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, payload, now + self.ttl, now),
+            )
+            # Evict expired rows, then least recently used rows over the bound
+            self._conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM result_cache WHERE key IN ("
+                " SELECT key FROM result_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """Two-tier cache for generated summaries, quizzes and flashcards"""
+
+    def __init__(self, memory: Optional[MemoryCache] = None, disk: Optional[SQLiteCache] = None, enabled: bool = True):
+        self.memory = memory or MemoryCache()
+        self.disk = disk
+        self.enabled = enabled
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.sets = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Build a cache from RESULT_CACHE_* environment variables"""
+        ttl = float(os.getenv("RESULT_CACHE_TTL", "86400"))
+        memory = MemoryCache(
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512")),
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            ttl=ttl,
+        )
+        disk = None
+        path = os.getenv("RESULT_CACHE_PATH")
+        if path:
+            disk = SQLiteCache(
+                path,
+                max_entries=int(os.getenv("RESULT_CACHE_DISK_MAX_ENTRIES", "10000")),
+                ttl=float(os.getenv("RESULT_CACHE_DISK_TTL", str(ttl))),
+            )
+        enabled = os.getenv("RESULT_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+        return cls(memory=memory, disk=disk, enabled=enabled)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Look a result up in memory, then on disk (promoting disk hits)"""
+        if not self.enabled:
+            return None
+        payload = self.memory.get(key)
+        if payload is None and self.disk is not None:
+            payload = await asyncio.to_thread(self.disk.get, key)
+            if payload is not None:
+                self.disk_hits += 1
+                self.memory.set(key, payload)
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Decode on every hit so callers never share a mutable result
+        return json.loads(payload)
+
+    async def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        payload = json.dumps(value, separators=(",", ":"))
+        self.memory.set(key, payload)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, payload)
+        self.sets += 1
+
+    def record_bypass(self) -> None:
+        self.bypasses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "sets": self.sets,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size_bytes,
+            "memory_evictions": self.memory.evictions,
+            "disk_enabled": self.disk is not None,
+        }
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
@@ -0,0 +1,123 @@
+import math
+import re
+import zlib
+from typing import List, Optional, Tuple
+
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_oversized(unit: str, max_chars: int) -> List[str]:
+    """Break a unit longer than max_chars on sentence, then whitespace, boundaries"""
+    pieces: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(unit):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _content_hash(text: str) -> int:
+    return zlib.crc32(" ".join(text.split()).encode("utf-8", errors="surrogatepass"))
+
+
+def _anchor_spacing(units: List[str], budget: int) -> Tuple[int, int]:
+    """(divisor, min_chars): a chunk of at least min_chars may end after a page whose hash is a multiple of divisor.
+
+    The divisor is a power of two, so the small change in average page length
+    that editing a few pages causes doesn't move every chunk boundary. When
+    pages are too long for more than a couple per chunk, min_chars keeps
+    chunks from shrinking to a page each.
+    """
+    average = max(1, sum(len(unit) for unit in units) // max(1, len(units)))
+    divisor = 2 ** max(0, int(math.log2(max(1, budget // (2 * average)))))
+    return divisor, max(budget // 4, budget - (2 * divisor - 1) * average)
+
+
+def stable_size(chars: int) -> int:
+    """Round a chunk size down to a coarse ladder (1000 x powers of sqrt 2) so it survives small edits"""
+    if chars < 1000:
+        return chars
+    return int(1000 * math.sqrt(2) ** math.floor(2 * math.log2(chars / 1000) + 1e-9))
+
+
+def select_spread(chunks: List[str], count: int) -> List[str]:
+    """Pick `count` chunks spread across the document, stably under edits.
+
+    The chunks are cut into `count` equal runs and each run contributes its
+    chunk with the lowest content hash, so a chunk stays picked as long as
+    it (and the cheapest chunk near it) is unchanged.
+    """
+    if len(chunks) <= count:
+        return chunks
+    step = len(chunks) / count
+    return [min(chunks[int(i * step):int((i + 1) * step)], key=_content_hash) for i in range(count)]
+
+
+def _overlap_tail(chunk: str, overlap_chars: int) -> str:
+    """Last ~overlap_chars of a chunk, starting on a word boundary"""
+    if overlap_chars <= 0 or len(chunk) <= overlap_chars:
+        return ""
+    tail = chunk[-overlap_chars:]
+    space = tail.find(" ")
+    return tail[space + 1:] if space != -1 else tail
+
+
+def split_into_chunks(
+    text: str,
+    max_chars: int = 12000,
+    overlap_chars: int = 400,
+    pages: Optional[List[str]] = None,
+) -> List[str]:
+    """Split a document into chunks of at most ~max_chars characters.
+
+    Chunks are packed from whole pages when `pages` is given, otherwise from
+    paragraphs; only units that are too large on their own are split further.
+    Each chunk after the first starts with the tail of the previous one so that
+    content straddling a boundary is seen in context.
+
+    Page chunks past a minimum size also end after any page whose content
+    hash is a multiple of the anchor divisor. Boundaries then depend on the pages
+    themselves rather than on everything before them, so editing a few pages
+    of a document only changes the chunks around those pages and per-chunk
+    results cached for the rest are reused.
+    """
+    units = pages if pages else _PARAGRAPH_BREAK.split(text)
+    units = [unit.strip() for unit in units if unit and unit.strip()]
+    budget = max(1, max_chars - overlap_chars)
+    divisor, min_chars = _anchor_spacing(units, budget) if pages else (0, 0)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_len = 0
+    for unit in units:
+        for piece in (_split_oversized(unit, budget) if len(unit) > budget else [unit]):
+            if current and current_len + 2 + len(piece) > budget:
+                chunks.append("\n\n".join(current))
+                current, current_len = [], 0
+            current.append(piece)
+            current_len += len(piece) + (2 if current_len else 0)
+        if divisor and current_len >= min_chars and _content_hash(unit) % divisor == 0:
+            chunks.append("\n\n".join(current))
+            current, current_len = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+
+    if overlap_chars > 0:
+        for i in range(len(chunks) - 1, 0, -1):
+            tail = _overlap_tail(chunks[i - 1], overlap_chars)
+            if tail:
+                chunks[i] = f"{tail}\n\n{chunks[i]}"
+    return chunks
@@ -0,0 +1,194 @@
+import heapq
+import math
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from .questions import STOPWORDS
+
+
+# Context windows (tokens) of the models QuizForge is run with; LLM_CONTEXT_WINDOW overrides
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "qwen/qwen3-32b": 32768,
+    "qwen/qwen3-235b-a22b": 32768,
+    "meta-llama/llama-3.3-70b-instruct": 131072,
+    "meta-llama/llama-3.1-8b-instruct": 131072,
+    "openai/gpt-oss-120b": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 32768
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?。！？])\s+|\n\s*\n")
+_LINE_BREAK = re.compile(r"\n+")
+_TERM = re.compile(r"\w+")
+
+# Sentences longer than this (tables, run-on PDF text) are split on line breaks
+_MAX_SENTENCE_CHARS = 1500
+
+# Weight kept by a term once a selected sentence already covers it
+_COVERED_DECAY = 0.3
+
+# A re-scored sentence within this factor of the best stale score is taken without
+# re-queueing; exact lazy greedy re-scores far more often for little gain
+_GREEDY_TOLERANCE = 0.9
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0, non_ascii_bytes_per_token: float = 3.0) -> int:
+    """Calibrated token estimate: ASCII text at ~4 chars/token, other scripts by UTF-8 bytes.
+
+    BPE vocabularies spend far more tokens per character on CJK, Cyrillic or
+    accented text than on English, so counting characters alone underestimates
+    dense non-English input.
+    """
+    if text.isascii():
+        return math.ceil(len(text) / chars_per_token)
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    non_ascii_bytes = len(text.encode("utf-8", "surrogatepass")) - ascii_chars
+    return math.ceil(ascii_chars / chars_per_token + non_ascii_bytes / non_ascii_bytes_per_token)
+
+
+def context_window_for(model: str) -> int:
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for piece in _SENTENCE_BREAK.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if len(piece) > _MAX_SENTENCE_CHARS:
+            sentences.extend(line.strip() for line in _LINE_BREAK.split(piece) if line.strip())
+        else:
+            sentences.append(piece)
+    return sentences
+
+
+def select_sentences(sentences: List[str], max_tokens: int, estimate: Callable[[str], int] = estimate_tokens) -> List[int]:
+    """Indices (in document order) of the most informative sentences that fit in max_tokens.
+
+    Sentences are scored by the TF-IDF weight of their content terms, normalized
+    by length. Selection is greedy by score per token; once a term is covered its
+    weight decays, so later picks favour concepts not yet included. Scores only
+    ever decrease, which allows lazy re-scoring from a heap.
+    """
+    terms = [
+        {term for term in _TERM.findall(sentence.lower()) if term not in STOPWORDS and len(term) > 1}
+        for sentence in sentences
+    ]
+    document_frequency: Counter = Counter()
+    for sentence_terms in terms:
+        document_frequency.update(sentence_terms)
+    total = len(sentences)
+    # Terms that recur across the document matter more; ubiquitous ones matter less
+    weights = {
+        term: math.log1p(count) * math.log(1 + total / count)
+        for term, count in document_frequency.items()
+    }
+    costs = [max(1, estimate(sentence)) for sentence in sentences]
+    norms = [1 / math.sqrt((len(sentence_terms) + 1) * cost) for sentence_terms, cost in zip(terms, costs)]
+
+    def priority(index: int) -> float:
+        return sum(map(weights.__getitem__, terms[index])) * norms[index]
+
+    heap = [(-priority(index), index) for index in range(total) if terms[index]]
+    heapq.heapify(heap)
+    selected: List[int] = []
+    remaining = max_tokens
+    while heap and remaining > 0:
+        _, index = heapq.heappop(heap)
+        if costs[index] > remaining:
+            continue
+        current = priority(index)
+        if heap and -current > heap[0][0] * _GREEDY_TOLERANCE:
+            # Another sentence may now beat this one; re-queue with its real score
+            heapq.heappush(heap, (-current, index))
+            continue
+        selected.append(index)
+        remaining -= costs[index]
+        for term in terms[index]:
+            weights[term] *= _COVERED_DECAY
+    return sorted(selected)
+
+
+def extract_to_budget(text: str, max_tokens: int, estimate: Callable[[str], int] = estimate_tokens) -> str:
+    """Shorten text to about max_tokens by keeping whole, high-information sentences in order"""
+    if estimate(text) <= max_tokens:
+        return text
+    sentences = split_sentences(text)
+    selected = select_sentences(sentences, max_tokens, estimate)
+    parts: List[str] = []
+    previous = None
+    for index in selected:
+        if parts and index != previous + 1:
+            # Mark the omitted stretch so the model doesn't read across it as continuous text
+            parts.append("\n\n")
+        elif parts:
+            parts.append(" ")
+        parts.append(sentences[index])
+        previous = index
+    return "".join(parts)
+
+
+class ContextBudget:
+    """Decides how much document text fits in one request to the model.
+
+    The input budget is the model's context window minus the prompt template,
+    the expected output, a reasoning allowance (qwen3 emits a <think> block
+    before answering) and a safety margin for estimate error.
+    """
+
+    def __init__(
+        self,
+        context_window: int = DEFAULT_CONTEXT_WINDOW,
+        max_input_tokens: Optional[int] = None,
+        reasoning_reserve: int = 2048,
+        safety_margin: float = 0.1,
+        chars_per_token: float = 4.0,
+        non_ascii_bytes_per_token: float = 3.0,
+    ):
+        self.context_window = context_window
+        self.max_input_tokens = max_input_tokens
+        self.reasoning_reserve = reasoning_reserve
+        self.safety_margin = safety_margin
+        self.chars_per_token = chars_per_token
+        self.non_ascii_bytes_per_token = non_ascii_bytes_per_token
+
+    @classmethod
+    def from_env(cls, model: str) -> "ContextBudget":
+        """Build a budget for `model` from LLM_* / TOKEN_* environment variables"""
+        max_input = os.getenv("LLM_MAX_INPUT_TOKENS")
+        return cls(
+            context_window=int(os.getenv("LLM_CONTEXT_WINDOW", str(context_window_for(model)))),
+            max_input_tokens=int(max_input) if max_input else None,
+            reasoning_reserve=int(os.getenv("LLM_REASONING_RESERVE", "2048")),
+            safety_margin=float(os.getenv("TOKEN_SAFETY_MARGIN", "0.1")),
+            chars_per_token=float(os.getenv("TOKEN_CHARS_PER_TOKEN", "4.0")),
+            non_ascii_bytes_per_token=float(os.getenv("TOKEN_NON_ASCII_BYTES_PER_TOKEN", "3.0")),
+        )
+
+    def estimate(self, text: str) -> int:
+        return estimate_tokens(text, self.chars_per_token, self.non_ascii_bytes_per_token)
+
+    def input_tokens(self, output_tokens: int, prompt_tokens: int) -> int:
+        """Tokens left for document text once the prompt and output are reserved"""
+        available = self.context_window - prompt_tokens - output_tokens - self.reasoning_reserve
+        available = int(available * (1 - self.safety_margin))
+        if self.max_input_tokens is not None:
+            available = min(available, self.max_input_tokens)
+        return max(available, 256)
+
+    def fits(self, text: str, output_tokens: int, prompt_tokens: int) -> bool:
+        return self.estimate(text) <= self.input_tokens(output_tokens, prompt_tokens)
+
+    def fit(self, text: str, output_tokens: int, prompt_tokens: int, max_tokens: Optional[int] = None) -> str:
+        """Return text unchanged if it fits, otherwise its most informative sentences"""
+        budget = self.input_tokens(output_tokens, prompt_tokens)
+        if max_tokens is not None:
+            budget = min(budget, max_tokens)
+        return extract_to_budget(text, budget, self.estimate)
+
+    def char_limit(self, text: str, output_tokens: int, prompt_tokens: int) -> int:
+        """Characters of this particular text that fit, using its own chars-per-token ratio"""
+        ratio = len(text) / max(1, self.estimate(text))
+        return max(1000, int(self.input_tokens(output_tokens, prompt_tokens) * ratio))
@@ -0,0 +1,167 @@
+import asyncio
+import difflib
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+from .cache import MemoryCache
+
+
+_DOCUMENT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def make_document_id(text_content: str) -> str:
+    """Content hash of the extracted text, so identical uploads share one entry"""
+    return hashlib.sha256(text_content.encode("utf-8", errors="surrogatepass")).hexdigest()[:32]
+
+
+def page_fingerprint(text: str) -> str:
+    """Fingerprint of a page's extracted text, insensitive to whitespace-only differences"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8", errors="surrogatepass")).hexdigest()[:16]
+
+
+def diff_pages(old: List[str], new: List[str]) -> Dict:
+    """Which pages of a new version (by fingerprint) are unchanged, changed, added or removed.
+
+    Page numbers are 1-based and refer to the new version; inserting or
+    deleting a page doesn't mark the pages after it as changed.
+    """
+    unchanged = 0
+    removed = 0
+    changed: List[int] = []
+    added: List[int] = []
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            unchanged += new_end - new_start
+        elif tag == "replace":
+            changed.extend(range(new_start + 1, new_end + 1))
+            removed += max(0, (old_end - old_start) - (new_end - new_start))
+        elif tag == "insert":
+            added.extend(range(new_start + 1, new_end + 1))
+        else:
+            removed += old_end - old_start
+    return {"unchanged_pages": unchanged, "changed_pages": changed, "added_pages": added, "removed_pages": removed}
+
+
+def version_changes(previous_document_id: str, previous: Optional[Dict], fingerprints: List[str]) -> Optional[Dict]:
+    """Page diff of a re-upload against the stored version it replaces, or None if that version is gone"""
+    if previous is None or not previous.get("fingerprints"):
+        return None
+    return {"previous_document_id": previous_document_id, **diff_pages(previous["fingerprints"], fingerprints)}
+
+
+class DiskDocumentStore:
+    """One JSON file per document, evicted least-recently-used past a byte bound"""
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, document_id: str) -> str:
+        return os.path.join(self.directory, f"{document_id}.json")
+
+    def get(self, document_id: str) -> Optional[str]:
+        path = self._path(document_id)
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                payload = handle.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mtime doubles as last-access time for eviction
+        return payload
+
+    def set(self, document_id: str, payload: str) -> None:
+        path = self._path(document_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(payload)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class DocumentStore:
+    """Server-side store of extracted document text, addressed by document_id"""
+
+    def __init__(self, memory: Optional[MemoryCache] = None, disk: Optional[DiskDocumentStore] = None):
+        self.memory = memory or MemoryCache(max_entries=256, max_bytes=256 * 1024 * 1024, ttl=86400.0)
+        self.disk = disk
+
+    @classmethod
+    def from_env(cls) -> "DocumentStore":
+        """Build a store from DOCUMENT_STORE_* environment variables"""
+        memory = MemoryCache(
+            max_entries=int(os.getenv("DOCUMENT_STORE_MAX_DOCUMENTS", "256")),
+            max_bytes=int(os.getenv("DOCUMENT_STORE_MAX_BYTES", str(256 * 1024 * 1024))),
+            ttl=float(os.getenv("DOCUMENT_STORE_TTL", "86400")),
+        )
+        disk = None
+        directory = os.getenv("DOCUMENT_STORE_DIR")
+        if directory:
+            disk = DiskDocumentStore(
+                directory,
+                max_bytes=int(os.getenv("DOCUMENT_STORE_DISK_MAX_BYTES", str(1024 * 1024 * 1024))),
+            )
+        return cls(memory=memory, disk=disk)
+
+    async def put(
+        self,
+        text_content: str,
+        pages: Optional[List[str]] = None,
+        filename: Optional[str] = None,
+        fingerprints: Optional[List[str]] = None,
+        sources: Optional[List[str]] = None,
+    ) -> str:
+        """Store a document and return its id"""
+        document_id = make_document_id(text_content)
+        if pages and fingerprints is None:
+            fingerprints = [page_fingerprint(page) for page in pages]
+        payload = json.dumps({
+            "text_content": text_content,
+            "pages": pages,
+            "filename": filename,
+            "fingerprints": fingerprints,
+            "sources": sources,
+        })
+        self.memory.set(document_id, payload)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, document_id, payload)
+        return document_id
+
+    async def get(self, document_id: str) -> Optional[Dict]:
+        """Return {"text_content", "pages", "filename", "fingerprints", "sources"} or None if unknown or evicted"""
+        if not _DOCUMENT_ID.match(document_id):
+            return None
+        payload = self.memory.get(document_id)
+        if payload is None and self.disk is not None:
+            payload = await asyncio.to_thread(self.disk.get, document_id)
+            if payload is not None:
+                self.memory.set(document_id, payload)
+        return json.loads(payload) if payload is not None else None
+
+    def stats(self) -> Dict:
+        return {
+            "documents": len(self.memory),
+            "memory_bytes": self.memory.size_bytes,
+            "evictions": self.memory.evictions,
+            "disk_enabled": self.disk is not None,
+        }
@@ -0,0 +1,210 @@
+import csv
+from collections import Counter
+from typing import IO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+PASS_SCORE = 60
+
+# Score histogram buckets: 0-10, 10-20, ..., 90-100 (the last one includes 100)
+HISTOGRAM_EDGES = np.linspace(0, 100, 11)
+
+# Most frequent wrong answers reported per question
+TOP_DISTRACTORS = 5
+
+BLANK = "(blank)"
+
+Submission = Tuple[Optional[str], List[str]]
+
+
+def normalize_answers(answers) -> np.ndarray:
+    """Trimmed, lower-cased answers as a NumPy string array of the same shape"""
+    return np.char.lower(np.char.strip(np.asarray(answers, dtype=str)))
+
+
+def performance_feedback(score: float) -> Tuple[str, str]:
+    """(feedback, suggestion) shown to a student for a percentage score"""
+    if score >= 90:
+        return "Excellent work! You've mastered this material.", "Consider trying a harder difficulty level."
+    if score >= 70:
+        return "Good job! You have a solid understanding.", "Review the areas you missed and try again."
+    if score >= 50:
+        return "You're getting there! Keep studying.", "Consider reviewing the material again or trying an easier difficulty."
+    return "Don't worry, this is part of learning!", "Try reviewing the summary again and attempt an easier quiz."
+
+
+def answer_matches(user_answers: Sequence[str], correct_answers: Sequence[str]) -> List[bool]:
+    """Whether each answer matches the key, ignoring case and surrounding whitespace"""
+    return (normalize_answers(user_answers) == normalize_answers(correct_answers)).tolist()
+
+
+def grade_answers(user_answers: Sequence[str], correct_answers: Sequence[str]) -> Dict:
+    """Score one submission against its answer key, shaped as the /check-answers response"""
+    correct_count = sum(answer_matches(user_answers, correct_answers))
+    total_questions = len(correct_answers)
+    score = (correct_count / total_questions) * 100
+    feedback, suggestion = performance_feedback(score)
+    return {
+        "score": score,
+        "correct_answers": correct_count,
+        "total_questions": total_questions,
+        "feedback": feedback,
+        "suggestion": suggestion,
+        "passed": score >= PASS_SCORE
+    }
+
+
+class BulkGrader:
+    """Grades many submissions against one answer key, in batches, keeping class statistics.
+
+    The key is normalized once. Each batch becomes a (students x questions)
+    array of integer answer codes: only the distinct answers of a batch (a
+    handful per question for multiple choice) are normalized, and every
+    comparison with the key is one vectorized operation. The per-question
+    tallies needed for the statistics are accumulated as batches go, so memory
+    stays bounded by the batch size rather than the class size.
+    """
+
+    def __init__(self, correct_answers: Sequence[str], pass_score: float = PASS_SCORE):
+        if not correct_answers:
+            raise ValueError("The answer key is empty")
+        self.correct_answers = list(correct_answers)
+        self.key = normalize_answers(self.correct_answers)
+        self.pass_score = pass_score
+        questions = len(self.key)
+        self.graded = 0
+        self.rejected = 0
+        self.passed = 0
+        self.correct_counts = np.zeros(questions, dtype=np.int64)
+        # Sum of total scores of the students who got each question right, for discrimination
+        self.correct_score_sums = np.zeros(questions, dtype=np.float64)
+        self.score_sum = 0.0
+        self.score_squares = 0.0
+        self.histogram = np.zeros(len(HISTOGRAM_EDGES) - 1, dtype=np.int64)
+        self.wrong_answers: List[Counter] = [Counter() for _ in range(questions)]
+
+    def __len__(self) -> int:
+        return len(self.key)
+
+    def grade_batch(self, submissions: Sequence[Submission]) -> List[Dict]:
+        """Per-student results for a batch, in input order; updates the class statistics"""
+        results: List[Dict] = [{} for _ in submissions]
+        valid = [i for i, (_, answers) in enumerate(submissions) if len(answers) == len(self.key)]
+        for i, (student_id, answers) in enumerate(submissions):
+            if len(answers) != len(self.key):
+                self.rejected += 1
+                results[i] = {"student_id": student_id, "error": f"Expected {len(self.key)} answers, got {len(answers)}"}
+        if not valid:
+            return results
+
+        codes, values = self._encode([submissions[i][1] for i in valid])
+        correct = codes == self._key_codes(values)
+        correct_counts = correct.sum(axis=1)
+        scores = correct_counts * (100.0 / len(self.key))
+        wrong_students, wrong_questions = np.nonzero(~correct)
+        self._accumulate(codes, values, correct, scores, wrong_students, wrong_questions)
+
+        # nonzero() returns cells in row order, so each student's misses are one slice
+        bounds = [0, *np.searchsorted(wrong_students, np.arange(1, len(valid))).tolist(), len(wrong_students)]
+        misses = wrong_questions.tolist()
+        for row, (i, score, count) in enumerate(zip(valid, scores.tolist(), correct_counts.tolist())):
+            results[i] = {
+                "student_id": submissions[i][0],
+                "score": score,
+                "correct_answers": count,
+                "total_questions": len(self.key),
+                "passed": score >= self.pass_score,
+                "incorrect_questions": misses[bounds[row]:bounds[row + 1]]
+            }
+        return results
+
+    @staticmethod
+    def _encode(rows: List[List[str]]) -> Tuple[np.ndarray, List[str]]:
+        """(codes, values): each cell's index into the batch's distinct normalized answers.
+
+        Raw answers are interned first, so strip/lower runs once per distinct
+        answer rather than once per cell.
+        """
+        raw_ids: Dict[str, int] = {}
+        cells = np.fromiter(
+            (raw_ids.setdefault(answer, len(raw_ids)) for answers in rows for answer in answers),
+            dtype=np.int64,
+            count=len(rows) * len(rows[0])
+        )
+        value_ids: Dict[str, int] = {}
+        remap = np.array([value_ids.setdefault(answer.strip().lower(), len(value_ids)) for answer in raw_ids], dtype=np.int64)
+        return remap[cells].reshape(len(rows), len(rows[0])), list(value_ids)
+
+    def _key_codes(self, values: List[str]) -> np.ndarray:
+        """Code of each key answer among this batch's values, -1 where no student gave it"""
+        codes = {value: code for code, value in enumerate(values)}
+        return np.array([codes.get(answer, -1) for answer in self.key.tolist()], dtype=np.int64)
+
+    def _accumulate(self, codes: np.ndarray, values: List[str], correct: np.ndarray, scores: np.ndarray, wrong_students: np.ndarray, wrong_questions: np.ndarray) -> None:
+        self.graded += len(scores)
+        self.passed += int((scores >= self.pass_score).sum())
+        self.correct_counts += correct.sum(axis=0)
+        self.correct_score_sums += correct.T.astype(np.float64) @ scores
+        self.score_sum += float(scores.sum())
+        self.score_squares += float(np.square(scores).sum())
+        self.histogram += np.histogram(scores, bins=HISTOGRAM_EDGES)[0]
+        # Count (question, wrong answer) pairs for the whole batch at once
+        pair_counts = np.bincount(wrong_questions * len(values) + codes[wrong_students, wrong_questions])
+        for pair in np.flatnonzero(pair_counts).tolist():
+            question, code = divmod(pair, len(values))
+            self.wrong_answers[question][values[code]] += int(pair_counts[pair])
+
+    def statistics(self) -> Dict:
+        """Class-level results and per-question item statistics for everything graded so far"""
+        graded = self.graded
+        mean = self.score_sum / graded if graded else 0.0
+        std = float(np.sqrt(max(self.score_squares / graded - mean * mean, 0.0))) if graded else 0.0
+        items = []
+        for question in range(len(self.key)):
+            right = int(self.correct_counts[question])
+            difficulty = right / graded if graded else 0.0
+            # Point-biserial correlation of getting this question right with the total score
+            discrimination = None
+            if std > 0 and 0 < right < graded:
+                mean_right = self.correct_score_sums[question] / right
+                discrimination = round(float((mean_right - mean) / std * np.sqrt(difficulty / (1 - difficulty))), 4)
+            items.append({
+                "question": question,
+                "correct_answer": self.correct_answers[question],
+                "difficulty_index": round(difficulty, 4),
+                "discrimination": discrimination,
+                "distractors": [
+                    {"answer": answer or BLANK, "count": count, "rate": round(count / graded, 4)}
+                    for answer, count in self.wrong_answers[question].most_common(TOP_DISTRACTORS)
+                ]
+            })
+        return {
+            "graded": graded,
+            "rejected": self.rejected,
+            "mean_score": round(mean, 2),
+            "std_score": round(std, 2),
+            "pass_rate": round(self.passed / graded, 4) if graded else 0.0,
+            "score_histogram": [
+                {"min": int(low), "max": int(high), "count": int(count)}
+                for low, high, count in zip(HISTOGRAM_EDGES[:-1], HISTOGRAM_EDGES[1:], self.histogram)
+            ],
+            "items": items
+        }
+
+
+def read_csv_submissions(stream: IO[str], batch_size: int) -> Iterator[List[Submission]]:
+    """Batches of (student_id, answers) from CSV rows "student_id,answer1,answer2,...".
+
+    A first row whose first cell is "student_id" is treated as a header and skipped.
+    """
+    batch: List[Submission] = []
+    for line_number, row in enumerate(csv.reader(stream)):
+        if not row or (line_number == 0 and row[0].strip().lower() == "student_id"):
+            continue
+        batch.append((row[0], row[1:]))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+DEFAULT_LLM_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "0.0.0.0"}
+
+
+def is_local_url(url: str) -> bool:
+    """True for upstreams on this machine (mock servers, local inference) that need no API key"""
+    return (urlsplit(url).hostname or "") in LOCAL_HOSTS
+
+
+@asynccontextmanager
+async def aclosing(stream: AsyncGenerator) -> AsyncIterator[AsyncGenerator]:
+    """Close an async generator when the block exits (contextlib.aclosing needs Python 3.10)"""
+    try:
+        yield stream
+    finally:
+        await stream.aclose()
+
+
+class LLMHTTPClient:
+    """Shared, pooled async HTTP client used for all upstream LLM calls.
+
+    One instance lives for the lifetime of the app so that TCP/TLS connections
+    are kept alive and reused between requests instead of being re-opened for
+    every completion.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 120.0,
+        connect_timeout: float = 10.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        per_host_limit: int = 32,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = per_host_limit
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @classmethod
+    def from_env(cls, transport: Optional[httpx.AsyncBaseTransport] = None) -> "LLMHTTPClient":
+        """Build a client from LLM_* environment variables"""
+        return cls(
+            timeout=float(os.getenv("LLM_TIMEOUT", "120")),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+            per_host_limit=int(os.getenv("LLM_PER_HOST_LIMIT", "32")),
+            transport=transport,
+        )
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    async def start(self) -> None:
+        """Open the connection pool (idempotent)"""
+        if not self.started:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+            )
+
+    async def aclose(self) -> None:
+        """Close the connection pool and drop idle connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _semaphore_for(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    async def post_json(self, url: str, headers: Dict[str, str], payload: Dict) -> Dict:
+        """POST a JSON payload and return the decoded JSON response"""
+        if not self.started:
+            await self.start()
+
+        async with self._semaphore_for(url):
+            response = await self._client.post(url, headers=headers, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def stream_lines(self, url: str, headers: Dict[str, str], payload: Dict) -> AsyncIterator[str]:
+        """POST a JSON payload and yield the response body line by line as it arrives"""
+        if not self.started:
+            await self.start()
+
+        async with self._semaphore_for(url):
+            async with self._client.stream("POST", url, headers=headers, json=payload) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                async for line in response.aiter_lines():
+                    yield line
@@ -0,0 +1,371 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already queued"""
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """The job fields returned to clients (parameters stay server-side)"""
+    return {key: value for key, value in job.items() if key != "params"}
+
+
+class JobStore(ABC):
+    """Interface for job persistence; workers claim queued jobs by priority, then age"""
+
+    @abstractmethod
+    async def create(self, kind: str, params: Dict[str, Any], priority: int) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically mark the next queued job as running and return it"""
+
+    @abstractmethod
+    async def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def queued(self) -> int:
+        ...
+
+    @abstractmethod
+    async def purge(self) -> int:
+        """Drop finished jobs whose results have expired"""
+
+    @abstractmethod
+    async def stats(self) -> Dict[str, int]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+def _new_job(kind: str, params: Dict[str, Any], priority: int) -> Dict[str, Any]:
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "status": "queued",
+        "priority": priority,
+        "params": params,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "expires_at": None,
+        "result": None,
+        "error": None,
+    }
+
+
+class MemoryJobStore(JobStore):
+    """In-process job store; jobs are lost on restart and not shared between uvicorn workers"""
+
+    def __init__(self, result_ttl: float = 3600.0):
+        self.result_ttl = result_ttl
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # Min-heap of (-priority, sequence, job id): higher priority first, then FIFO
+        self._heap: List[Tuple[int, int, str]] = []
+        self._sequence = itertools.count()
+
+    async def create(self, kind: str, params: Dict[str, Any], priority: int) -> Dict[str, Any]:
+        job = _new_job(kind, params, priority)
+        self._jobs[job["id"]] = job
+        heapq.heappush(self._heap, (-priority, next(self._sequence), job["id"]))
+        return dict(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None or (job["expires_at"] is not None and job["expires_at"] <= time.time()):
+            return None
+        return dict(job)
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        while self._heap:
+            _, _, job_id = heapq.heappop(self._heap)
+            job = self._jobs.get(job_id)
+            if job is not None and job["status"] == "queued":
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                return dict(job)
+        return None
+
+    async def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        now = time.time()
+        job.update(status=status, result=result, error=error, finished_at=now, expires_at=now + self.result_ttl)
+        # The input is no longer needed once the job is done
+        job["params"] = {}
+
+    async def queued(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["status"] == "queued")
+
+    async def purge(self) -> int:
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items() if job["expires_at"] is not None and job["expires_at"] <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    async def stats(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        for job in self._jobs.values():
+            counts[job["status"]] += 1
+        return counts
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite-backed job store shared by every uvicorn worker process on one host"""
+
+    def __init__(self, path: str, result_ttl: float = 3600.0, stale_after: float = 900.0):
+        self.result_ttl = result_ttl
+        # A running job not finished within this many seconds is assumed lost with its worker
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL,"
+            " priority INTEGER NOT NULL, params TEXT NOT NULL,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL, expires_at REAL,"
+            " result TEXT, error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority DESC, created_at)")
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def _create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, priority, params, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job["id"], job["kind"], job["status"], job["priority"], json.dumps(job["params"]), job["created_at"]),
+            )
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)", (job_id, time.time())
+            ).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock so two processes never claim the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ("
+                    " SELECT id FROM jobs WHERE status = 'queued'"
+                    " OR (status = 'running' AND started_at < ?)"
+                    " ORDER BY priority DESC, created_at LIMIT 1) RETURNING *",
+                    (now, now - self.stale_after),
+                ).fetchone()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._decode(row) if row is not None else None
+
+    def _finish(self, job_id: str, status: str, result: Optional[str], error: Optional[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, params = '{}',"
+                " finished_at = ?, expires_at = ? WHERE id = ?",
+                (status, result, error, now, now + self.result_ttl, job_id),
+            )
+
+    def _count(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def _purge(self) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def _stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    async def create(self, kind: str, params: Dict[str, Any], priority: int) -> Dict[str, Any]:
+        job = _new_job(kind, params, priority)
+        await asyncio.to_thread(self._create, job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._claim)
+
+    async def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        payload = json.dumps(result, separators=(",", ":")) if result is not None else None
+        await asyncio.to_thread(self._finish, job_id, status, payload, error)
+
+    async def queued(self) -> int:
+        return await asyncio.to_thread(self._count, "queued")
+
+    async def purge(self) -> int:
+        return await asyncio.to_thread(self._purge)
+
+    async def stats(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self._stats)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """Worker pool that runs queued generation jobs from a JobStore.
+
+    Workers are woken immediately for jobs submitted in this process and
+    poll the store every `poll_interval` seconds for jobs submitted by
+    other processes sharing a SQLite store.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = 4,
+        max_queued: int = 1000,
+        poll_interval: float = 1.0,
+        purge_interval: float = 60.0,
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self.handlers: Dict[str, JobHandler] = {}
+        self._wakeup = asyncio.Event()
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        """Build a queue from JOB_* environment variables"""
+        result_ttl = float(os.getenv("JOB_RESULT_TTL", "3600"))
+        path = os.getenv("JOB_STORE_PATH")
+        if path:
+            store: JobStore = SQLiteJobStore(path, result_ttl=result_ttl, stale_after=float(os.getenv("JOB_STALE_AFTER", "900")))
+        else:
+            store = MemoryJobStore(result_ttl=result_ttl)
+        return cls(
+            store,
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_queued=int(os.getenv("JOB_MAX_QUEUED", "1000")),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "1")),
+        )
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self.handlers[kind] = handler
+
+    async def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._janitor()))
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.store.close()
+
+    async def submit(self, kind: str, params: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if await self.store.queued() >= self.max_queued:
+            raise JobQueueFull("Too many queued jobs")
+        job = await self.store.create(kind, params, priority)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Return the job once it has finished, or its current state after `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.store.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in TERMINAL_STATUSES:
+                self._finished.pop(job_id, None)
+                return job
+            if remaining <= 0:
+                return job
+            event = self._finished.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            # Clear before claiming so a submit racing with an empty claim still wakes us
+            self._wakeup.clear()
+            job = await self.store.claim()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        try:
+            result = await self.handlers[job["kind"]](job["params"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.store.finish(job["id"], "failed", error=str(e))
+        else:
+            await self.store.finish(job["id"], "succeeded", result=result)
+        event = self._finished.pop(job["id"], None)
+        if event is not None:
+            event.set()
+
+    async def _janitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            await self.store.purge()
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "in_process_waiters": len(self._finished), **(await self.store.stats())}
@@ -1,20 +1,56 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import os
+import asyncio
+import io
 import json
-from typing import Optional, List
+import time
+from contextlib import ExitStack, asynccontextmanager
+from typing import AsyncIterator, Awaitable, Dict, Optional, List, Tuple
 from pydantic import BaseModel
-import fitz  # PyMuPDF
 from dotenv import load_dotenv
 
 from .ai_service import QuizForgeAI
-from .models import SummaryRequest, QuizRequest, QuizResponse, SummaryResponse, FlashcardRequest, FlashcardResponse
+from .batch_upload import BatchUploader
+from .document_store import DocumentStore, version_changes
+from .grading import BulkGrader, answer_matches, grade_answers, read_csv_submissions
+from .http_client import aclosing
+from .jobs import TERMINAL_STATUSES, JobQueue, JobQueueFull, public_job
+from .metrics import REGISTRY, MetricsMiddleware
+from .pdf_ingest import PDFIngestor, PDFLimitError, read_upload
+from .question_bank import QuestionBank
+from .retrieval import RetrievalIndexStore
+from .scheduler import UpstreamOverloaded
+from .models import SummaryRequest, QuizRequest, QuizResponse, SummaryResponse, FlashcardRequest, FlashcardResponse, StudyPackResponse, BulkGradeRequest
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="QuizForge API", version="1.0.0")
+# Initialize AI service
+ai_service = QuizForgeAI()
+pdf_ingestor = PDFIngestor.from_env()
+document_store = DocumentStore.from_env()
+batch_uploader = BatchUploader.from_env(pdf_ingestor, document_store)
+retrieval_index = RetrievalIndexStore.from_env()
+job_queue = JobQueue.from_env()
+question_bank = QuestionBank.from_env()
+grading_batch_size = int(os.getenv("GRADING_BATCH_SIZE", "1000"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown"""
+    await ai_service.startup()
+    await job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.shutdown()
+        await ai_service.shutdown()
+        pdf_ingestor.shutdown()
+        question_bank.close()
+
+app = FastAPI(title="QuizForge API", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -24,9 +60,36 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
-# Initialize AI service
-ai_service = QuizForgeAI()
+async def collect_service_stats():
+    """Expose the existing cache, coalescing, scheduler, document store and job counters as metrics"""
+    cache = ai_service.cache.stats()
+    inflight = ai_service.inflight.stats()
+    upstream = ai_service.scheduler.stats()
+    documents = document_store.stats()
+    jobs = await job_queue.stats()
+    routing = ai_service.router.counters
+    return [
+        ("quizforge_result_cache_hits_total", "counter", "Result cache hits", cache["hits"]),
+        ("quizforge_result_cache_misses_total", "counter", "Result cache misses", cache["misses"]),
+        ("quizforge_result_cache_memory_bytes", "gauge", "Bytes held by the in-memory result cache", cache["memory_bytes"]),
+        ("quizforge_coalesced_calls_total", "counter", "Generation calls coalesced onto an in-flight identical call", inflight["coalesced"]),
+        ("quizforge_upstream_waiting", "gauge", "Upstream calls waiting for a scheduler slot", upstream["waiting"]),
+        ("quizforge_upstream_active", "gauge", "Upstream calls currently in progress", upstream["active"]),
+        ("quizforge_upstream_retries_total", "counter", "Upstream calls retried after 429/5xx/network errors", upstream["retries"]),
+        ("quizforge_upstream_shed_total", "counter", "Upstream calls shed with 503", upstream["shed"] + upstream["circuit_rejected"]),
+        ("quizforge_upstream_circuit_open", "gauge", "1 while the upstream circuit breaker is open", int(upstream["circuit_state"] == "open")),
+        ("quizforge_upstream_hedged_total", "counter", "Upstream calls that got a hedged backup request after the route's p95 latency", routing["hedged"]),
+        ("quizforge_upstream_failovers_total", "counter", "Upstream calls moved to another route after failing on one", routing["failovers"]),
+        ("quizforge_batch_upload_files_total", "counter", "Files received by the batch upload endpoint", batch_uploader.counters["files"]),
+        ("quizforge_batch_upload_duplicates_total", "counter", "Batch-uploaded files skipped as byte-identical to another file of the batch", batch_uploader.counters["duplicates"]),
+        ("quizforge_documents", "gauge", "Documents in the in-memory document store", documents["documents"]),
+        ("quizforge_jobs_queued", "gauge", "Background jobs waiting for a worker", jobs["queued"]),
+        ("quizforge_jobs_running", "gauge", "Background jobs being processed", jobs["running"]),
+    ]
+
+REGISTRY.register_collector(collect_service_stats)
 
 @app.get("/")
 async def root():
@@ -36,180 +99,792 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "QuizForge API"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text-format metrics"""
+    return PlainTextResponse(await REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the generation result cache"""
+    return ai_service.cache.stats()
+
+@app.get("/coalescing/stats")
+async def coalescing_stats():
+    """How many generation calls shared an identical in-flight upstream request"""
+    return ai_service.inflight.stats()
+
+@app.get("/upstream/stats")
+async def upstream_stats():
+    """Upstream scheduler queue, retry and circuit breaker counters"""
+    return ai_service.scheduler.stats()
+
+@app.get("/routing/stats")
+async def routing_stats():
+    """Model routes per task pool with their rolling latency, error rate and health, plus hedging counters"""
+    return ai_service.router.stats()
+
+@app.get("/usage/stats")
+async def usage_stats():
+    """Prompt, cached prompt and completion tokens reported by the upstream, per task"""
+    return {**ai_service.usage.stats(), "cache_hints": ai_service.cache_policy.mode}
+
+def service_unavailable(e: UpstreamOverloaded) -> HTTPException:
+    """503 telling the client when to retry an upstream call that was shed"""
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(max(1, round(e.retry_after)))}
+    )
+
+@app.get("/documents/stats")
+async def document_stats():
+    """Size of the server-side document store and its retrieval indexes"""
+    return {**document_store.stats(), "pages": pdf_ingestor.stats(), "retrieval": retrieval_index.stats(), "batch_uploads": batch_uploader.stats()}
+
+async def resolve_document(text_content: Optional[str], document_id: Optional[str], focus: Optional[str] = None) -> Tuple[str, Optional[List[str]]]:
+    """Return (text, pages) for a request that sent either raw text or a stored document_id.
+    
+    With a focus ("chapter 4", "pages 10-20", a topic) only the matching part of the document is returned.
+    """
+    if document_id:
+        document = await document_store.get(document_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired document_id; upload the document again")
+        text_content, pages = document["text_content"], document.get("pages")
+    elif text_content:
+        pages = None
+    else:
+        raise HTTPException(status_code=400, detail="Either text_content or document_id is required")
+    if focus and focus.strip():
+        try:
+            return await retrieval_index.focus(text_content, pages, focus.strip())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return text_content, pages
+
+@app.post("/documents")
+async def create_document(text_content: str = Form(...)):
+    """Store pasted text server-side so later calls can reference it by document_id"""
+    document_id = await document_store.put(text_content)
+    return {
+        "document_id": document_id,
+        "word_count": len(text_content.split())
+    }
+
 @app.post("/upload-pdf")
-async def upload_pdf(file: UploadFile = File(...)):
-    """Upload and extract text from PDF"""
+async def upload_pdf(file: UploadFile = File(...), include_text: bool = Form(True), previous_document_id: Optional[str] = Form(None)):
+    """Upload and extract text from PDF; `previous_document_id` names the version this upload replaces"""
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
     try:
-        # Save uploaded file temporarily
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, file.filename)
+        # Read the upload in chunks and extract from memory; nothing touches disk
+        started = time.perf_counter()
+        content = await read_upload(file, pdf_ingestor.max_bytes)
+        read_ms = (time.perf_counter() - started) * 1000
         
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Extract text from PDF
-        text_content = extract_text_from_pdf(file_path)
-        
-        # Clean up temporary file
-        os.remove(file_path)
+        previous = await document_store.get(previous_document_id) if previous_document_id else None
+        result = await pdf_ingestor.ingest(content, previous)
+        text_content = result["text_content"]
+        changes = version_changes(previous_document_id, previous, result["fingerprints"])
+        document_id = await document_store.put(text_content, result["pages"], file.filename, result["fingerprints"], result["sources"])
         
         return {
             "filename": file.filename,
-            "text_content": text_content,
-            "word_count": len(text_content.split())
+            "document_id": document_id,
+            "text_content": text_content if include_text else None,
+            "word_count": len(text_content.split()),
+            "page_count": result["page_count"],
+            "reused_pages": result["reused_pages"],
+            "changes": changes,
+            "timings": {"read_ms": round(read_ms, 2), **result["timings"]}
         }
     
+    except PDFLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
+@app.post("/upload-pdfs")
+async def upload_pdfs(files: List[UploadFile] = File(...), include_text: bool = Form(False)):
+    """Upload many PDFs and/or zip archives of PDFs and extract them in parallel"""
+    started = time.perf_counter()
+    with ExitStack() as archives:
+        try:
+            entries, rejected = await batch_uploader.entries(files, archives)
+        except PDFLimitError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        try:
+            results = await batch_uploader.ingest(entries, include_text) + rejected
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing PDFs: {str(e)}")
+
+    return {
+        "files": results,
+        "ingested": sum(1 for result in results if result["status"] == "ok"),
+        "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+        "failed": sum(1 for result in results if result["status"] == "error"),
+        "timings": {"total_ms": round((time.perf_counter() - started) * 1000, 2)}
+    }
+
 @app.post("/generate-summary", response_model=SummaryResponse)
 async def generate_summary(
-    text_content: str = Form(...),
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
     summary_type: str = Form(...),  # "short", "bullet_points", "detailed"
-    subject: Optional[str] = Form(None)
+    subject: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+    full_document: bool = Form(False)
 ):
     """Generate summary from text content"""
+    text_content, pages = await resolve_document(text_content, document_id, focus)
     try:
-        summary = await ai_service.generate_summary(
-            text_content=text_content,
-            summary_type=summary_type,
-            subject=subject
-        )
-        
-        return SummaryResponse(
-            summary=summary["content"],
-            tags=summary.get("tags", []),
-            summary_type=summary_type,
-            word_count=len(summary["content"].split())
-        )
+        return await build_summary(text_content, pages, summary_type, subject, not no_cache, full_document)
     
+    except UpstreamOverloaded as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating summary: {str(e)}")
 
+async def build_summary(text_content: str, pages: Optional[List[str]], summary_type: str, subject: Optional[str], use_cache: bool, full_document: bool) -> SummaryResponse:
+    """Generate a summary shaped as the /generate-summary response"""
+    summary = await ai_service.generate_summary(
+        text_content=text_content,
+        pages=pages,
+        summary_type=summary_type,
+        subject=subject,
+        use_cache=use_cache,
+        full_document=full_document
+    )
+    
+    return SummaryResponse(
+        summary=summary["content"],
+        tags=summary.get("tags", []),
+        summary_type=summary_type,
+        word_count=len(summary["content"].split())
+    )
+
+def adjust_difficulty(difficulty: str, previous_score: Optional[int]) -> str:
+    """Adaptive difficulty: drop to easy after a poor score, step up to hard after a great one"""
+    if previous_score is not None:
+        if previous_score < 60:
+            return "easy"
+        elif previous_score > 90:
+            return "hard"
+    return difficulty
+
 @app.post("/generate-quiz", response_model=QuizResponse)
 async def generate_quiz(
-    text_content: str = Form(...),
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
     num_questions: int = Form(...),
     subject: str = Form(...),
     difficulty: str = Form(...),  # "easy", "medium", "hard"
-    previous_score: Optional[int] = Form(None)
+    previous_score: Optional[int] = Form(None),
+    no_cache: bool = Form(False),
+    exclude_question_ids: List[int] = Form([])
 ):
-    """Generate quiz from text content with adaptive difficulty"""
+    """Generate quiz from text content with adaptive difficulty.
+    
+    A quiz on a whole stored document is assembled from its question bank;
+    exclude_question_ids (e.g. the previous attempt's question_ids) keeps a
+    retake from repeating questions.
+    """
+    text_content, pages = await resolve_document(text_content, document_id, focus)
     try:
-        # Adaptive difficulty logic
-        adjusted_difficulty = difficulty
-        if previous_score is not None:
-            if previous_score < 60:
-                adjusted_difficulty = "easy" if difficulty != "easy" else "easy"
-            elif previous_score > 90:
-                adjusted_difficulty = "hard" if difficulty != "hard" else "hard"
-        
-        quiz = await ai_service.generate_quiz(
-            text_content=text_content,
-            num_questions=num_questions,
-            subject=subject,
-            difficulty=adjusted_difficulty
-        )
-        
-        return QuizResponse(
-            questions=quiz["questions"],
-            total_questions=len(quiz["questions"]),
-            difficulty=adjusted_difficulty,
-            subject=subject,
-            estimated_time=len(quiz["questions"]) * 2  # 2 minutes per question
+        return await document_quiz(
+            text_content, pages, document_id, focus, num_questions, subject,
+            adjust_difficulty(difficulty, previous_score), not no_cache, exclude_question_ids
         )
     
+    except UpstreamOverloaded as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
 
+async def document_quiz(text_content: str, pages: Optional[List[str]], document_id: Optional[str], focus: Optional[str], num_questions: int, subject: str, difficulty: str, use_cache: bool, exclude: List[int]) -> QuizResponse:
+    """A quiz from the stored document's question bank when it covers the whole document, otherwise a generated one"""
+    if document_id and not (focus and focus.strip()) and use_cache:
+        quiz = await quiz_from_bank(document_id, num_questions, subject, difficulty, exclude)
+        if quiz is not None:
+            return quiz
+    return await build_quiz(text_content, pages, num_questions, subject, difficulty, use_cache)
+
+async def build_quiz(text_content: str, pages: Optional[List[str]], num_questions: int, subject: str, difficulty: str, use_cache: bool) -> QuizResponse:
+    """Generate a quiz shaped as the /generate-quiz response"""
+    quiz = await ai_service.generate_quiz(
+        text_content=text_content,
+        num_questions=num_questions,
+        subject=subject,
+        difficulty=difficulty,
+        use_cache=use_cache,
+        pages=pages
+    )
+    
+    return QuizResponse(
+        questions=quiz["questions"],
+        total_questions=len(quiz["questions"]),
+        difficulty=difficulty,
+        subject=subject,
+        estimated_time=len(quiz["questions"]) * 2  # 2 minutes per question
+    )
+
+async def fill_question_bank(document_id: str, subject: str, difficulty: str, count: int) -> int:
+    """Generate `count` questions for a document's bank, avoiding those it already holds; returns how many were added"""
+    text_content, pages = await job_document(document_id)
+    existing = await question_bank.questions(document_id, subject)
+    pairs = await ai_service.generate_question_pool(
+        text_content, count, subject, difficulty, pages,
+        avoid=existing, variant=len(existing) // question_bank.fill_size
+    )
+    return await question_bank.add(document_id, subject, difficulty, pairs)
+
+# (document_id, subject, difficulty) banks with a background refill queued or running
+bank_refills = set()
+
+async def schedule_bank_refill(document_id: str, subject: str, difficulty: str) -> None:
+    """Top up a document's bank in the background, at most one refill per document, subject and level at a time"""
+    if (document_id, subject, difficulty) in bank_refills:
+        return
+    bank_refills.add((document_id, subject, difficulty))
+    try:
+        await job_queue.submit("question_bank", {"document_id": document_id, "subject": subject, "difficulty": difficulty, "count": question_bank.fill_size}, -1)
+    except JobQueueFull:
+        # The next quiz on this document tries again
+        bank_refills.discard((document_id, subject, difficulty))
+
+async def quiz_from_bank(document_id: str, num_questions: int, subject: str, difficulty: str, exclude: List[int]) -> Optional[QuizResponse]:
+    """Assemble a quiz from the document's question bank, filling the bank first if it is short.
+    
+    Returns None when no questions could be generated for the bank.
+    """
+    if await question_bank.available(document_id, subject, difficulty, exclude) < num_questions:
+        await fill_question_bank(document_id, subject, difficulty, max(question_bank.fill_size, num_questions))
+    quiz = await question_bank.assemble(document_id, subject, num_questions, difficulty, exclude)
+    if not quiz["questions"]:
+        return None
+    if quiz["remaining"] < num_questions:
+        await schedule_bank_refill(document_id, subject, difficulty)
+    return QuizResponse(
+        questions=quiz["questions"],
+        total_questions=len(quiz["questions"]),
+        difficulty=difficulty,
+        subject=subject,
+        estimated_time=len(quiz["questions"]) * 2,  # 2 minutes per question
+        question_ids=quiz["question_ids"]
+    )
+
+@app.post("/question-bank/fill", status_code=202)
+async def submit_question_bank_fill(
+    document_id: str = Form(...),
+    subject: str = Form(...),
+    difficulty: str = Form(...),  # "easy", "medium", "hard"
+    num_questions: Optional[int] = Form(None),
+    priority: int = Form(0)
+):
+    """Queue filling a stored document's question bank ahead of its first quiz and return the job id immediately"""
+    return await submit_job("question_bank", None, document_id, None, priority, {
+        "subject": subject,
+        "difficulty": difficulty,
+        "count": num_questions or question_bank.fill_size
+    })
+
+@app.get("/question-bank/{document_id}")
+async def question_bank_stats(document_id: str):
+    """Questions banked for a document by difficulty and topic, with per-question attempt statistics"""
+    return await question_bank.stats(document_id)
+
 @app.post("/generate-flashcards", response_model=FlashcardResponse)
 async def generate_flashcards(
-    text_content: str = Form(...),
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
     num_cards: int = Form(...),
     subject: str = Form(...),
-    card_type: str = Form(...)  # "definition", "concept", "fact", "mixed"
+    card_type: str = Form(...),  # "definition", "concept", "fact", "mixed"
+    no_cache: bool = Form(False)
 ):
     """Generate flashcards from text content"""
+    text_content, pages = await resolve_document(text_content, document_id, focus)
+    try:
+        return await build_flashcards(text_content, pages, num_cards, subject, card_type, not no_cache)
+    
+    except UpstreamOverloaded as e:
+        raise service_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating flashcards: {str(e)}")
+
+async def build_flashcards(text_content: str, pages: Optional[List[str]], num_cards: int, subject: str, card_type: str, use_cache: bool) -> FlashcardResponse:
+    """Generate flashcards shaped as the /generate-flashcards response"""
+    flashcards = await ai_service.generate_flashcards(
+        text_content=text_content,
+        num_cards=num_cards,
+        subject=subject,
+        card_type=card_type,
+        use_cache=use_cache,
+        pages=pages
+    )
+    
+    return FlashcardResponse(
+        flashcards=flashcards["flashcards"],
+        total_cards=len(flashcards["flashcards"]),
+        subject=subject,
+        card_type=card_type
+    )
+
+def ndjson_response(events: AsyncIterator[Dict], check_upstream: bool = True) -> StreamingResponse:
+    """Stream events as newline-delimited JSON, reporting failures as a final error event"""
+    # Shed before the 200 goes out while the upstream queue is already full
     try:
-        flashcards = await ai_service.generate_flashcards(
-            text_content=text_content,
-            num_cards=num_cards,
+        if check_upstream:
+            ai_service.scheduler.check_admission()
+    except UpstreamOverloaded as e:
+        raise service_unavailable(e)
+    
+    async def body():
+        try:
+            # Closing the events on disconnect releases any upstream stream they hold
+            async with aclosing(events) as stream:
+                async for event in stream:
+                    yield json.dumps(event) + "\n"
+        except Exception as e:
+            error = {"event": "error", "detail": str(e)}
+            if isinstance(e, UpstreamOverloaded):
+                error["status"] = 503
+            yield json.dumps(error) + "\n"
+    
+    # X-Accel-Buffering stops nginx-style proxies from holding events back
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/generate-summary/stream")
+async def generate_summary_stream(
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
+    summary_type: str = Form(...),  # "short", "bullet_points", "detailed"
+    subject: Optional[str] = Form(None),
+    no_cache: bool = Form(False)
+):
+    """Stream a summary as NDJSON "delta" events, ending with a "done" event"""
+    text_content, _ = await resolve_document(text_content, document_id, focus)
+    
+    async def events():
+        parts, tags = [], []
+        async with aclosing(ai_service.stream_summary(text_content, summary_type, subject, use_cache=not no_cache)) as stream:
+            async for event in stream:
+                if event["event"] == "tags":
+                    tags = event["tags"]
+                    continue
+                parts.append(event["content"])
+                yield event
+        summary = "".join(parts)
+        yield {"event": "done", "data": SummaryResponse(
+            summary=summary,
+            tags=tags,
+            summary_type=summary_type,
+            word_count=len(summary.split())
+        ).model_dump()}
+    
+    return ndjson_response(events())
+
+@app.post("/generate-quiz/stream")
+async def generate_quiz_stream(
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
+    num_questions: int = Form(...),
+    subject: str = Form(...),
+    difficulty: str = Form(...),  # "easy", "medium", "hard"
+    previous_score: Optional[int] = Form(None),
+    no_cache: bool = Form(False)
+):
+    """Stream quiz questions as NDJSON "question" events, ending with a "done" event"""
+    text_content, _ = await resolve_document(text_content, document_id, focus)
+    adjusted_difficulty = adjust_difficulty(difficulty, previous_score)
+    
+    async def events():
+        questions = []
+        async with aclosing(ai_service.stream_quiz(text_content, num_questions, subject, adjusted_difficulty, use_cache=not no_cache)) as stream:
+            async for event in stream:
+                questions.append(event["data"])
+                yield event
+        yield {"event": "done", "data": QuizResponse(
+            questions=questions,
+            total_questions=len(questions),
+            difficulty=adjusted_difficulty,
             subject=subject,
-            card_type=card_type
-        )
-        
-        return FlashcardResponse(
-            flashcards=flashcards["flashcards"],
-            total_cards=len(flashcards["flashcards"]),
+            estimated_time=len(questions) * 2  # 2 minutes per question
+        ).model_dump()}
+    
+    return ndjson_response(events())
+
+@app.post("/generate-flashcards/stream")
+async def generate_flashcards_stream(
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
+    num_cards: int = Form(...),
+    subject: str = Form(...),
+    card_type: str = Form(...),  # "definition", "concept", "fact", "mixed"
+    no_cache: bool = Form(False)
+):
+    """Stream flashcards as NDJSON "flashcard" events, ending with a "done" event"""
+    text_content, _ = await resolve_document(text_content, document_id, focus)
+    
+    async def events():
+        flashcards = []
+        async with aclosing(ai_service.stream_flashcards(text_content, num_cards, subject, card_type, use_cache=not no_cache)) as stream:
+            async for event in stream:
+                flashcards.append(event["data"])
+                yield event
+        yield {"event": "done", "data": FlashcardResponse(
+            flashcards=flashcards,
+            total_cards=len(flashcards),
             subject=subject,
             card_type=card_type
-        )
+        ).model_dump()}
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating flashcards: {str(e)}")
+    return ndjson_response(events())
+
+STUDY_PACK_ARTIFACTS = ("summary", "quiz", "flashcards")
+
+def study_pack_artifacts(artifacts: str) -> List[str]:
+    """Parse the comma-separated artifact list, rejecting unknown names"""
+    requested = list(dict.fromkeys(name.strip() for name in artifacts.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in STUDY_PACK_ARTIFACTS]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"artifacts must be a comma-separated subset of {', '.join(STUDY_PACK_ARTIFACTS)}")
+    return requested
+
+def study_pack_error(errors: Dict[str, Exception]) -> HTTPException:
+    """Error for a study pack in which every artifact failed"""
+    if all(isinstance(e, UpstreamOverloaded) for e in errors.values()):
+        return service_unavailable(next(iter(errors.values())))
+    detail = "; ".join(f"{name}: {e}" for name, e in errors.items())
+    return HTTPException(status_code=500, detail=f"Error generating study pack: {detail}")
+
+def study_pack_builds(requested: List[str], text_content: str, pages: Optional[List[str]], document_id: Optional[str], focus: Optional[str], subject: Optional[str], summary_type: str, full_document: bool, num_questions: int, difficulty: str, exclude_question_ids: List[int], num_cards: int, card_type: str, use_cache: bool) -> Dict[str, Awaitable]:
+    """One pending build per requested artifact, all over the same resolved document; the quiz comes from the question bank like /generate-quiz's"""
+    subject_name = subject or "General"
+    builds = {
+        "summary": lambda: build_summary(text_content, pages, summary_type, subject, use_cache, full_document),
+        "quiz": lambda: document_quiz(text_content, pages, document_id, focus, num_questions, subject_name, difficulty, use_cache, exclude_question_ids),
+        "flashcards": lambda: build_flashcards(text_content, pages, num_cards, subject_name, card_type, use_cache),
+    }
+    return {name: builds[name]() for name in requested}
+
+@app.post("/generate-study-pack", response_model=StudyPackResponse)
+async def generate_study_pack(
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
+    artifacts: str = Form("summary,quiz,flashcards"),
+    subject: Optional[str] = Form(None),
+    summary_type: str = Form("bullet_points"),
+    full_document: bool = Form(False),
+    num_questions: int = Form(5),
+    difficulty: str = Form("medium"),
+    previous_score: Optional[int] = Form(None),
+    exclude_question_ids: List[int] = Form([]),
+    num_cards: int = Form(10),
+    card_type: str = Form("mixed"),
+    no_cache: bool = Form(False)
+):
+    """Generate any of summary, quiz and flashcards for one document concurrently.
+    
+    Artifacts that fail are reported in "errors" while the others are still returned.
+    """
+    requested = study_pack_artifacts(artifacts)
+    text_content, pages = await resolve_document(text_content, document_id, focus)
+    builds = study_pack_builds(
+        requested, text_content, pages, document_id, focus, subject, summary_type, full_document,
+        num_questions, adjust_difficulty(difficulty, previous_score), exclude_question_ids, num_cards, card_type, not no_cache
+    )
+    
+    results = await asyncio.gather(*builds.values(), return_exceptions=True)
+    pack: Dict = {}
+    errors: Dict[str, Exception] = {}
+    for name, result in zip(builds, results):
+        if isinstance(result, Exception):
+            errors[name] = result
+        else:
+            pack[name] = result
+    if not pack:
+        raise study_pack_error(errors)
+    return StudyPackResponse(**pack, errors={name: str(e) for name, e in errors.items()})
+
+@app.post("/generate-study-pack/stream")
+async def generate_study_pack_stream(
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
+    artifacts: str = Form("summary,quiz,flashcards"),
+    subject: Optional[str] = Form(None),
+    summary_type: str = Form("bullet_points"),
+    full_document: bool = Form(False),
+    num_questions: int = Form(5),
+    difficulty: str = Form("medium"),
+    previous_score: Optional[int] = Form(None),
+    exclude_question_ids: List[int] = Form([]),
+    num_cards: int = Form(10),
+    card_type: str = Form("mixed"),
+    no_cache: bool = Form(False)
+):
+    """Stream each study pack artifact as an NDJSON "artifact" event as soon as it is ready, ending with a "done" event"""
+    requested = study_pack_artifacts(artifacts)
+    text_content, pages = await resolve_document(text_content, document_id, focus)
+    builds = study_pack_builds(
+        requested, text_content, pages, document_id, focus, subject, summary_type, full_document,
+        num_questions, adjust_difficulty(difficulty, previous_score), exclude_question_ids, num_cards, card_type, not no_cache
+    )
+    
+    async def labelled(name: str, build: Awaitable):
+        try:
+            return name, await build, None
+        except Exception as e:
+            return name, None, e
+    
+    async def events():
+        tasks = [asyncio.ensure_future(labelled(name, build)) for name, build in builds.items()]
+        pack: Dict = {}
+        errors: Dict[str, str] = {}
+        try:
+            for finished in asyncio.as_completed(tasks):
+                name, result, error = await finished
+                if error is not None:
+                    errors[name] = str(error)
+                    yield {"event": "artifact_error", "artifact": name, "detail": str(error)}
+                else:
+                    pack[name] = result
+                    yield {"event": "artifact", "artifact": name, "data": result.model_dump()}
+        finally:
+            # Only still-running builds are affected: those whose client disconnected
+            for task in tasks:
+                task.cancel()
+        yield {"event": "done", "data": StudyPackResponse(**pack, errors=errors).model_dump()}
+    
+    return ndjson_response(events())
+
+async def job_document(document_id: str) -> Tuple[str, Optional[List[str]]]:
+    document = await document_store.get(document_id)
+    if document is None:
+        raise ValueError("Document expired before the job ran; upload it again")
+    return document["text_content"], document.get("pages")
+
+async def run_summary_job(params: Dict) -> Dict:
+    text_content, pages = await job_document(params["document_id"])
+    summary = await build_summary(text_content, pages, params["summary_type"], params["subject"], params["use_cache"], params["full_document"])
+    return summary.model_dump()
+
+async def run_quiz_job(params: Dict) -> Dict:
+    text_content, pages = await job_document(params["document_id"])
+    quiz = await build_quiz(text_content, pages, params["num_questions"], params["subject"], params["difficulty"], params["use_cache"])
+    return quiz.model_dump()
+
+async def run_flashcards_job(params: Dict) -> Dict:
+    text_content, pages = await job_document(params["document_id"])
+    flashcards = await build_flashcards(text_content, pages, params["num_cards"], params["subject"], params["card_type"], params["use_cache"])
+    return flashcards.model_dump()
+
+async def run_question_bank_job(params: Dict) -> Dict:
+    try:
+        added = await fill_question_bank(params["document_id"], params["subject"], params["difficulty"], params["count"])
+    finally:
+        bank_refills.discard((params["document_id"], params["subject"], params["difficulty"]))
+    stats = await question_bank.stats(params["document_id"])
+    return {"document_id": params["document_id"], "added": added, "questions": stats["questions"], "by_difficulty": stats["by_difficulty"]}
+
+job_queue.register("summary", run_summary_job)
+job_queue.register("quiz", run_quiz_job)
+job_queue.register("flashcards", run_flashcards_job)
+job_queue.register("question_bank", run_question_bank_job)
+
+async def submit_job(kind: str, text_content: Optional[str], document_id: Optional[str], focus: Optional[str], priority: int, params: Dict) -> Dict:
+    """Queue a generation job; the text is kept in the document store and the job refers to it by id"""
+    text_content, pages = await resolve_document(text_content, document_id, focus)
+    if not document_id or focus:
+        # A focused job refers to the focused excerpt, stored as a document of its own
+        document_id = await document_store.put(text_content, pages)
+    try:
+        job = await job_queue.submit(kind, {"document_id": document_id, **params}, priority)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {"job_id": job["id"], "status": job["status"], "status_url": f"/jobs/{job['id']}"}
+
+@app.post("/jobs/summary", status_code=202)
+async def submit_summary_job(
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
+    summary_type: str = Form(...),  # "short", "bullet_points", "detailed"
+    subject: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+    full_document: bool = Form(False),
+    priority: int = Form(0)
+):
+    """Queue a summary generation and return its job id immediately"""
+    return await submit_job("summary", text_content, document_id, focus, priority, {
+        "summary_type": summary_type,
+        "subject": subject,
+        "use_cache": not no_cache,
+        "full_document": full_document
+    })
+
+@app.post("/jobs/quiz", status_code=202)
+async def submit_quiz_job(
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
+    num_questions: int = Form(...),
+    subject: str = Form(...),
+    difficulty: str = Form(...),  # "easy", "medium", "hard"
+    previous_score: Optional[int] = Form(None),
+    no_cache: bool = Form(False),
+    priority: int = Form(0)
+):
+    """Queue a quiz generation and return its job id immediately"""
+    return await submit_job("quiz", text_content, document_id, focus, priority, {
+        "num_questions": num_questions,
+        "subject": subject,
+        "difficulty": adjust_difficulty(difficulty, previous_score),
+        "use_cache": not no_cache
+    })
+
+@app.post("/jobs/flashcards", status_code=202)
+async def submit_flashcards_job(
+    text_content: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    focus: Optional[str] = Form(None),
+    num_cards: int = Form(...),
+    subject: str = Form(...),
+    card_type: str = Form(...),  # "definition", "concept", "fact", "mixed"
+    no_cache: bool = Form(False),
+    priority: int = Form(0)
+):
+    """Queue a flashcard generation and return its job id immediately"""
+    return await submit_job("flashcards", text_content, document_id, focus, priority, {
+        "num_cards": num_cards,
+        "subject": subject,
+        "card_type": card_type,
+        "use_cache": not no_cache
+    })
+
+@app.get("/jobs/stats")
+async def job_stats():
+    """Job counts by status"""
+    return await job_queue.stats()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Job status and, once finished, its result; wait=N long-polls up to N seconds (max 60)"""
+    job = await job_queue.wait(job_id, min(max(wait, 0), 60)) if wait > 0 else await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job_id")
+    return public_job(job)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Subscribe to a job as NDJSON "status" events, ending with a "done" event holding the finished job"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job_id")
+    
+    async def events():
+        current = job
+        status = None
+        while True:
+            if current is None:
+                raise Exception("Job expired")
+            if current["status"] in TERMINAL_STATUSES:
+                yield {"event": "done", "data": public_job(current)}
+                return
+            if current["status"] != status:
+                status = current["status"]
+                yield {"event": "status", "status": status}
+            # Returns early when the job finishes, otherwise re-checks the status every poll interval
+            current = await job_queue.wait(job_id, job_queue.poll_interval)
+    
+    return ndjson_response(events(), check_upstream=False)
 
 @app.post("/check-answers")
 async def check_answers(
     user_answers: List[str] = Form(...),
-    correct_answers: List[str] = Form(...)
+    correct_answers: List[str] = Form(...),
+    question_ids: List[int] = Form([]),
+    document_id: Optional[str] = Form(None)
 ):
-    """Check user answers and provide score"""
+    """Check user answers and provide score; with a bank quiz's question_ids and document_id the attempt feeds the bank's item statistics"""
+    if len(user_answers) != len(correct_answers):
+        raise HTTPException(status_code=400, detail="Answer count mismatch")
+    if question_ids and len(question_ids) != len(correct_answers):
+        raise HTTPException(status_code=400, detail="Question id count mismatch")
     try:
-        if len(user_answers) != len(correct_answers):
-            raise HTTPException(status_code=400, detail="Answer count mismatch")
-        
-        correct_count = sum(1 for user, correct in zip(user_answers, correct_answers) 
-                          if user.strip().lower() == correct.strip().lower())
-        
-        total_questions = len(correct_answers)
-        score = (correct_count / total_questions) * 100
-        
-        # Generate performance feedback
-        if score >= 90:
-            feedback = "Excellent work! You've mastered this material."
-            suggestion = "Consider trying a harder difficulty level."
-        elif score >= 70:
-            feedback = "Good job! You have a solid understanding."
-            suggestion = "Review the areas you missed and try again."
-        elif score >= 50:
-            feedback = "You're getting there! Keep studying."
-            suggestion = "Consider reviewing the material again or trying an easier difficulty."
-        else:
-            feedback = "Don't worry, this is part of learning!"
-            suggestion = "Try reviewing the summary again and attempt an easier quiz."
-        
-        return {
-            "score": score,
-            "correct_answers": correct_count,
-            "total_questions": total_questions,
-            "feedback": feedback,
-            "suggestion": suggestion,
-            "passed": score >= 60
-        }
+        if question_ids and document_id:
+            matches = answer_matches(user_answers, correct_answers)
+            await question_bank.record(document_id, question_ids, [1] * len(matches), [int(match) for match in matches])
+        return grade_answers(user_answers, correct_answers)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking answers: {str(e)}")
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text content from PDF file"""
+def bulk_grader(correct_answers: List[str]) -> BulkGrader:
+    try:
+        return BulkGrader(correct_answers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/check-answers/bulk")
+async def check_answers_bulk(request: BulkGradeRequest):
+    """Grade a whole class against one answer key, with per-question statistics"""
+    grader = bulk_grader(request.correct_answers)
+    if request.question_ids and len(request.question_ids) != len(request.correct_answers):
+        raise HTTPException(status_code=400, detail="Question id count mismatch")
+    submissions = [(submission.student_id, submission.answers) for submission in request.submissions]
     try:
-        doc = fitz.open(file_path)
-        text_content = ""
+        results = []
+        for start in range(0, len(submissions), grading_batch_size):
+            # Batches run off the event loop so a large class doesn't stall other requests
+            batch = await asyncio.to_thread(grader.grade_batch, submissions[start:start + grading_batch_size])
+            if request.include_results:
+                results.extend(batch)
+        if request.question_ids and request.document_id and grader.graded:
+            await question_bank.record(request.document_id, request.question_ids, [grader.graded] * len(grader), grader.correct_counts.tolist())
+        return {"results": results if request.include_results else None, "statistics": grader.statistics()}
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error checking answers: {str(e)}")
+
+@app.post("/check-answers/bulk/stream")
+async def check_answers_bulk_stream(
+    file: UploadFile = File(...),
+    correct_answers: List[str] = Form(...)
+):
+    """Grade a CSV upload ("student_id,answer1,...") as NDJSON "results" events per batch, ending with a "done" event holding the statistics"""
+    grader = bulk_grader(correct_answers)
+    
+    async def events():
+        batches = read_csv_submissions(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""), grading_batch_size)
         
-        for page_num in range(doc.page_count):
-            page = doc.load_page(page_num)
-            text_content += page.get_text()
+        def grade_next() -> Optional[List[Dict]]:
+            batch = next(batches, None)
+            return grader.grade_batch(batch) if batch is not None else None
         
-        doc.close()
-        return text_content.strip()
+        while True:
+            results = await asyncio.to_thread(grade_next)
+            if results is None:
+                break
+            yield {"event": "results", "data": results}
+        yield {"event": "done", "data": grader.statistics()}
     
-    except Exception as e:
-        raise Exception(f"Error extracting text from PDF: {str(e)}")
+    return ndjson_response(events(), check_upstream=False)
 
 if __name__ == "__main__":
     import uvicorn
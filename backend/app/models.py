@@ -1,11 +1,16 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class SummaryRequest(BaseModel):
     text_content: str
     summary_type: str  # "short", "bullet_points", "detailed"
     subject: Optional[str] = None
 
+class SummaryContent(BaseModel):
+    """JSON body the model is asked to return for a summary"""
+    content: str
+    tags: List[str] = []
+
 class SummaryResponse(BaseModel):
     summary: str
     tags: List[str]
@@ -31,6 +36,7 @@ class QuizResponse(BaseModel):
     difficulty: str
     subject: str
     estimated_time: int  # in minutes
+    question_ids: Optional[List[int]] = None  # Question bank ids, when assembled from a document's bank
 
 class AnswerCheckRequest(BaseModel):
     user_answers: List[str]
@@ -44,6 +50,17 @@ class AnswerCheckResponse(BaseModel):
     suggestion: str
     passed: bool
 
+class BulkSubmission(BaseModel):
+    student_id: Optional[str] = None
+    answers: List[str]
+
+class BulkGradeRequest(BaseModel):
+    correct_answers: List[str]
+    submissions: List[BulkSubmission]
+    include_results: bool = True  # False returns only the class statistics
+    document_id: Optional[str] = None
+    question_ids: Optional[List[int]] = None  # With document_id, records each question's results in the bank
+
 class Flashcard(BaseModel):
     front: str
     back: str
@@ -59,4 +76,10 @@ class FlashcardResponse(BaseModel):
     flashcards: List[Flashcard]
     total_cards: int
     subject: str
-    card_type: str 
\ No newline at end of file
+    card_type: str
+
+class StudyPackResponse(BaseModel):
+    summary: Optional[SummaryResponse] = None
+    quiz: Optional[QuizResponse] = None
+    flashcards: Optional[FlashcardResponse] = None
+    errors: Dict[str, str] = {}  # artifact -> reason it could not be generated 
\ No newline at end of file
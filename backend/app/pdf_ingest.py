@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import fitz  # PyMuPDF
+from fastapi import UploadFile
+
+from .document_store import page_fingerprint
+
+
+class PDFLimitError(Exception):
+    """Raised when an upload exceeds the configured byte or page limits"""
+
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """Extract text content from PDF file"""
+    try:
+        doc = fitz.open(file_path)
+        try:
+            pages = [doc.load_page(page_num).get_text() for page_num in range(doc.page_count)]
+        finally:
+            doc.close()
+        return "".join(pages).strip()
+
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+
+
+def _extract_page_range(data: bytes, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) from an in-memory PDF (runs in a worker process)"""
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        return [doc.load_page(page_num).get_text() for page_num in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def _extract_pages(data: bytes, page_numbers: List[int]) -> List[str]:
+    """Extract the text of the given pages from an in-memory PDF (runs in a worker process)"""
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        return [doc.load_page(page_num).get_text() for page_num in page_numbers]
+    finally:
+        doc.close()
+
+
+def _font_mapping(doc: fitz.Document, xref: int) -> bytes:
+    """The parts of a font that decide which text its glyphs extract as: its ToUnicode CMap and custom encoding"""
+    parts = []
+    for key in ("ToUnicode", "Encoding"):
+        kind, value = doc.xref_get_key(xref, key)
+        if kind == "xref":
+            target = int(value.split()[0])
+            parts.append(doc.xref_stream(target) if key == "ToUnicode" else doc.xref_object(target, compressed=True).encode("utf-8"))
+        else:
+            parts.append(value.encode("utf-8"))
+    return b"\0".join(part or b"" for part in parts)
+
+
+def _page_sources(data: bytes, max_pages: int) -> List[str]:
+    """Fingerprint of each page's resolved content, about ten times cheaper than extracting its text.
+
+    Covers the content stream, the form XObjects it draws (nested ones
+    included) and how its fonts map to text, so two pages only match when
+    they would extract the same text. Pages an editor didn't touch keep all
+    of these, so their text can be reused from the version being replaced.
+    Documents over max_pages are rejected before any page is read.
+    """
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        if doc.page_count > max_pages:
+            raise PDFLimitError(f"PDF has {doc.page_count} pages; the limit is {max_pages}")
+        sources = []
+        for page_num in range(doc.page_count):
+            page = doc.load_page(page_num)
+            digest = hashlib.sha256(page.read_contents())
+            # Xrefs are left out throughout: they are renumbered whenever the file is re-saved
+            for xref, name, _, bbox in page.get_xobjects():
+                digest.update(repr((name, tuple(bbox))).encode("utf-8"))
+                digest.update(doc.xref_stream(xref) or b"")
+            fonts = sorted(
+                (repr((font_type, basefont, name, encoding)).encode("utf-8"), _font_mapping(doc, xref))
+                for xref, _, font_type, basefont, name, encoding, _ in page.get_fonts(full=True)
+            )
+            for font in fonts:
+                digest.update(b"".join(font))
+            digest.update(repr((page.rotation, tuple(page.rect))).encode("utf-8"))
+            sources.append(digest.hexdigest())
+        return sources
+    finally:
+        doc.close()
+
+
+def _split_pages(page_numbers: List[int], parts: int) -> List[List[int]]:
+    """Split a list of page numbers into `parts` contiguous, nearly equal runs"""
+    parts = max(1, min(parts, len(page_numbers)))
+    size, extra = divmod(len(page_numbers), parts)
+    runs = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        runs.append(page_numbers[start:stop])
+        start = stop
+    return runs
+
+
+async def read_upload(file: UploadFile, max_bytes: int, chunk_size: int = 1024 * 1024) -> bytes:
+    """Read an upload in chunks, failing fast once it grows past max_bytes"""
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise PDFLimitError(f"PDF exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+    return bytes(buffer)
+
+
+class PDFIngestor:
+    """Extracts PDF text off the event loop, fanning large documents out to a process pool"""
+
+    def __init__(
+        self,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_pages: int = 2000,
+        workers: Optional[int] = None,
+        parallel_min_pages: int = 40,
+    ):
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.parallel_min_pages = parallel_min_pages
+        self.counters = {"pages_extracted": 0, "pages_reused": 0}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> "PDFIngestor":
+        """Build an ingestor from PDF_* environment variables"""
+        workers = os.getenv("PDF_EXTRACT_WORKERS")
+        return cls(
+            max_bytes=int(os.getenv("PDF_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024))),
+            max_pages=int(os.getenv("PDF_MAX_PAGES", "2000")),
+            workers=int(workers) if workers else None,
+            parallel_min_pages=int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40")),
+        )
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn avoids forking a process that already runs an event loop and threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _extract_pages(self, data: bytes, page_numbers: List[int], whole: bool) -> List[str]:
+        """Text of the given pages, in one worker when `whole`, otherwise fanned out once there are enough"""
+        if not page_numbers:
+            return []
+        if self.workers <= 1 or (not whole and len(page_numbers) < self.parallel_min_pages):
+            return await asyncio.to_thread(_extract_pages, data, page_numbers)
+
+        # One run per worker keeps the number of copies of `data` sent to
+        # worker processes bounded by the pool size
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        futures = [
+            loop.run_in_executor(pool, _extract_pages, data, run)
+            for run in _split_pages(page_numbers, 1 if whole else self.workers)
+        ]
+        pages: List[str] = []
+        for chunk in await asyncio.gather(*futures):
+            pages.extend(chunk)
+        return pages
+
+    async def _ingest(self, data: bytes, whole: bool, previous: Optional[Dict]) -> Dict:
+        if len(data) > self.max_bytes:
+            raise PDFLimitError(f"PDF exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        try:
+            sources = await asyncio.to_thread(_page_sources, data, self.max_pages)
+        except PDFLimitError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error opening PDF: {str(e)}")
+        timings["open_ms"] = (time.perf_counter() - started) * 1000
+
+        page_count = len(sources)
+
+        # Only pages that differ from the version being replaced are extracted
+        stage = time.perf_counter()
+        known: Dict[str, str] = {}
+        if previous and previous.get("sources") and previous.get("pages"):
+            known = dict(zip(previous["sources"], previous["pages"]))
+        pages: List[Optional[str]] = [known.get(source) for source in sources]
+        missing = [page_num for page_num, text in enumerate(pages) if text is None]
+        try:
+            extracted = await self._extract_pages(data, missing, whole)
+        except Exception as e:
+            raise Exception(f"Error extracting text from PDF: {str(e)}")
+        for page_num, text in zip(missing, extracted):
+            pages[page_num] = text
+        self.counters["pages_extracted"] += len(missing)
+        self.counters["pages_reused"] += page_count - len(missing)
+        timings["extract_ms"] = (time.perf_counter() - stage) * 1000
+
+        stage = time.perf_counter()
+        text_content = "".join(pages).strip()
+        fingerprints = [page_fingerprint(text) for text in pages]
+        timings["join_ms"] = (time.perf_counter() - stage) * 1000
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+
+        return {
+            "text_content": text_content,
+            "pages": pages,
+            "page_count": page_count,
+            "fingerprints": fingerprints,
+            "sources": sources,
+            "reused_pages": page_count - len(missing),
+            "timings": {name: round(value, 2) for name, value in timings.items()},
+        }
+
+    async def ingest(self, data: bytes, previous: Optional[Dict] = None) -> Dict:
+        """Extract all page texts from PDF bytes and report per-stage timings in milliseconds.
+
+        `previous` is the stored version this upload replaces (a re-upload
+        after editing a few slides); its pages whose source is unchanged are
+        reused instead of extracted again.
+        """
+        return await self._ingest(data, whole=False, previous=previous)
+
+    async def ingest_whole(self, data: bytes) -> Dict:
+        """Like ingest(), but extracts the whole document in one worker.
+
+        Batches parallelize across files rather than across pages: each file
+        is extracted by one process, and only one copy of it is sent over.
+        """
+        return await self._ingest(data, whole=True, previous=None)
+
+    def stats(self) -> Dict:
+        return dict(self.counters)
@@ -0,0 +1,225 @@
+import os
+import string
+from typing import Dict, List, Optional
+
+
+SYSTEM_MESSAGE = "You are QuizForge AI, an expert educational assistant specialized in creating summaries and quizzes from academic content. Always provide accurate, well-structured responses."
+
+# The document goes right after the system message and before any task text,
+# so every summary, quiz and flashcard call on the same text shares one
+# prompt prefix that the provider can cache
+DOCUMENT_HEADER = "Source text:\n"
+
+# Providers that only cache prompts at explicit cache_control breakpoints;
+# the others (OpenAI, DeepSeek, Groq, ...) cache shared prefixes automatically
+CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/", "google/gemini")
+
+SUMMARY_FORMAT = 'Respond with JSON only, in this format:\n{"content": "your summary here", "tags": ["key", "topic", "tags"]}'
+BULLET_SUMMARY_FORMAT = 'Respond with JSON only, in this format:\n{"content": "• Main point 1\\n  - Sub-point\\n• Main point 2\\n  - Sub-point", "tags": ["key", "topic", "tags"]}'
+QUIZ_FORMAT = (
+    'Respond with JSON only, in this format:\n'
+    '{"questions": [{"question": "What is...?", "options": ["Option A", "Option B", "Option C", "Option D"], '
+    '"correct_answer": "Option B", "explanation": "Brief explanation of why this is correct"}]}'
+)
+FLASHCARD_FORMAT = (
+    'Respond with JSON only, in this format:\n'
+    '{"flashcards": [{"front": "What is photosynthesis?", '
+    '"back": "The process by which plants convert light energy into chemical energy", "category": "Biology"}]}'
+)
+
+DIFFICULTY_INSTRUCTIONS = {
+    "easy": "Focus on basic concepts, definitions, and straightforward facts. Avoid complex reasoning.",
+    "medium": "Include some analysis and application questions. Mix factual and conceptual questions.",
+    "hard": "Focus on critical thinking, analysis, synthesis, and complex problem-solving."
+}
+
+CARD_TYPE_INSTRUCTIONS = {
+    "definition": "Create cards with terms/concepts on the front and their definitions on the back.",
+    "concept": "Create cards with conceptual questions on the front and explanations on the back.",
+    "fact": "Create cards with factual questions on the front and specific answers on the back.",
+    "mixed": "Create a mix of definitions, concepts, and factual questions."
+}
+
+
+class Prompt:
+    """A rendered prompt: system message, then the document, then the task"""
+
+    def __init__(self, document: str, task: str, system: str = SYSTEM_MESSAGE):
+        self.system = system
+        self.document = document
+        self.task = task
+
+    def extend(self, text: str) -> None:
+        """Append instructions to the task; the shared prefix is left alone"""
+        self.task += "\n\n" + text
+
+    def messages(self, cache_control: bool = False) -> List[Dict]:
+        """Chat messages for the request; with cache_control the document is marked as a cache breakpoint"""
+        document = DOCUMENT_HEADER + self.document
+        if cache_control:
+            content = [
+                {"type": "text", "text": document, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": self.task}
+            ]
+        else:
+            content = f"{document}\n\n{self.task}"
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": content}
+        ]
+
+
+class PromptTemplate:
+    """Task instructions compiled once at import; rendering only fills in the named fields"""
+
+    def __init__(self, task: str, response_format: Optional[str] = None):
+        self.task = task.strip()
+        self.fields = {field for _, field, _, _ in string.Formatter().parse(self.task) if field}
+        self.suffix = f"\n\n{response_format}" if response_format else ""
+
+    def render(self, document: str, **params) -> Prompt:
+        missing = self.fields - params.keys()
+        if missing:
+            raise KeyError(f"Missing prompt fields: {', '.join(sorted(missing))}")
+        task = self.task.format_map(params) if self.fields else self.task
+        return Prompt(document, task + self.suffix)
+
+
+SUMMARY_TEMPLATES = {
+    "short": PromptTemplate(
+        "Write a concise summary of the source text{subject_context}. "
+        "Keep it to 2-3 paragraphs maximum, focusing on the most important points.",
+        SUMMARY_FORMAT
+    ),
+    "bullet_points": PromptTemplate(
+        "Write a bullet-point summary of the source text{subject_context}. "
+        "Organize key points into clear, actionable bullet points with sub-points where needed.",
+        BULLET_SUMMARY_FORMAT
+    ),
+    "detailed": PromptTemplate(
+        "Write a comprehensive, detailed summary of the source text{subject_context}. "
+        "Include all major concepts, methodologies, findings, and conclusions. "
+        "Organize into clear sections with headings.",
+        'Respond with JSON only, in this format:\n{"content": "your detailed summary with sections and headings", "tags": ["key", "topic", "tags"]}'
+    ),
+}
+
+SECTION_SUMMARY_TEMPLATE = PromptTemplate(
+    "The source text is section {number} of {total} of a longer document{subject_context}. "
+    "Summarize it, keeping every important concept, definition, finding and conclusion. "
+    "Do not add information that is not in the text.",
+    'Respond with JSON only, in this format:\n{"content": "your section summary here", "tags": ["key", "topic", "tags"]}'
+)
+
+QUIZ_TEMPLATE = PromptTemplate(
+    "Create a {difficulty} level quiz with {num_questions} multiple-choice questions on the source text ({subject}).\n"
+    "Instructions: {instructions}\n"
+    "Each question must be clear and specific, with 4 answer options, the correct answer, and optionally a brief explanation. "
+    "Base the questions directly on the source text and test understanding rather than memorization.",
+    QUIZ_FORMAT
+)
+
+FLASHCARD_TEMPLATE = PromptTemplate(
+    "Create {num_cards} {card_type} flashcards on the source text ({subject}).\n"
+    "Instructions: {instructions}\n"
+    "Front: a question, term, or concept. Back: the answer, definition, or explanation, fully answering the front. "
+    "Keep both sides concise but informative, and base every card directly on the source text's key concepts.",
+    FLASHCARD_FORMAT
+)
+
+TOPICS_TEMPLATE = PromptTemplate(
+    "Extract 5-8 key topics or themes of the source text. "
+    "Return only the topics as a comma-separated list."
+)
+
+
+def subject_context(subject: Optional[str]) -> str:
+    return f" in the field of {subject}" if subject else ""
+
+
+def summary_prompt(text_content: str, summary_type: str, subject: Optional[str]) -> Prompt:
+    return SUMMARY_TEMPLATES[summary_type].render(text_content, subject_context=subject_context(subject))
+
+
+def section_summary_prompt(chunk: str, index: int, total: int, subject: Optional[str]) -> Prompt:
+    return SECTION_SUMMARY_TEMPLATE.render(chunk, number=index + 1, total=total, subject_context=subject_context(subject))
+
+
+def quiz_prompt(text_content: str, num_questions: int, subject: str, difficulty: str) -> Prompt:
+    return QUIZ_TEMPLATE.render(
+        text_content,
+        difficulty=difficulty,
+        num_questions=num_questions,
+        subject=subject,
+        instructions=DIFFICULTY_INSTRUCTIONS[difficulty]
+    )
+
+
+def flashcard_prompt(text_content: str, num_cards: int, subject: str, card_type: str) -> Prompt:
+    return FLASHCARD_TEMPLATE.render(
+        text_content,
+        num_cards=num_cards,
+        card_type=card_type,
+        subject=subject,
+        instructions=CARD_TYPE_INSTRUCTIONS[card_type]
+    )
+
+
+def topics_prompt(sample: str) -> Prompt:
+    return TOPICS_TEMPLATE.render(sample)
+
+
+class PromptCachePolicy:
+    """Decides which upstream models get explicit cache_control breakpoints.
+
+    PROMPT_CACHE_HINTS is "auto" (only models that need explicit breakpoints),
+    "always" or "never".
+    """
+
+    def __init__(self, mode: str = "auto"):
+        if mode not in ("auto", "always", "never"):
+            raise ValueError(f"Unknown PROMPT_CACHE_HINTS mode: {mode}")
+        self.mode = mode
+
+    @classmethod
+    def from_env(cls) -> "PromptCachePolicy":
+        return cls(os.getenv("PROMPT_CACHE_HINTS", "auto").strip().lower())
+
+    def cache_control(self, model: str) -> bool:
+        if self.mode == "auto":
+            return model.lower().startswith(CACHE_CONTROL_MODEL_PREFIXES)
+        return self.mode == "always"
+
+
+class TokenUsage:
+    """Prompt, cached prompt and completion tokens reported by the upstream, per task"""
+
+    def __init__(self):
+        self.tasks: Dict[str, Dict[str, int]] = {}
+
+    def record(self, task: str, usage: Optional[Dict]) -> None:
+        if not usage:
+            return
+        totals = self.tasks.setdefault(task, {"calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        totals["cached_prompt_tokens"] += cached_tokens(usage)
+        totals["completion_tokens"] += usage.get("completion_tokens") or 0
+
+    def stats(self) -> Dict:
+        tasks = {}
+        for task, totals in self.tasks.items():
+            calls = totals["calls"]
+            tasks[task] = {
+                **totals,
+                "prompt_tokens_per_call": round(totals["prompt_tokens"] / calls, 1),
+                "completion_tokens_per_call": round(totals["completion_tokens"] / calls, 1),
+                "cached_prompt_ratio": round(totals["cached_prompt_tokens"] / totals["prompt_tokens"], 4) if totals["prompt_tokens"] else 0.0,
+            }
+        return {"tasks": tasks}
+
+
+def cached_tokens(usage: Dict) -> int:
+    """Prompt tokens served from the provider's prompt cache (OpenAI-style usage details)"""
+    details = usage.get("prompt_tokens_details") or {}
+    return details.get("cached_tokens") or 0
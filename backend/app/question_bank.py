@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from .questions import is_near_duplicate, question_terms
+from .retrieval import index_terms
+
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+# Levels tried, in order, when the bank has too few questions at the requested one
+FALLBACK_ORDER = {
+    "easy": ("easy", "medium", "hard"),
+    "medium": ("medium", "easy", "hard"),
+    "hard": ("hard", "medium", "easy"),
+}
+
+# Share of students answering correctly above which a question counts as easy, and below which as hard
+EASY_RATE = 0.8
+HARD_RATE = 0.4
+
+
+def question_fingerprint(question: str) -> str:
+    return hashlib.sha256(" ".join(question.lower().split()).encode("utf-8")).hexdigest()[:16]
+
+
+# A question's difficulty from graded attempts once there are :min_attempts of them, otherwise the
+# generated label. Laplace smoothing keeps a handful of attempts from looking like 0% or 100%.
+LEVEL_SQL = (
+    "CASE WHEN attempts < :min_attempts THEN difficulty"
+    " WHEN (correct + 1.0) / (attempts + 2) >= :easy_rate THEN 'easy'"
+    " WHEN (correct + 1.0) / (attempts + 2) < :hard_rate THEN 'hard'"
+    " ELSE 'medium' END"
+)
+
+# True for the ids in the JSON array bound to :exclude
+EXCLUDED_SQL = "id IN (SELECT value FROM json_each(:exclude))"
+
+
+def section_topics(sections: Sequence[str], terms: int = 2) -> Dict[str, str]:
+    """Label each distinct section by its most distinctive terms (frequent in it, rare in the other sections)"""
+    counts = {section: Counter(term for term in index_terms(section) if len(term) > 3 and not term.isdigit()) for section in set(sections)}
+    spread = Counter(term for counter in counts.values() for term in counter)
+    topics = {}
+    for section, counter in counts.items():
+        ranked = sorted(counter, key=lambda term: (-counter[term] / spread[term], term))
+        topics[section] = ", ".join(ranked[:terms]) or "general"
+    return topics
+
+
+class QuestionBank:
+    """Per-document question bank in SQLite, indexed by difficulty and topic.
+
+    The bank is filled with generated questions once per subject, then
+    quizzes are assembled from it without calling the model: questions at
+    the requested level (judged by how students actually did once they have
+    `min_attempts` graded answers) come first, spread round-robin across
+    topics, least-served first so retakes see new questions. Selection runs
+    in SQL, so only the questions a quiz uses are loaded.
+    """
+
+    def __init__(self, path: str = ":memory:", fill_size: int = 20, min_attempts: int = 5):
+        self.fill_size = fill_size
+        self.min_attempts = min_attempts
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path) if path != ":memory:" else ""
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            " id INTEGER PRIMARY KEY, document_id TEXT NOT NULL, subject TEXT NOT NULL,"
+            " difficulty TEXT NOT NULL, topic TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL, question TEXT NOT NULL, options TEXT NOT NULL,"
+            " correct_answer TEXT NOT NULL, explanation TEXT, created_at REAL NOT NULL,"
+            " served INTEGER NOT NULL DEFAULT 0, last_served REAL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, correct INTEGER NOT NULL DEFAULT 0,"
+            " UNIQUE (document_id, subject, fingerprint))"
+        )
+
+    @classmethod
+    def from_env(cls) -> "QuestionBank":
+        """Build a bank from QUESTION_BANK_* environment variables"""
+        return cls(
+            path=os.getenv("QUESTION_BANK_PATH", os.path.join(tempfile.gettempdir(), "quizforge-question-bank.sqlite3")),
+            fill_size=int(os.getenv("QUESTION_BANK_FILL_SIZE", "20")),
+            min_attempts=int(os.getenv("QUESTION_BANK_MIN_ATTEMPTS", "5")),
+        )
+
+    def _params(self, document_id: str, subject: str, exclude: Sequence[int] = (), **params) -> Dict:
+        return {
+            "document_id": document_id, "subject": subject, "exclude": json.dumps(list(exclude)),
+            "min_attempts": self.min_attempts, "easy_rate": EASY_RATE, "hard_rate": HARD_RATE, **params,
+        }
+
+    def _add(self, document_id: str, subject: str, difficulty: str, items: List[Tuple[str, Dict]]) -> int:
+        """Insert (topic, question) pairs, skipping near-duplicates of questions already banked"""
+        known = [question_terms(question) for question in self._questions(document_id, subject)]
+        rows = []
+        for topic, question in items:
+            terms = question_terms(question["question"])
+            if any(is_near_duplicate(terms, other) for other in known):
+                continue
+            known.append(terms)
+            rows.append((
+                document_id, subject, difficulty, topic, question_fingerprint(question["question"]), question["question"],
+                json.dumps(question["options"]), question["correct_answer"], question.get("explanation"), time.time(),
+            ))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO questions (document_id, subject, difficulty, topic, fingerprint, question, options,"
+                " correct_answer, explanation, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def _count(self, params: Dict) -> int:
+        return self._conn.execute(
+            f"SELECT COUNT(*) FROM questions WHERE document_id = :document_id AND subject = :subject"
+            f" AND {LEVEL_SQL} = :difficulty AND NOT {EXCLUDED_SQL}",
+            params,
+        ).fetchone()[0]
+
+    def _available(self, document_id: str, subject: str, difficulty: str, exclude: Sequence[int]) -> int:
+        with self._lock:
+            return self._count(self._params(document_id, subject, exclude, difficulty=difficulty))
+
+    def _assemble(self, document_id: str, subject: str, count: int, difficulty: str, exclude: Sequence[int]) -> Dict:
+        first, second, _ = FALLBACK_ORDER[difficulty]
+        params = self._params(document_id, subject, exclude, difficulty=difficulty, first=first, second=second, count=count)
+        with self._lock:
+            # Excluded questions are only repeated when the rest of the bank cannot fill the quiz, then
+            # levels go in fallback order; within them `turn` deals one question per topic per round,
+            # least served first, so a quiz covers the whole document
+            picked = self._conn.execute(
+                "WITH banked AS ("
+                f" SELECT id, topic, question, options, correct_answer, explanation, served, {LEVEL_SQL} AS level,"
+                f" {EXCLUDED_SQL} AS repeated"
+                " FROM questions WHERE document_id = :document_id AND subject = :subject),"
+                " dealt AS (SELECT *, ROW_NUMBER() OVER (PARTITION BY repeated, level, topic ORDER BY served, random()) AS turn FROM banked)"
+                " SELECT * FROM dealt"
+                " ORDER BY repeated, CASE level WHEN :first THEN 0 WHEN :second THEN 1 ELSE 2 END, turn, random()"
+                " LIMIT :count",
+                params,
+            ).fetchall()
+            if picked:
+                self._conn.executemany(
+                    "UPDATE questions SET served = served + 1, last_served = ? WHERE id = ?",
+                    [(time.time(), row["id"]) for row in picked],
+                )
+            # Questions at the requested level a follow-up quiz could still use
+            remaining = self._count({**params, "exclude": json.dumps(list(exclude) + [row["id"] for row in picked])})
+        return {
+            "question_ids": [row["id"] for row in picked],
+            "questions": [
+                {
+                    "question": row["question"],
+                    "options": json.loads(row["options"]),
+                    "correct_answer": row["correct_answer"],
+                    "explanation": row["explanation"],
+                }
+                for row in picked
+            ],
+            "remaining": remaining,
+        }
+
+    def _record(self, document_id: str, question_ids: Sequence[int], attempts: Sequence[int], correct: Sequence[int]) -> int:
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE questions SET attempts = attempts + ?, correct = correct + ? WHERE id = ? AND document_id = ?",
+                [(tries, right, question_id, document_id) for question_id, tries, right in zip(question_ids, attempts, correct)],
+            )
+            return self._conn.total_changes - before
+
+    def _questions(self, document_id: str, subject: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question FROM questions WHERE document_id = ? AND subject = ? ORDER BY id", (document_id, subject)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _stats(self, document_id: str) -> Dict:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT *, {LEVEL_SQL} AS level FROM questions WHERE document_id = :document_id ORDER BY id",
+                self._params(document_id, ""),
+            ).fetchall()
+        levels = Counter(row["level"] for row in rows)
+        return {
+            "document_id": document_id,
+            "questions": len(rows),
+            "by_subject": dict(Counter(row["subject"] for row in rows).most_common()),
+            "by_difficulty": {level: levels.get(level, 0) for level in DIFFICULTIES},
+            "by_topic": dict(Counter(row["topic"] for row in rows).most_common()),
+            "attempts": sum(row["attempts"] for row in rows),
+            "served": sum(row["served"] for row in rows),
+            "items": [
+                {
+                    "id": row["id"],
+                    "subject": row["subject"],
+                    "topic": row["topic"],
+                    "generated_difficulty": row["difficulty"],
+                    "difficulty": row["level"],
+                    "attempts": row["attempts"],
+                    "correct_rate": round(row["correct"] / row["attempts"], 4) if row["attempts"] else None,
+                    "served": row["served"],
+                }
+                for row in rows
+            ],
+        }
+
+    async def add(self, document_id: str, subject: str, difficulty: str, pairs: List[Tuple[str, Dict]]) -> int:
+        """Bank (section, question) pairs from ai_service.generate_question_pool; returns how many were new"""
+        topics = section_topics([section for section, _ in pairs])
+        return await asyncio.to_thread(self._add, document_id, subject, difficulty, [(topics[section], question) for section, question in pairs])
+
+    async def available(self, document_id: str, subject: str, difficulty: str, exclude: Sequence[int] = ()) -> int:
+        return await asyncio.to_thread(self._available, document_id, subject, difficulty, exclude)
+
+    async def assemble(self, document_id: str, subject: str, count: int, difficulty: str, exclude: Sequence[int] = ()) -> Dict:
+        """{"question_ids", "questions", "remaining"} for a quiz of up to `count` questions"""
+        return await asyncio.to_thread(self._assemble, document_id, subject, count, difficulty, exclude)
+
+    async def record(self, document_id: str, question_ids: Sequence[int], attempts: Sequence[int], correct: Sequence[int]) -> int:
+        """Add graded attempts (and how many were correct) per question; returns how many questions were found"""
+        return await asyncio.to_thread(self._record, document_id, question_ids, attempts, correct)
+
+    async def questions(self, document_id: str, subject: str) -> List[str]:
+        return await asyncio.to_thread(self._questions, document_id, subject)
+
+    async def stats(self, document_id: str) -> Dict:
+        return await asyncio.to_thread(self._stats, document_id)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
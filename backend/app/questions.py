@@ -0,0 +1,39 @@
+import re
+from typing import Dict, FrozenSet, List
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Function words that make otherwise different questions look alike
+STOPWORDS = frozenset(
+    "a an and are as at be by does did do for from how in is it its of on or "
+    "that the this to was were what when where which who whom why with".split()
+)
+
+
+def question_terms(question: str) -> FrozenSet[str]:
+    """Normalized content words of a question stem"""
+    return frozenset(word for word in _WORD.findall(question.lower()) if word not in STOPWORDS)
+
+
+def is_near_duplicate(a: FrozenSet[str], b: FrozenSet[str], threshold: float = 0.7) -> bool:
+    """Jaccard similarity at or above the threshold, or one stem's terms fully inside the other's"""
+    if not a or not b:
+        return a == b
+    shared = len(a & b)
+    if shared == min(len(a), len(b)) and shared >= 2:
+        return True
+    return shared / len(a | b) >= threshold
+
+
+def dedupe_questions(questions: List[Dict], threshold: float = 0.7) -> List[Dict]:
+    """Drop questions whose stem is a near-duplicate of an earlier one, keeping order"""
+    kept: List[Dict] = []
+    kept_terms: List[FrozenSet[str]] = []
+    for question in questions:
+        terms = question_terms(question.get("question", ""))
+        if any(is_near_duplicate(terms, other, threshold) for other in kept_terms):
+            continue
+        kept.append(question)
+        kept_terms.append(terms)
+    return kept
@@ -0,0 +1,367 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_STRING_END = re.compile(r'["\\]')
+# strict=False accepts raw newlines/tabs inside strings, which models often emit
+_DECODER = json.JSONDecoder(strict=False)
+
+
+def strip_reasoning(text: str) -> str:
+    """Remove <think>...</think> reasoning blocks (an unclosed one runs to the end)"""
+    if "<think>" not in text:
+        return text
+    parts: List[str] = []
+    pos = 0
+    while True:
+        start = text.find("<think>", pos)
+        if start == -1:
+            parts.append(text[pos:])
+            break
+        parts.append(text[pos:start])
+        end = text.find("</think>", start)
+        if end == -1:
+            break
+        pos = end + len("</think>")
+    return "".join(parts)
+
+
+def strip_code_fences(text: str) -> str:
+    """Return the body of the first ``` fenced block, or the text unchanged if there is none"""
+    start = text.find("```")
+    if start == -1:
+        return text
+    body_start = text.find("\n", start)
+    if body_start == -1:
+        return text
+    end = text.find("```", body_start)
+    return text[body_start + 1:end] if end != -1 else text[body_start + 1:]
+
+
+def _remove_trailing_commas(candidate: str) -> str:
+    """Drop commas directly before a closing bracket, ignoring string contents"""
+    out: List[str] = []
+    in_string = escaped = False
+    pending_comma = -1
+    for char in candidate:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            pending_comma = len(out)
+        elif char in "}]" and pending_comma != -1:
+            del out[pending_comma]
+        if not char.isspace() and char != ",":
+            pending_comma = -1
+        out.append(char)
+    return "".join(out)
+
+
+def _loads(candidate: str) -> Optional[Any]:
+    try:
+        return _DECODER.decode(candidate)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return _DECODER.decode(_remove_trailing_commas(candidate))
+    except json.JSONDecodeError:
+        return None
+
+
+def _scan_objects(text: str):
+    """Yield (start, end, closers) for each top-level {...} in one linear pass.
+
+    Regex searches jump straight to the next structural character (or, inside
+    a string, to the next quote or backslash), so ordinary text is skipped at
+    C speed. A truncated final object is reported with the closing brackets
+    that complete it at its last complete nested value.
+    """
+    length = len(text)
+    pos = 0
+    while True:
+        start = text.find("{", pos)
+        if start == -1:
+            return
+        stack = ["{"]
+        pos = start + 1
+        # Last point inside the object where a nested value had just closed
+        safe_end = -1
+        safe_stack: List[str] = []
+        while stack:
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                pos = length
+                break
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                while True:
+                    match = _STRING_END.search(text, pos)
+                    if match is None:
+                        pos = length
+                        break
+                    pos = match.end()
+                    if match.group() == "\\":
+                        pos += 1  # skip the escaped character
+                        continue
+                    break
+                if pos >= length:
+                    break
+            elif char in "{[":
+                stack.append(char)
+            else:
+                stack.pop()
+                if stack:
+                    safe_end, safe_stack = pos, list(stack)
+        if stack:
+            if safe_end != -1:
+                yield start, safe_end, "".join(_CLOSERS[opener] for opener in reversed(safe_stack))
+            return
+        yield start, pos, ""
+
+
+def parse_json_object(text: str) -> Optional[Dict]:
+    """Find and decode the first valid JSON object in a model response.
+
+    Strips <think> blocks and code fences, scans once for balanced objects,
+    and repairs trailing commas and outputs cut off mid-object.
+    """
+    text = strip_reasoning(text)
+    if "```" in text:
+        fenced = strip_code_fences(text)
+        if "{" in fenced:
+            text = fenced
+    # Fast path: well-formed output decodes straight from the first brace in C
+    first = text.find("{")
+    if first == -1:
+        return None
+    try:
+        value, _ = _DECODER.raw_decode(text, first)
+        if isinstance(value, dict):
+            return value
+    except json.JSONDecodeError:
+        pass
+    for start, end, closers in _scan_objects(text):
+        candidate = text[start:end]
+        if closers:
+            candidate = candidate.rstrip().rstrip(",") + closers
+        value = _loads(candidate)
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def parse_model(text: str, model: Type[BaseModel]) -> Optional[Dict]:
+    """Parse a response into one object validated against a pydantic model"""
+    value = parse_json_object(text)
+    if value is None:
+        return None
+    try:
+        return model.model_validate(value).model_dump()
+    except ValidationError:
+        return None
+
+
+def parse_items(text: str, key: str, model: Type[BaseModel], limit: Optional[int] = None) -> Optional[List[Dict]]:
+    """Parse the `key` array of a response, keeping only items that validate.
+
+    Returns None when no JSON object with that array is found.
+    """
+    value = parse_json_object(text)
+    if value is None or not isinstance(value.get(key), list):
+        return None
+    items: List[Dict] = []
+    for candidate in value[key]:
+        try:
+            items.append(model.model_validate(candidate).model_dump())
+        except ValidationError:
+            continue
+        if limit is not None and len(items) >= limit:
+            break
+    return items
+
+
+class _ThinkSkipper:
+    """Drops a leading <think>...</think> reasoning block from streamed text"""
+
+    def __init__(self):
+        self._pending = ""
+        self._done = False
+
+    def feed(self, delta: str) -> str:
+        if self._done:
+            return delta
+        self._pending += delta
+        stripped = self._pending.lstrip()
+        if not stripped:
+            return ""
+        if "<think>".startswith(stripped[:7]) and len(stripped) < 7:
+            return ""  # could still become "<think>"
+        if not stripped.startswith("<think>"):
+            self._done = True
+            text, self._pending = self._pending, ""
+            return text
+        end = stripped.find("</think>")
+        if end == -1:
+            return ""
+        self._done = True
+        text = stripped[end + len("</think>"):]
+        self._pending = ""
+        return text
+
+
+class StreamingArrayParser:
+    """Incrementally extracts completed objects from a JSON array in a streamed completion.
+
+    Feed completion deltas as they arrive; every call returns the objects of
+    the `key` array (e.g. "questions") that have been fully received since the
+    previous call. The scan is linear: each character is examined once.
+    """
+
+    def __init__(self, key: str):
+        self.key = f'"{key}"'
+        self._think = _ThinkSkipper()
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = -1
+        self._closed = False
+
+    def feed(self, delta: str) -> List[Dict]:
+        if self._closed:
+            return []
+        self._buffer += self._think.feed(delta)
+        items: List[Dict] = []
+
+        if not self._in_array:
+            key_at = self._buffer.find(self.key)
+            if key_at == -1:
+                return items
+            bracket = self._buffer.find("[", key_at + len(self.key))
+            if bracket == -1:
+                return items
+            self._in_array = True
+            self._pos = bracket + 1
+
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._item_start = pos
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._item_start != -1:
+                    try:
+                        item = _DECODER.decode(buffer[self._item_start:pos + 1])
+                    except json.JSONDecodeError:
+                        item = None
+                    if isinstance(item, dict):
+                        items.append(item)
+                    self._item_start = -1
+            elif char == "]" and self._depth == 0:
+                # End of the array; ignore anything after it
+                self._closed = True
+                self._buffer = ""
+                return items
+            pos += 1
+
+        # Keep only the unfinished item so the buffer does not grow without bound
+        if self._item_start != -1:
+            self._buffer = buffer[self._item_start:]
+            pos -= self._item_start
+            self._item_start = 0
+        else:
+            self._buffer = ""
+            pos = 0
+        self._pos = pos
+        return items
+
+
+class StreamingStringField:
+    """Incrementally decodes the value of one JSON string field (e.g. "content") from a stream"""
+
+    def __init__(self, key: str):
+        self.key = f'"{key}"'
+        self._think = _ThinkSkipper()
+        self._buffer = ""
+        self._started = False
+        self._finished = False
+        self._escape: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, delta: str) -> str:
+        if self._finished:
+            return ""
+        self._buffer += self._think.feed(delta)
+
+        if not self._started:
+            key_at = self._buffer.find(self.key)
+            if key_at == -1:
+                # Keep enough of the tail to match a key split across deltas
+                self._buffer = self._buffer[-len(self.key):]
+                return ""
+            colon = self._buffer.find(":", key_at + len(self.key))
+            quote = self._buffer.find('"', colon + 1) if colon != -1 else -1
+            if quote == -1:
+                self._buffer = self._buffer[key_at:]
+                return ""
+            self._started = True
+            self._buffer = self._buffer[quote + 1:]
+
+        out: List[str] = []
+        buffer = self._buffer
+        i = 0
+        while i < len(buffer):
+            char = buffer[i]
+            if self._escape is not None:
+                self._escape += char
+                if self._escape[0] == "u":
+                    if len(self._escape) == 5:
+                        try:
+                            out.append(chr(int(self._escape[1:], 16)))
+                        except ValueError:
+                            pass
+                        self._escape = None
+                else:
+                    out.append(_ESCAPES.get(self._escape, self._escape))
+                    self._escape = None
+            elif char == "\\":
+                self._escape = ""
+            elif char == '"':
+                self._finished = True
+                break
+            else:
+                out.append(char)
+            i += 1
+        self._buffer = ""
+        return "".join(out)
@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .chunking import split_into_chunks
+from .document_store import make_document_id
+from .questions import STOPWORDS
+from .singleflight import SingleFlight
+
+
+_TERM = re.compile(r"\w+")
+_PAGE_RANGE = re.compile(r"^\s*(?:pages?|pp?\.?)\s*(\d+)(?:\s*(?:-|–|to)\s*(\d+))?\s*$", re.IGNORECASE)
+_SECTION = re.compile(r"^\s*(chapter|section|unit|part|lecture|module)\s+([\w.]+)\s*$", re.IGNORECASE)
+
+# BM25 parameters (Robertson et al. defaults)
+_K1 = 1.2
+_B = 0.75
+
+
+def index_terms(text: str) -> List[str]:
+    """Lower-cased content terms; numbers are kept so "chapter 4" still means something"""
+    return [
+        term for term in _TERM.findall(text.lower())
+        if term not in STOPWORDS and (len(term) > 1 or term.isdigit())
+    ]
+
+
+def page_chunks(text_content: str, pages: Optional[List[str]], chunk_chars: int) -> List[Tuple[int, str]]:
+    """(1-based page number, chunk text) pairs; chunks never span pages. Page is 0 without page data"""
+    if not pages:
+        return [(0, chunk) for chunk in split_into_chunks(text_content, chunk_chars, 0)]
+    chunks = []
+    for number, page in enumerate(pages, start=1):
+        chunks.extend((number, chunk) for chunk in split_into_chunks(page, chunk_chars, 0))
+    return chunks
+
+
+def index_key(text_content: str, pages: Optional[List[str]], chunk_chars: int) -> str:
+    """Directory name of a document's index: its text plus the page layout and chunk size the chunks came from"""
+    layout = json.dumps([len(page) for page in pages] if pages else None) + f"/{chunk_chars}"
+    return f"{make_document_id(text_content)}-{hashlib.sha256(layout.encode('utf-8')).hexdigest()[:12]}"
+
+
+class RetrievalIndex:
+    """BM25 inverted index over one document's chunks, stored as memory-mapped NumPy arrays.
+
+    Files in the index directory:
+      chunks.bin / chunk_offsets.npy / chunk_pages.npy - UTF-8 chunk text, boundaries and page numbers
+      vocab.json - term -> term id
+      postings_offsets.npy / postings_chunks.npy / postings_tf.npy - CSR postings per term id
+      chunk_lengths.npy - terms per chunk, for BM25 length normalization
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "vocab.json"), "r", encoding="utf-8") as handle:
+            self.vocab: Dict[str, int] = json.load(handle)
+        load = lambda name: np.load(os.path.join(directory, name), mmap_mode="r")
+        self.chunk_offsets = load("chunk_offsets.npy")
+        self.chunk_pages = load("chunk_pages.npy")
+        self.postings_offsets = load("postings_offsets.npy")
+        self.postings_chunks = load("postings_chunks.npy")
+        self.postings_tf = load("postings_tf.npy")
+        self.chunk_lengths = load("chunk_lengths.npy")
+        self.text = np.memmap(os.path.join(directory, "chunks.bin"), dtype=np.uint8, mode="r") if self.chunk_offsets[-1] else None
+        self.average_length = float(self.chunk_lengths.mean()) if len(self.chunk_lengths) else 0.0
+
+    @staticmethod
+    def build(directory: str, chunks: List[Tuple[int, str]]) -> None:
+        """Write an index for the given chunks into an empty directory"""
+        vocab: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        lengths = np.zeros(len(chunks), dtype=np.int32)
+        encoded: List[bytes] = []
+        for chunk_id, (_, chunk) in enumerate(chunks):
+            terms = index_terms(chunk)
+            lengths[chunk_id] = len(terms)
+            for term, count in Counter(terms).items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((chunk_id, count))
+            encoded.append(chunk.encode("utf-8", errors="surrogatepass"))
+
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(entries) for entries in postings])
+        posting_chunks = np.fromiter((chunk_id for entries in postings for chunk_id, _ in entries), dtype=np.int32, count=int(offsets[-1]))
+        posting_tf = np.fromiter((count for entries in postings for _, count in entries), dtype=np.uint16, count=int(offsets[-1]))
+        chunk_offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        chunk_offsets[1:] = np.cumsum([len(data) for data in encoded])
+
+        with open(os.path.join(directory, "chunks.bin"), "wb") as handle:
+            for data in encoded:
+                handle.write(data)
+        with open(os.path.join(directory, "vocab.json"), "w", encoding="utf-8") as handle:
+            json.dump(vocab, handle, separators=(",", ":"))
+        np.save(os.path.join(directory, "chunk_offsets.npy"), chunk_offsets)
+        np.save(os.path.join(directory, "chunk_pages.npy"), np.array([page for page, _ in chunks], dtype=np.int32))
+        np.save(os.path.join(directory, "postings_offsets.npy"), offsets)
+        np.save(os.path.join(directory, "postings_chunks.npy"), posting_chunks)
+        np.save(os.path.join(directory, "postings_tf.npy"), posting_tf)
+        np.save(os.path.join(directory, "chunk_lengths.npy"), lengths)
+
+    def __len__(self) -> int:
+        return len(self.chunk_lengths)
+
+    def chunk(self, chunk_id: int) -> str:
+        start, end = int(self.chunk_offsets[chunk_id]), int(self.chunk_offsets[chunk_id + 1])
+        return bytes(self.text[start:end]).decode("utf-8", errors="surrogatepass")
+
+    def page(self, chunk_id: int) -> int:
+        return int(self.chunk_pages[chunk_id])
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for the query"""
+        scores = np.zeros(len(self), dtype=np.float32)
+        total = len(self)
+        for term in set(index_terms(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.postings_offsets[term_id], self.postings_offsets[term_id + 1]
+            chunk_ids = self.postings_chunks[start:end]
+            tf = self.postings_tf[start:end].astype(np.float32)
+            idf = np.log1p((total - len(chunk_ids) + 0.5) / (len(chunk_ids) + 0.5))
+            norm = _K1 * (1 - _B + _B * self.chunk_lengths[chunk_ids] / max(self.average_length, 1.0))
+            # Each chunk appears once per term's postings, so plain fancy-index add is safe
+            scores[chunk_ids] += idf * tf * (_K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, top_k: int) -> List[int]:
+        """Chunk ids of the best matches, highest score first; chunks that match nothing are left out"""
+        scores = self.scores(query)
+        if not len(scores):
+            return []
+        count = min(top_k, len(scores))
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [int(chunk_id) for chunk_id in best if scores[chunk_id] > 0]
+
+    def page_range(self, first: int, last: int) -> List[int]:
+        pages = np.asarray(self.chunk_pages)
+        return [int(chunk_id) for chunk_id in np.nonzero((pages >= first) & (pages <= last))[0]]
+
+    def section(self, kind: str, label: str, max_chunks: int) -> List[int]:
+        """Chunks from the heading "<kind> <label>" up to the next heading of another section.
+
+        Dotted labels ("2.3") also match bare numbered headings. Running page
+        headers repeat the current heading and subsections ("2.3.1") belong to
+        it, so neither ends the span. A table of contents lists the heading too,
+        so of all places it appears the one with the longest span wins.
+        """
+        prefix = rf"(?:{re.escape(kind)}\s+)?" if "." in label else rf"{re.escape(kind)}\s+"
+        label_pattern = r"(\d+(?:\.\d+)+)\s" if "." in label else r"([\w.]+)"
+        heading = re.compile(rf"^\s*{prefix}{label_pattern}", re.IGNORECASE | re.MULTILINE)
+        label = label.lower()
+
+        def other_section(found: str) -> bool:
+            found = found.lower()
+            return found != label and not found.startswith(label + ".")
+
+        def section_start(chunk: str) -> Optional[int]:
+            for match in heading.finditer(chunk):
+                if match.group(1).lower() == label:
+                    return match.end()
+            return None
+
+        def next_section(chunk: str, position: int = 0) -> Optional[int]:
+            for match in heading.finditer(chunk, position):
+                if other_section(match.group(1)):
+                    return match.start()
+            return None
+
+        best: List[int] = []
+        best_chars = 0
+        for start in sorted(self.search(f"{kind} {label}", 50)):
+            chunk = self.chunk(start)
+            position = section_start(chunk)
+            if position is None:
+                continue
+            # Measure the text under the heading, so a table of contents entry loses to the real section
+            end = next_section(chunk, position)
+            span, chars = [start], (end if end is not None else len(chunk)) - position
+            chunk_id = start + 1
+            while end is None and chunk_id < min(len(self), start + max_chunks):
+                chunk = self.chunk(chunk_id)
+                end = next_section(chunk)
+                if end == 0:
+                    break
+                span.append(chunk_id)
+                chars += end if end is not None else len(chunk)
+                chunk_id += 1
+            if chars > best_chars:
+                best, best_chars = span, chars
+        return best
+
+
+class RetrievalIndexStore:
+    """Builds document indexes on first use, keeps them on disk and the most recent ones open"""
+
+    def __init__(self, directory: str, max_documents: int = 64, open_indexes: int = 16, chunk_chars: int = 1500, top_k: int = 8, section_max_chunks: int = 40):
+        self.directory = directory
+        self.max_documents = max_documents
+        self.open_indexes = open_indexes
+        self.chunk_chars = chunk_chars
+        self.top_k = top_k
+        self.section_max_chunks = section_max_chunks
+        self._open: "OrderedDict[str, RetrievalIndex]" = OrderedDict()
+        self._builds = SingleFlight()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "RetrievalIndexStore":
+        """Build a store from RETRIEVAL_* environment variables"""
+        return cls(
+            directory=os.getenv("RETRIEVAL_INDEX_DIR", os.path.join(tempfile.gettempdir(), "quizforge-index")),
+            max_documents=int(os.getenv("RETRIEVAL_INDEX_MAX_DOCUMENTS", "64")),
+            open_indexes=int(os.getenv("RETRIEVAL_OPEN_INDEXES", "16")),
+            chunk_chars=int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1500")),
+            top_k=int(os.getenv("RETRIEVAL_TOP_K", "8")),
+            section_max_chunks=int(os.getenv("RETRIEVAL_SECTION_MAX_CHUNKS", "40")),
+        )
+
+    def _load_or_build(self, key: str, text_content: str, pages: Optional[List[str]]) -> RetrievalIndex:
+        path = os.path.join(self.directory, key)
+        if not os.path.isdir(path):
+            staging = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}")
+            os.makedirs(staging)
+            try:
+                RetrievalIndex.build(staging, page_chunks(text_content, pages, self.chunk_chars))
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            try:
+                os.replace(staging, path)
+            except OSError:
+                # Another worker process published the same index first
+                shutil.rmtree(staging, ignore_errors=True)
+            self._evict()
+        os.utime(path)  # mtime doubles as last-access time for eviction
+        return RetrievalIndex(path)
+
+    def _evict(self) -> None:
+        entries = sorted(
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(self.directory)
+            if entry.is_dir() and not entry.name.startswith(".")
+        )
+        for _, path in entries[:max(0, len(entries) - self.max_documents)]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    async def get(self, text_content: str, pages: Optional[List[str]] = None) -> RetrievalIndex:
+        """The index for this text and page layout, building it (once, even under concurrent requests) if needed"""
+        key = index_key(text_content, pages, self.chunk_chars)
+        index = self._open.get(key)
+        if index is not None:
+            self._open.move_to_end(key)
+            return index
+        index = await self._builds.do(key, lambda: asyncio.to_thread(self._load_or_build, key, text_content, pages))
+        self._open[key] = index
+        while len(self._open) > self.open_indexes:
+            self._open.popitem(last=False)
+        return index
+
+    async def focus(self, text_content: str, pages: Optional[List[str]], query: str) -> Tuple[str, Optional[List[str]]]:
+        """The part of a document a focus query asks for, as (text, pages).
+
+        "pages 12-30" / "page 4" select by page, "chapter 4" / "section 2.3"
+        select the section under that heading, and anything else returns the
+        top-k BM25 chunks. Chunks come back in document order. Raises
+        ValueError when nothing matches.
+        """
+        index = await self.get(text_content, pages)
+        page_match = _PAGE_RANGE.match(query)
+        section_match = _SECTION.match(query)
+        if page_match and pages:
+            first = int(page_match.group(1))
+            chunk_ids = index.page_range(first, int(page_match.group(2) or first))
+        else:
+            chunk_ids = await asyncio.to_thread(index.section, section_match.group(1), section_match.group(2), self.section_max_chunks) if section_match else []
+            if not chunk_ids:
+                chunk_ids = await asyncio.to_thread(index.search, query, self.top_k)
+        if not chunk_ids:
+            raise ValueError(f"Nothing in the document matches focus {query!r}")
+
+        # Regroup the chosen chunks by page so page-aware batching downstream still works
+        grouped: "OrderedDict[int, List[str]]" = OrderedDict()
+        for chunk_id in sorted(chunk_ids):
+            grouped.setdefault(index.page(chunk_id), []).append(index.chunk(chunk_id))
+        focused_pages = ["\n\n".join(parts) for parts in grouped.values()]
+        return "\n\n".join(focused_pages), (focused_pages if pages else None)
+
+    def stats(self) -> Dict:
+        return {"open_indexes": len(self._open), "directory": self.directory}
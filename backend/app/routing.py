@@ -0,0 +1,265 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from .scheduler import UpstreamOverloaded
+
+
+# Pools fall back along these names, so "quiz_hard" uses "quiz" routes unless configured
+POOL_FALLBACKS = {
+    "summary_short": "summary",
+    "quiz_hard": "quiz",
+}
+
+
+class Route:
+    """One model served by one provider (or by whichever provider the gateway picks)"""
+
+    def __init__(self, model: str, provider: Optional[str] = None):
+        self.model = model
+        self.provider = provider
+
+    @classmethod
+    def parse(cls, spec: str) -> "Route":
+        """Parse "model@Provider" or "model" """
+        model, _, provider = spec.strip().partition("@")
+        return cls(model.strip(), provider.strip() or None)
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}@{self.provider}" if self.provider else self.model
+
+    def payload(self) -> Dict:
+        """Fields of the chat completion request that select this route"""
+        data: Dict = {"model": self.model}
+        if self.provider:
+            data["provider"] = {"only": [self.provider]}
+        return data
+
+
+class RouteStats:
+    """Rolling latency and error rate of one route"""
+
+    def __init__(self, window: int = 100, alpha: float = 0.2):
+        self.alpha = alpha
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def record_success(self, latency: Optional[float]) -> None:
+        self.requests += 1
+        self.outcomes.append(True)
+        if latency is not None:
+            self.latencies.append(latency)
+            self.ewma = latency if self.ewma is None else self.alpha * latency + (1 - self.alpha) * self.ewma
+
+    def record_failure(self) -> None:
+        self.requests += 1
+        self.errors += 1
+        self.outcomes.append(False)
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+
+class ModelRouter:
+    """Picks the model/provider route for each upstream call.
+
+    Each task has a pool of routes (see LLM_ROUTES). Calls go to the healthy
+    route with the lowest recent latency (penalized by its error rate); routes
+    without enough samples are tried first so their stats get filled in, and
+    a small share of calls (`explore_ratio`) goes to another healthy route so
+    one slow outlier can't lock a route out for good. A route whose error rate goes
+    over `max_error_rate` is benched for `cooldown` seconds. A call that fails
+    on one route moves on to the pool's other routes, and a call still running
+    after the route's p95 latency (times `hedge_factor`) gets one hedged backup
+    request on the next route; whichever answers first wins.
+    """
+
+    def __init__(
+        self,
+        pools: Dict[str, List[Route]],
+        window: int = 100,
+        min_samples: int = 5,
+        max_error_rate: float = 0.5,
+        cooldown: float = 30.0,
+        hedge_percentile: float = 0.95,
+        hedge_factor: float = 1.0,
+        hedge_min_delay: float = 1.0,
+        max_hedge_ratio: float = 0.1,
+        explore_ratio: float = 0.05,
+    ):
+        if "default" not in pools:
+            raise ValueError("A default route pool is required")
+        self.pools = pools
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.hedge_percentile = hedge_percentile
+        self.hedge_factor = hedge_factor
+        self.hedge_min_delay = hedge_min_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.explore_ratio = explore_ratio
+        routes = {route.name for pool in pools.values() for route in pool}
+        self.routes: Dict[str, RouteStats] = {name: RouteStats(window) for name in routes}
+        self.counters = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+    @classmethod
+    def from_env(cls, model: str) -> "ModelRouter":
+        """Build a router from LLM_ROUTES / ROUTER_* environment variables.
+
+        LLM_ROUTES is "pool=model@Provider,model@Provider;pool=...". Without it
+        every task uses `model` on LLM_PROVIDER.
+        """
+        provider = os.getenv("LLM_PROVIDER", "Cerebras")
+        pools: Dict[str, List[Route]] = {"default": [Route(model, provider or None)]}
+        for entry in os.getenv("LLM_ROUTES", "").split(";"):
+            if "=" in entry:
+                name, specs = entry.split("=", 1)
+                routes = [Route.parse(spec) for spec in specs.split(",") if spec.strip()]
+                if routes:
+                    pools[name.strip()] = routes
+        return cls(
+            pools,
+            window=int(os.getenv("ROUTER_WINDOW", "100")),
+            min_samples=int(os.getenv("ROUTER_MIN_SAMPLES", "5")),
+            max_error_rate=float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5")),
+            cooldown=float(os.getenv("ROUTER_COOLDOWN", "30")),
+            hedge_percentile=float(os.getenv("ROUTER_HEDGE_PERCENTILE", "0.95")),
+            hedge_factor=float(os.getenv("ROUTER_HEDGE_FACTOR", "1.0")),
+            hedge_min_delay=float(os.getenv("ROUTER_HEDGE_MIN_DELAY", "1.0")),
+            max_hedge_ratio=float(os.getenv("ROUTER_MAX_HEDGE_RATIO", "0.1")),
+            explore_ratio=float(os.getenv("ROUTER_EXPLORE_RATIO", "0.05")),
+        )
+
+    def pool(self, name: str) -> List[Route]:
+        while name not in self.pools:
+            name = POOL_FALLBACKS.get(name, "default")
+        return self.pools[name]
+
+    def candidates(self, name: str) -> List[Route]:
+        """Routes of a pool in the order they should be tried"""
+        def rank(route: Route):
+            stats = self.routes[route.name]
+            if not stats.healthy():
+                return (2, stats.cooldown_until)
+            if len(stats.latencies) < self.min_samples:
+                return (0, len(stats.latencies))
+            return (1, stats.ewma * (1 + stats.error_rate))
+        ranked = sorted(self.pool(name), key=rank)
+        healthy = [route for route in ranked[1:] if self.routes[route.name].healthy()]
+        if healthy and random.random() < self.explore_ratio:
+            explored = random.choice(healthy)
+            ranked.remove(explored)
+            ranked.insert(0, explored)
+        return ranked
+
+    def hedge_delay(self, route: Route) -> Optional[float]:
+        """Seconds after which a call on this route gets a backup, or None while there's too little data"""
+        stats = self.routes[route.name]
+        if self.max_hedge_ratio <= 0 or len(stats.latencies) < self.min_samples:
+            return None
+        # A hedge budget keeps a slow provider from doubling upstream load
+        if self.counters["hedged"] >= self.max_hedge_ratio * max(1, self.counters["calls"]):
+            return None
+        return max(self.hedge_min_delay, stats.percentile(self.hedge_percentile) * self.hedge_factor)
+
+    def record_success(self, route: Route, latency: Optional[float] = None) -> None:
+        self.routes[route.name].record_success(latency)
+
+    def record_failure(self, route: Route) -> None:
+        stats = self.routes[route.name]
+        stats.record_failure()
+        if len(stats.outcomes) >= self.min_samples and stats.error_rate > self.max_error_rate:
+            stats.cooldown_until = time.monotonic() + self.cooldown
+            # Start the route over after its cooldown instead of benching it again on old failures
+            stats.outcomes.clear()
+
+    async def _attempt(self, route: Route, call: Callable[[Route], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await call(route)
+        except UpstreamOverloaded:
+            # Shed locally; says nothing about the route
+            raise
+        except Exception:
+            self.record_failure(route)
+            raise
+        self.record_success(route, time.perf_counter() - started)
+        return result
+
+    async def run(self, pool: str, call: Callable[[Route], Awaitable[Any]]) -> Any:
+        """Run `call(route)` on the best route of a pool, with failover and hedging"""
+        self.counters["calls"] += 1
+        candidates = self.candidates(pool)
+        pending: Dict[asyncio.Task, Route] = {}
+        launched = 0
+
+        def launch() -> asyncio.Task:
+            nonlocal launched
+            # A one-route pool hedges onto the same route; the retry usually lands on another replica
+            route = candidates[launched % len(candidates)]
+            launched += 1
+            task = asyncio.ensure_future(self._attempt(route, call))
+            pending[task] = route
+            return task
+
+        launch()
+        hedge_delay = self.hedge_delay(candidates[0])
+        hedge: Optional[asyncio.Task] = None
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay if hedge is None else None, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.counters["hedged"] += 1
+                    hedge = launch()
+                    continue
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending and launched < len(candidates) and not isinstance(error, UpstreamOverloaded):
+                    self.counters["failovers"] += 1
+                    launch()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        routes = {
+            name: {
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "error_rate": round(stats.error_rate, 4),
+                "latency_ewma": round(stats.ewma, 4) if stats.ewma is not None else None,
+                "latency_p95": round(stats.percentile(0.95), 4) if stats.latencies else None,
+                "healthy": stats.healthy(),
+            }
+            for name, stats in self.routes.items()
+        }
+        return {
+            **self.counters,
+            "pools": {name: [route.name for route in pool] for name, pool in self.pools.items()},
+            "routes": routes,
+        }
@@ -0,0 +1,295 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from .metrics import STAGE_LATENCY
+
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class UpstreamOverloaded(Exception):
+    """Raised when an upstream call is shed instead of queued; maps to HTTP 503"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamOverloaded):
+    """Raised while the circuit breaker is open after repeated upstream failures"""
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        # The lock makes waiters take tokens in arrival order
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one probe through after `reset_timeout`"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and self.retry_after() <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """End a call that says nothing about upstream health (cancelled, shed or about to be retried)"""
+        self._probe_in_flight = False
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+class UpstreamScheduler:
+    """Admission control, concurrency limits, rate limiting and retries for upstream LLM calls.
+
+    Callers queue for a per-endpoint slot, then a global slot, then a rate
+    limiter token. When more than `max_queue` callers are already waiting
+    (or a caller waits longer than `queue_timeout`), the call is shed with
+    UpstreamOverloaded so the API can answer 503 immediately instead of
+    piling up work. Retryable failures back off exponentially with full
+    jitter, honoring Retry-After, and feed a circuit breaker.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        endpoint_concurrency: int = 16,
+        endpoint_limits: Optional[Dict[str, int]] = None,
+        rate: float = 20.0,
+        burst: float = 40.0,
+        max_queue: int = 100,
+        queue_timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.endpoint_concurrency = endpoint_concurrency
+        self.endpoint_limits = endpoint_limits or {}
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.bucket = TokenBucket(rate, burst)
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._endpoints: Dict[str, asyncio.Semaphore] = {}
+        self.waiting = 0
+        self.active = 0
+        self.counters = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "shed": 0, "circuit_rejected": 0}
+
+    @classmethod
+    def from_env(cls) -> "UpstreamScheduler":
+        """Build a scheduler from UPSTREAM_* environment variables"""
+        limits: Dict[str, int] = {}
+        for item in os.getenv("UPSTREAM_ENDPOINT_LIMITS", "").split(","):
+            if "=" in item:
+                name, value = item.split("=", 1)
+                limits[name.strip()] = int(value)
+        return cls(
+            max_concurrency=int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "32")),
+            endpoint_concurrency=int(os.getenv("UPSTREAM_ENDPOINT_CONCURRENCY", "16")),
+            endpoint_limits=limits,
+            rate=float(os.getenv("UPSTREAM_RATE", "20")),
+            burst=float(os.getenv("UPSTREAM_BURST", "40")),
+            max_queue=int(os.getenv("UPSTREAM_MAX_QUEUE", "100")),
+            queue_timeout=float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "30")),
+            max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "3")),
+            backoff_base=float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5")),
+            backoff_max=float(os.getenv("UPSTREAM_BACKOFF_MAX", "20")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET", "30")),
+            ),
+        )
+
+    def _endpoint_semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        semaphore = self._endpoints.get(endpoint)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.endpoint_limits.get(endpoint, self.endpoint_concurrency))
+            self._endpoints[endpoint] = semaphore
+        return semaphore
+
+    def check_admission(self) -> None:
+        """Raise UpstreamOverloaded now if a new call would be shed"""
+        if self.breaker.state == "open" and self.breaker.retry_after() > 0:
+            self.counters["circuit_rejected"] += 1
+            raise CircuitOpenError("Upstream is failing; circuit breaker is open", self.breaker.retry_after())
+        if self.waiting >= self.max_queue:
+            self.counters["shed"] += 1
+            raise UpstreamOverloaded("Too many requests waiting for the upstream model", self.queue_timeout / 4)
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str) -> AsyncIterator[None]:
+        """Hold one endpoint slot, one global slot and one rate-limit token"""
+        self.check_admission()
+        self.waiting += 1
+        started = time.perf_counter()
+        endpoint_semaphore = self._endpoint_semaphore(endpoint)
+        acquired = []
+
+        async def acquire() -> None:
+            await endpoint_semaphore.acquire()
+            acquired.append(endpoint_semaphore)
+            await self._global.acquire()
+            acquired.append(self._global)
+            await self.bucket.acquire()
+
+        try:
+            await asyncio.wait_for(acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["shed"] += 1
+            for semaphore in acquired:
+                semaphore.release()
+            raise UpstreamOverloaded("Timed out waiting for an upstream slot", self.queue_timeout / 4)
+        except BaseException:
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+        finally:
+            self.waiting -= 1
+            STAGE_LATENCY.observe(time.perf_counter() - started, task=endpoint, stage="queue")
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._global.release()
+            endpoint_semaphore.release()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = _retry_after_seconds(error.response)
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+        # Full jitter: uniform over [0, base * 2^attempt]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def run(self, endpoint: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run an upstream call under the limits, retrying retryable failures"""
+        self.counters["calls"] += 1
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.counters["circuit_rejected"] += 1
+                raise CircuitOpenError("Upstream is failing; circuit breaker is open", self.breaker.retry_after())
+            try:
+                async with self.slot(endpoint):
+                    result = await call()
+            except UpstreamOverloaded:
+                self.breaker.release()
+                raise
+            except asyncio.CancelledError:
+                # Hedging and client disconnects cancel calls routinely; a cancelled probe must not wedge the breaker
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not _is_retryable(e):
+                    # Client-side errors say nothing about upstream health, so they neither close nor trip the breaker
+                    self.breaker.release()
+                    self.counters["failed"] += 1
+                    raise
+                if attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    self.counters["failed"] += 1
+                    raise
+                # The slot (and a half-open probe) is released while backing off so other calls can proceed
+                self.breaker.release()
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.counters["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self.counters["succeeded"] += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "waiting": self.waiting,
+            "active": self.active,
+            "circuit_state": self.breaker.state,
+            "circuit_trips": self.breaker.trips,
+        }
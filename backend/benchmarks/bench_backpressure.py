@@ -0,0 +1,94 @@
+"""Load test for the upstream scheduler against the in-process mock LLM.
+
+Fires a burst of concurrent quiz generations through QuizForgeAI while the
+mock server injects 429s and 503s, and reports how many calls succeeded,
+were retried, or were shed with 503:
+
+    python -m benchmarks.bench_backpressure --requests 200 --rate-limit-rate 0.2
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from app.ai_service import QuizForgeAI
+from app.cache import MemoryCache, ResultCache
+from app.http_client import LLMHTTPClient
+from app.scheduler import UpstreamOverloaded, UpstreamScheduler
+from benchmarks import mock_llm_server
+
+
+async def run(args) -> None:
+    mock_llm_server.settings.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+    )
+    os.environ.setdefault("API_KEY", "dummy")
+    os.environ["LLM_API_URL"] = "http://mock/v1/chat/completions"
+    scheduler = UpstreamScheduler(
+        max_concurrency=args.concurrency,
+        rate=args.rate,
+        burst=args.rate,
+        max_queue=args.max_queue,
+        queue_timeout=args.queue_timeout,
+        max_retries=args.max_retries,
+        backoff_base=0.05,
+    )
+    ai = QuizForgeAI(
+        http_client=LLMHTTPClient(transport=httpx.ASGITransport(app=mock_llm_server.app)),
+        cache=ResultCache(MemoryCache(0), enabled=False),
+        scheduler=scheduler,
+    )
+    await ai.startup()
+
+    outcomes = {"ok": 0, "shed": 0, "failed": 0}
+    latencies = []
+
+    async def one(index: int) -> None:
+        started = time.perf_counter()
+        try:
+            await ai.generate_quiz(f"Document {index} about photosynthesis.", 5, "Biology", "medium", use_cache=False)
+            outcomes["ok"] += 1
+            latencies.append(time.perf_counter() - started)
+        except UpstreamOverloaded:
+            outcomes["shed"] += 1
+        except Exception:
+            outcomes["failed"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    await ai.shutdown()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(f"requests     {args.requests} in {elapsed:.2f}s")
+    print(f"outcomes     {outcomes}")
+    print(f"p95 latency  {p95 * 1000:.0f} ms")
+    print(f"scheduler    {scheduler.stats()}")
+    print(f"mock server  {mock_llm_server.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=100.0, help="scheduler token-bucket rate per second")
+    parser.add_argument("--max-queue", type=int, default=100)
+    parser.add_argument("--queue-timeout", type=float, default=10.0)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.2)
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark: extractive context budgeting vs. head truncation on large documents.
+
+For each document and token budget, reports how long token estimation and
+sentence selection take, and what fraction of the document's distinct content
+terms survive compared with keeping the first N characters:
+
+    python -m benchmarks.bench_context_budget --pdf textbook.pdf --budgets 4000,16000,28000
+    python -m benchmarks.bench_context_budget --repeat 20     # synthetic 1000-page document
+"""
+import argparse
+import random
+import re
+import time
+from typing import Iterable, List, Set, Tuple
+
+from app.context_budget import estimate_tokens, extract_to_budget
+from app.pdf_ingest import extract_text_from_pdf
+from app.questions import STOPWORDS
+
+_TERM = re.compile(r"\w+")
+
+
+def content_terms(text: str) -> Set[str]:
+    return {term for term in _TERM.findall(text.lower()) if term not in STOPWORDS and len(term) > 1}
+
+
+def synthetic_document(pages: int, seed: int = 7, chapter_pages: int = 0) -> str:
+    """Pages on rotating topics, each with its own vocabulary, so truncation visibly loses topics.
+
+    With chapter_pages, every that many pages start under a "Chapter N" heading.
+    """
+    rng = random.Random(seed)
+    shared = [f"concept{i}" for i in range(200)]
+    paragraphs = []
+    for page in range(pages):
+        topic = [f"topic{page % 40}term{i}" for i in range(60)]
+        sentences = [
+            " ".join(rng.choices(topic, k=6) + rng.choices(shared, k=6)).capitalize() + "."
+            for _ in range(18)
+        ]
+        heading = f"Chapter {page // chapter_pages + 1}\n" if chapter_pages and page % chapter_pages == 0 else ""
+        paragraphs.append(heading + " ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def documents(args) -> Iterable[Tuple[str, str]]:
+    for path in args.pdf:
+        yield path, extract_text_from_pdf(path) * args.repeat
+    if not args.pdf:
+        yield f"synthetic x{args.repeat}", synthetic_document(50 * args.repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", action="append", default=[], help="PDF to benchmark (repeatable)")
+    parser.add_argument("--repeat", type=int, default=20, help="concatenate the document this many times")
+    parser.add_argument("--budgets", default="2000,8000,28000", help="comma-separated token budgets")
+    args = parser.parse_args()
+    budgets: List[int] = [int(value) for value in args.budgets.split(",")]
+
+    print(f"{'document':<28}{'chars':>10}{'tokens':>9}{'est ms':>8}{'budget':>8}{'fit ms':>8}{'out tok':>9}{'coverage':>10}{'head cov':>10}")
+    for name, text in documents(args):
+        started = time.perf_counter()
+        tokens = estimate_tokens(text)
+        estimate_ms = (time.perf_counter() - started) * 1000
+        terms = content_terms(text)
+        for budget in budgets:
+            started = time.perf_counter()
+            selected = extract_to_budget(text, budget)
+            fit_ms = (time.perf_counter() - started) * 1000
+            # Head truncation with the same number of characters as the extract
+            head = text[:len(selected)]
+            coverage = len(content_terms(selected) & terms) / max(1, len(terms))
+            head_coverage = len(content_terms(head) & terms) / max(1, len(terms))
+            print(
+                f"{name[-28:]:<28}{len(text):>10}{tokens:>9}{estimate_ms:>8.1f}{budget:>8}"
+                f"{fit_ms:>8.0f}{estimate_tokens(selected):>9}{coverage:>10.2f}{head_coverage:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
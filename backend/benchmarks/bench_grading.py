@@ -0,0 +1,57 @@
+"""Benchmark: vectorized bulk grading vs. one /check-answers-style loop per submission.
+
+    python -m benchmarks.bench_grading --students 20000 --questions 50
+"""
+import argparse
+import random
+import time
+
+from app.grading import BulkGrader
+
+
+def loop_grade(submissions, correct_answers):
+    """The per-request scoring /check-answers used before bulk grading, once per student"""
+    scores = []
+    for _, answers in submissions:
+        correct_count = sum(1 for user, correct in zip(answers, correct_answers)
+                            if user.strip().lower() == correct.strip().lower())
+        scores.append(correct_count / len(correct_answers) * 100)
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    options = ["Option A", "Option B", "Option C", "Option D"]
+    key = [rng.choice(options) for _ in range(args.questions)]
+    submissions = [
+        (f"student{i}", [answer if rng.random() < 0.7 else rng.choice(options).lower() + " " for answer in key])
+        for i in range(args.students)
+    ]
+
+    started = time.perf_counter()
+    loop_scores = loop_grade(submissions, key)
+    loop_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    grader = BulkGrader(key)
+    bulk_scores = []
+    for start in range(0, len(submissions), args.batch_size):
+        bulk_scores.extend(result["score"] for result in grader.grade_batch(submissions[start:start + args.batch_size]))
+    statistics = grader.statistics()
+    bulk_s = time.perf_counter() - started
+
+    assert all(abs(a - b) < 1e-9 for a, b in zip(loop_scores, bulk_scores))
+    print(f"{args.students} students x {args.questions} questions")
+    print(f"per-submission loop (scores only):    {loop_s * 1000:8.0f} ms")
+    print(f"bulk grader (scores + item stats):    {bulk_s * 1000:8.0f} ms")
+    print(f"mean score {statistics['mean_score']}, pass rate {statistics['pass_rate']}")
+
+
+if __name__ == "__main__":
+    main()
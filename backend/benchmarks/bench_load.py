@@ -0,0 +1,281 @@
+"""Load test: drive the QuizForge API at a fixed concurrency against the mock LLM.
+
+Runs fully offline. By default the FastAPI app and the mock LLM server both run
+in this process over ASGI transports, with no sockets and no API key. --url
+drives an already running server over HTTP instead; start it against
+`benchmarks.mock_llm_server` and pass the mock options there.
+
+    python -m benchmarks.bench_load --concurrency 32 --requests 2000 --latency-ms 300 --tokens-per-second 400
+    python -m benchmarks.bench_load --scenario quiz_stream --duration 30 --malformed-rate 0.05
+    python -m benchmarks.bench_load --max-p95-ms 800 --min-rps 50 --json    # CI gate: exit 1 on regression
+
+Reports requests/s, p50/p95/p99 latency and time to first byte per scenario,
+plus resident memory. The in-process transport hands over a response only when
+its body is complete, so time to first byte is meaningful with --url only.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks import mock_llm_server
+
+Request = Tuple[str, Dict]
+
+ANSWER_KEY = ["Option B"] * 10
+
+
+def synthetic_text(index: int, words: int) -> str:
+    rng = random.Random(index)
+    vocabulary = [f"concept{i}" for i in range(400)]
+    sentences = [" ".join(rng.choices(vocabulary, k=12)).capitalize() + "." for _ in range(max(1, words // 12))]
+    return f"Study notes {index}. " + " ".join(sentences)
+
+
+def scenario_requests(document_ids: List[str], use_cache: bool) -> Dict[str, Callable[[int], Request]]:
+    """Request builders per scenario, each taking a request counter"""
+    no_cache = "false" if use_cache else "true"
+
+    def document(n: int) -> str:
+        return document_ids[n % len(document_ids)]
+
+    return {
+        "summary": lambda n: ("/generate-summary", {"document_id": document(n), "summary_type": "bullet_points", "no_cache": no_cache}),
+        "quiz": lambda n: ("/generate-quiz", {"document_id": document(n), "num_questions": "5", "subject": "Biology", "difficulty": "medium", "no_cache": no_cache}),
+        "flashcards": lambda n: ("/generate-flashcards", {"document_id": document(n), "num_cards": "5", "subject": "Biology", "card_type": "mixed", "no_cache": no_cache}),
+        "quiz_stream": lambda n: ("/generate-quiz/stream", {"document_id": document(n), "num_questions": "5", "subject": "Biology", "difficulty": "medium", "no_cache": no_cache}),
+        "study_pack": lambda n: ("/generate-study-pack", {"document_id": document(n), "no_cache": no_cache}),
+        "check_answers": lambda n: ("/check-answers", {
+            "user_answers": [random.choice(["Option A", "Option B"]) for _ in ANSWER_KEY],
+            "correct_answers": ANSWER_KEY,
+        }),
+    }
+
+
+# Share of each scenario in --scenario mixed, roughly a student session
+MIXED_WEIGHTS = {"summary": 2, "quiz": 3, "quiz_stream": 2, "flashcards": 2, "study_pack": 1, "check_answers": 3}
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process (falls back to the peak where /proc is missing)"""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {"p50": round(float(p50), 1), "p95": round(float(p95), 1), "p99": round(float(p99), 1)}
+
+
+class LoadDriver:
+    """Closed-loop load: `concurrency` workers each send their next request as soon as the last one finishes"""
+
+    def __init__(self, client: httpx.AsyncClient, builders: Dict[str, Callable[[int], Request]], scenario: str):
+        self.client = client
+        self.builders = builders
+        if scenario == "mixed":
+            names = list(MIXED_WEIGHTS)
+            weights = [MIXED_WEIGHTS[name] for name in names]
+            self.pick = lambda n: random.Random(n).choices(names, weights)[0]
+        else:
+            self.pick = lambda n: scenario
+        self.results: Dict[str, Dict[str, List]] = {}
+        self.sent = 0
+
+    async def one(self, record: bool) -> None:
+        n = self.sent
+        self.sent += 1
+        name = self.pick(n)
+        path, data = self.builders[name](n)
+        started = time.perf_counter()
+        first_byte = None
+        ok = False
+        try:
+            async with self.client.stream("POST", path, data=data) as response:
+                async for chunk in response.aiter_bytes():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    # NDJSON streams report failures in-band as a final error event
+                    ok = response.status_code == 200 and b'"event": "error"' not in chunk
+        except httpx.HTTPError:
+            ok = False
+        if record:
+            result = self.results.setdefault(name, {"latency": [], "ttfb": [], "errors": []})
+            if ok:
+                result["latency"].append(time.perf_counter() - started)
+                result["ttfb"].append(first_byte or 0.0)
+            else:
+                result["errors"].append(path)
+
+    async def run(self, concurrency: int, requests: int, duration: float, warmup: int) -> Tuple[float, float]:
+        """(elapsed seconds, peak RSS in MB sampled during the run)"""
+        await asyncio.gather(*(self.one(record=False) for _ in range(warmup)))
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = requests
+        peak = rss_mb()
+
+        async def worker() -> None:
+            nonlocal remaining, peak
+            while (remaining > 0 if deadline is None else time.perf_counter() < deadline):
+                remaining -= 1
+                await self.one(record=True)
+                peak = max(peak, rss_mb())
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started, peak
+
+
+def report(driver: LoadDriver, elapsed: float, peak_mb: float, args) -> Dict:
+    scenarios = {}
+    for name, result in sorted(driver.results.items()):
+        total = len(result["latency"]) + len(result["errors"])
+        scenarios[name] = {
+            "requests": total,
+            "errors": len(result["errors"]),
+            "rps": round(len(result["latency"]) / elapsed, 1),
+            "latency_ms": percentiles(result["latency"]),
+            "ttfb_ms": percentiles(result["ttfb"]),
+        }
+    ok = sum(len(result["latency"]) for result in driver.results.values())
+    errors = sum(len(result["errors"]) for result in driver.results.values())
+    latencies = [value for result in driver.results.values() for value in result["latency"]]
+    return {
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "requests": ok + errors,
+        "errors": errors,
+        "rps": round(ok / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+        "memory_mb": {"rss_peak_during_run": round(peak_mb, 1), "rss_end": round(rss_mb(), 1), "process_peak": round(peak_rss_mb(), 1)},
+        "scenarios": scenarios,
+    }
+
+
+def print_report(summary: Dict) -> None:
+    print(f"target {summary['target']}, concurrency {summary['concurrency']}, {summary['requests']} requests in {summary['elapsed_s']}s")
+    print(f"{'scenario':<16}{'reqs':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttfb p50':>10}")
+    rows = list(summary["scenarios"].items()) + [("total", {**summary, "ttfb_ms": {"p50": None}})]
+    for name, row in rows:
+        latency = row["latency_ms"]
+        cells = [latency["p50"], latency["p95"], latency["p99"], row["ttfb_ms"]["p50"]]
+        formatted = "".join(f"{'-' if value is None else f'{value:.0f}':>{width}}" for value, width in zip(cells, (9, 9, 9, 10)))
+        print(f"{name:<16}{row['requests']:>7}{row['errors']:>8}{row['rps']:>9}{formatted}")
+    memory = summary["memory_mb"]
+    owner = "app and mock LLM in this process" if summary["target"] == "in-process" else "load driver only"
+    print(f"memory: peak RSS during run {memory['rss_peak_during_run']} MB, at end {memory['rss_end']} MB ({owner})")
+
+
+def check_gates(summary: Dict, args) -> List[str]:
+    """Threshold violations for CI; empty when the run passes"""
+    failures = []
+    p95 = summary["latency_ms"]["p95"]
+    if args.max_p95_ms is not None and (p95 is None or p95 > args.max_p95_ms):
+        failures.append(f"p95 {p95} ms > {args.max_p95_ms} ms")
+    if args.min_rps is not None and summary["rps"] < args.min_rps:
+        failures.append(f"{summary['rps']} req/s < {args.min_rps} req/s")
+    error_rate = summary["errors"] / max(1, summary["requests"])
+    if error_rate > args.max_error_rate:
+        failures.append(f"error rate {error_rate:.2%} > {args.max_error_rate:.2%}")
+    return failures
+
+
+async def run(args) -> Dict:
+    mock_llm_server.settings.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        malformed_rate=args.malformed_rate,
+        error_rate=args.error_rate,
+    )
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120, limits=httpx.Limits(max_connections=args.concurrency))
+        return await drive(client, args)
+
+    # A local upstream URL needs no API key; the transport below never opens a socket
+    os.environ["LLM_API_URL"] = "http://127.0.0.1/v1/chat/completions"
+    # Lift the upstream scheduler's production limits so they don't cap the app under test;
+    # export UPSTREAM_* explicitly to benchmark a specific configuration
+    for name, value in {"UPSTREAM_RATE": "100000", "UPSTREAM_BURST": "100000", "UPSTREAM_MAX_CONCURRENCY": "1024",
+                        "UPSTREAM_ENDPOINT_CONCURRENCY": "1024", "UPSTREAM_MAX_QUEUE": "100000"}.items():
+        os.environ.setdefault(name, value)
+    from app import main
+    from app.http_client import LLMHTTPClient
+
+    main.ai_service.http = LLMHTTPClient(transport=httpx.ASGITransport(app=mock_llm_server.app))
+    async with main.app.router.lifespan_context(main.app):
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://quizforge", timeout=120)
+        return await drive(client, args)
+
+
+async def drive(client: httpx.AsyncClient, args) -> Dict:
+    async with client:
+        document_ids = []
+        for index in range(args.documents):
+            response = await client.post("/documents", data={"text_content": synthetic_text(index, args.document_words)})
+            response.raise_for_status()
+            document_ids.append(response.json()["document_id"])
+        driver = LoadDriver(client, scenario_requests(document_ids, args.cache), args.scenario)
+        elapsed, peak_mb = await driver.run(args.concurrency, args.requests, args.duration, args.warmup)
+    summary = report(driver, elapsed, peak_mb, args)
+    summary["mock_server"] = dict(mock_llm_server.stats) if not args.url else None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="drive a running server (e.g. http://127.0.0.1:8000) instead of the in-process app")
+    parser.add_argument("--scenario", default="mixed", choices=["mixed", *MIXED_WEIGHTS], help="request type to send")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="measured requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, default=0.0, help="run for this many seconds instead of a request count")
+    parser.add_argument("--warmup", type=int, default=20, help="requests sent before measuring")
+    parser.add_argument("--documents", type=int, default=20, help="distinct documents the requests rotate over")
+    parser.add_argument("--document-words", type=int, default=1500)
+    parser.add_argument("--cache", action="store_true", help="allow result cache hits (default: every request bypasses it)")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="mock LLM time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="mock LLM output rate (0 = instant)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of mock completions with broken output")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock requests answered with 503")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="fail (exit 1) if overall p95 latency exceeds this")
+    parser.add_argument("--min-rps", type=float, help="fail (exit 1) if throughput is below this")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="fail (exit 1) above this share of failed requests")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary)
+        if summary["mock_server"]:
+            print(f"mock server: {summary['mock_server']}")
+    failures = check_gates(summary, args)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
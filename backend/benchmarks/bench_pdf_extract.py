@@ -0,0 +1,118 @@
+"""Benchmark: PDF text extraction on generated multi-hundred-page PDFs.
+
+Generates text-heavy PDFs with PyMuPDF (no fixtures to check in), then times
+single-threaded extraction against the ingestor's process-pool extraction
+and reports pages per second. It also times re-uploading a copy with a few
+pages edited, where only those pages are extracted again:
+
+    python -m benchmarks.bench_pdf_extract --pages 200,500,1000
+    python -m benchmarks.bench_pdf_extract --pages 500 --max-ms-per-page 5 --json   # CI gate: exit 1 on regression
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+import fitz  # PyMuPDF
+
+from app.pdf_ingest import PDFIngestor, _extract_page_range
+
+_WORDS = (
+    "cell membrane protein energy enzyme reaction gradient transport signal molecule "
+    "structure function pathway receptor synthesis equilibrium diffusion osmosis"
+).split()
+
+
+def generate_pdf(pages: int, seed: int = 7, edited: Iterable[int] = ()) -> bytes:
+    """A PDF of `pages` A4 pages, each with a heading and ~45 lines of body text; `edited` pages get a revised heading"""
+    edited = set(edited)
+    rng = random.Random(seed)
+    document = fitz.open()
+    try:
+        for number in range(pages):
+            page = document.new_page()
+            lines = [f"Chapter {number // 20 + 1}, page {number + 1}" + (" (revised)" if number in edited else "")]
+            lines += [" ".join(rng.choices(_WORDS, k=12)).capitalize() + "." for _ in range(45)]
+            page.insert_text((50, 60), "\n".join(lines), fontsize=9)
+        return document.tobytes(garbage=3, deflate=True)
+    finally:
+        document.close()
+
+
+def typical(timings: List[float]) -> float:
+    """Median of three or more runs, otherwise the fastest"""
+    return min(timings) if len(timings) < 3 else statistics.median(timings)
+
+
+async def measure(sizes: List[int], repeat: int, workers: Optional[int], edit_ratio: float) -> List[Dict]:
+    ingestor = PDFIngestor(max_bytes=1 << 31, max_pages=1 << 20, workers=workers, parallel_min_pages=1)
+    results = []
+    try:
+        # Start the worker processes outside the timings
+        await ingestor.ingest(generate_pdf(ingestor.workers))
+        for pages in sizes:
+            data = generate_pdf(pages)
+            edited = generate_pdf(pages, edited=range(0, pages, max(1, round(1 / edit_ratio))))
+            serial, pool, reupload = [], [], []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                _extract_page_range(data, 0, pages)
+                serial.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                original = await ingestor.ingest(data)
+                pool.append(time.perf_counter() - started)
+                # Replacing the original, only the edited pages are extracted
+                started = time.perf_counter()
+                result = await ingestor.ingest(edited, original)
+                reupload.append(time.perf_counter() - started)
+            serial_s, pool_s, reupload_s = typical(serial), typical(pool), typical(reupload)
+            results.append({
+                "pages": pages,
+                "pdf_mb": round(len(data) / 2 ** 20, 2),
+                "serial_ms": round(serial_s * 1000, 1),
+                "pool_ms": round(pool_s * 1000, 1),
+                "serial_pages_per_s": round(pages / serial_s),
+                "pool_pages_per_s": round(pages / pool_s),
+                "pool_ms_per_page": round(pool_s * 1000 / pages, 3),
+                "reupload_ms": round(reupload_s * 1000, 1),
+                "reupload_extracted_pages": pages - result["reused_pages"],
+            })
+    finally:
+        ingestor.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", default="200,500,1000", help="comma-separated page counts to generate")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size (median reported)")
+    parser.add_argument("--workers", type=int, help="process pool size for the ingestor (default: min(4, CPUs))")
+    parser.add_argument("--edit-ratio", type=float, default=0.05, help="share of pages changed in the re-uploaded copy")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--max-ms-per-page", type=float, help="fail (exit 1) if pool extraction is slower than this per page")
+    args = parser.parse_args()
+
+    results = asyncio.run(measure([int(value) for value in args.pages.split(",")], args.repeat, args.workers, args.edit_ratio))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'pages':>7}{'MB':>7}{'serial ms':>11}{'pool ms':>10}{'serial p/s':>12}{'pool p/s':>10}{'re-upload ms':>14}{'re-extracted':>14}")
+        for row in results:
+            print(f"{row['pages']:>7}{row['pdf_mb']:>7}{row['serial_ms']:>11}{row['pool_ms']:>10}{row['serial_pages_per_s']:>12}{row['pool_pages_per_s']:>10}{row['reupload_ms']:>14}{row['reupload_extracted_pages']:>14}")
+
+    failures = [
+        f"{row['pages']} pages: {row['pool_ms_per_page']} ms/page > {args.max_ms_per_page} ms/page"
+        for row in results
+        if args.max_ms_per_page is not None and row["pool_ms_per_page"] > args.max_ms_per_page
+    ]
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
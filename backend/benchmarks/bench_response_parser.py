@@ -0,0 +1,87 @@
+"""Micro-benchmark: shared response parser vs. the old greedy-regex extraction.
+
+Runs over the recorded responses in benchmarks/corpus/llm_responses.jsonl and
+reports, per response, whether each approach recovered valid data and how
+long one parse takes:
+
+    python -m benchmarks.bench_response_parser --repeat 200
+"""
+import argparse
+import json
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.models import Flashcard, QuizQuestion, SummaryContent
+from app.response_parser import parse_items, parse_model
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus", "llm_responses.jsonl")
+
+_ITEMS = {"quiz": ("questions", QuizQuestion), "flashcards": ("flashcards", Flashcard)}
+
+
+def legacy_parse(kind: str, response: str) -> Optional[object]:
+    """The extraction the generate_* methods used before the shared parser"""
+    json_match = re.search(r'\{.*\}', response, re.DOTALL)
+    if not json_match:
+        return None
+    try:
+        data = json.loads(json_match.group())
+    except json.JSONDecodeError:
+        return None
+    if kind == "summary":
+        return data if "content" in data else None
+    key = _ITEMS[kind][0]
+    return data[key] if isinstance(data.get(key), list) and data[key] else None
+
+
+def shared_parse(kind: str, response: str) -> Optional[object]:
+    if kind == "summary":
+        return parse_model(response, SummaryContent)
+    key, model = _ITEMS[kind]
+    return parse_items(response, key, model) or None
+
+
+def time_per_call(fn: Callable[[], object], repeat: int) -> float:
+    """Best-of-three mean microseconds per call"""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best * 1e6
+
+
+def load_corpus(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    entries = load_corpus(args.corpus)
+    print(f"{'response':<26}{'chars':>8}  {'legacy ok':>9}{'legacy us':>11}  {'shared ok':>9}{'shared us':>11}")
+    totals = {"legacy": 0, "shared": 0}
+    for entry in entries:
+        kind, response = entry["kind"], entry["response"]
+        results = {}
+        for label, fn in (("legacy", legacy_parse), ("shared", shared_parse)):
+            ok = fn(kind, response) is not None
+            totals[label] += ok
+            results[label] = (ok, time_per_call(lambda: fn(kind, response), args.repeat))
+        print(
+            f"{entry['name']:<26}{len(response):>8}  "
+            f"{str(results['legacy'][0]):>9}{results['legacy'][1]:>11.1f}  "
+            f"{str(results['shared'][0]):>9}{results['shared'][1]:>11.1f}"
+        )
+    print(f"\nrecovered: legacy {totals['legacy']}/{len(entries)}, shared {totals['shared']}/{len(entries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark: retrieval index build and focused selection on large documents.
+
+Builds the per-document index, then times focus queries against a warm index
+and compares the tokens they select with the tokens of the whole document:
+
+    python -m benchmarks.bench_retrieval --pdf textbook.pdf --focus "chapter 3" --focus "pages 10-20"
+    python -m benchmarks.bench_retrieval --repeat 20      # synthetic 1000-page document
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+from app.context_budget import estimate_tokens
+from app.retrieval import RetrievalIndexStore
+
+from .bench_context_budget import synthetic_document
+
+DEFAULT_FOCUS = ["pages 10-12", "chapter 2", "topic3term7 topic3term11"]
+
+
+def load(args) -> Tuple[str, str, Optional[List[str]]]:
+    if args.pdf:
+        import fitz
+
+        with fitz.open(args.pdf) as document:
+            pages = [page.get_text() for page in document] * args.repeat
+        return args.pdf, "\n\n".join(pages), pages
+    text = synthetic_document(50 * args.repeat, chapter_pages=25)
+    return f"synthetic x{args.repeat}", text, text.split("\n\n")
+
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+async def run(args) -> None:
+    name, text, pages = load(args)
+    directory = tempfile.mkdtemp(prefix="quizforge-bench-index-")
+    try:
+        store = RetrievalIndexStore(directory, top_k=args.top_k)
+        started = time.perf_counter()
+        index = await store.get(text, pages)
+        build_ms = (time.perf_counter() - started) * 1000
+        total_tokens = estimate_tokens(text)
+        print(f"{name}: {len(text)} chars, {total_tokens} tokens, {len(pages or [])} pages")
+        print(f"index: {len(index)} chunks, {len(index.vocab)} terms, {directory_bytes(directory) / 1024:.0f} KiB on disk, built in {build_ms:.0f} ms")
+
+        reopened = RetrievalIndexStore(directory, top_k=args.top_k)
+        started = time.perf_counter()
+        await reopened.get(text, pages)
+        print(f"reopen from disk: {(time.perf_counter() - started) * 1000:.1f} ms\n")
+
+        print(f"{'focus':<32}{'ms':>8}{'pages':>8}{'tokens':>9}{'of doc':>8}")
+        for query in args.focus or DEFAULT_FOCUS:
+            started = time.perf_counter()
+            try:
+                focused, focused_pages = await store.focus(text, pages, query)
+            except ValueError:
+                print(f"{query[:32]:<32}{'no match':>8}")
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            tokens = estimate_tokens(focused)
+            print(f"{query[:32]:<32}{elapsed_ms:>8.1f}{len(focused_pages or []):>8}{tokens:>9}{tokens / total_tokens:>8.1%}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="PDF to index (default: synthetic document)")
+    parser.add_argument("--repeat", type=int, default=20, help="concatenate the document this many times")
+    parser.add_argument("--focus", action="append", default=[], help="focus query to time (repeatable)")
+    parser.add_argument("--top-k", type=int, default=8, help="chunks selected for a topic focus")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
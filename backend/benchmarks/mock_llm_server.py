@@ -0,0 +1,231 @@
+"""Local stub of an OpenAI-compatible chat completions endpoint.
+
+Lets the backend run and be load-tested without an API key or network access:
+
+    python -m benchmarks.mock_llm_server --port 9000 --latency-ms 300
+    LLM_API_URL=http://127.0.0.1:9000/v1/chat/completions \\
+        python -m uvicorn app.main:app --port 8000
+
+--rate-limit-rate and --error-rate inject 429 (with Retry-After) and 503
+responses, and --jitter-ms adds random extra latency, to exercise the
+upstream scheduler's retries, backoff and circuit breaker. --tokens-per-second
+paces output like a real model decoding, and --malformed-rate returns broken
+JSON or prose to exercise the response parser's fallbacks. Prompt prefixes
+are cached like a provider's automatic prompt cache, and the cached part is
+reported in usage.prompt_tokens_details.cached_tokens.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="QuizForge mock LLM")
+
+settings = {
+    "latency_ms": 0.0,
+    "jitter_ms": 0.0,
+    "chunk_chars": 16,
+    "rate_limit_rate": 0.0,
+    "retry_after": 1.0,
+    "error_rate": 0.0,
+    "tokens_per_second": 0.0,
+    "malformed_rate": 0.0,
+}
+stats = {"requests": 0, "rate_limited": 0, "errors": 0, "malformed": 0, "cached_prompt_tokens": 0}
+
+# Prompt prefixes are cached in blocks, once at least CACHE_MIN_CHARS match
+# (about 1024 tokens, like OpenAI's automatic prompt caching)
+CACHE_BLOCK_CHARS = 512
+CACHE_MIN_CHARS = 4096
+CACHE_MAX_BLOCKS = 200_000
+prefix_cache: "OrderedDict[str, None]" = OrderedDict()
+
+
+def _message_text(message: Dict) -> str:
+    """Text of a message whose content is a string or a list of content parts"""
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content
+
+
+def _cached_chars(messages: List[Dict]) -> int:
+    """Characters of the prompt whose prefix was seen before; caches the rest"""
+    prompt = "\x00".join(f"{message.get('role')}:{_message_text(message)}" for message in messages)
+    digest = hashlib.sha1()
+    cached = 0
+    hit = True
+    for start in range(0, len(prompt) - CACHE_BLOCK_CHARS + 1, CACHE_BLOCK_CHARS):
+        digest.update(prompt[start:start + CACHE_BLOCK_CHARS].encode("utf-8", errors="surrogatepass"))
+        key = digest.hexdigest()
+        if hit and key in prefix_cache:
+            prefix_cache.move_to_end(key)
+            cached = start + CACHE_BLOCK_CHARS
+        else:
+            hit = False
+            prefix_cache[key] = None
+    while len(prefix_cache) > CACHE_MAX_BLOCKS:
+        prefix_cache.popitem(last=False)
+    return cached if cached >= CACHE_MIN_CHARS else 0
+
+
+def _canned_content(messages: List[Dict]) -> str:
+    """Return a well-formed completion matching what the prompt asks for"""
+    prompt = _message_text(messages[-1]) if messages else ""
+    if '"questions"' in prompt:
+        return json.dumps({
+            "questions": [
+                {
+                    "question": f"Mock question {i + 1}?",
+                    "options": ["Option A", "Option B", "Option C", "Option D"],
+                    "correct_answer": "Option B",
+                    "explanation": "Generated by the mock LLM server.",
+                }
+                for i in range(5)
+            ]
+        })
+    if '"flashcards"' in prompt:
+        return json.dumps({
+            "flashcards": [
+                {"front": f"Mock term {i + 1}", "back": "Mock definition.", "category": "Mock"}
+                for i in range(5)
+            ]
+        })
+    if '"content"' in prompt:
+        return json.dumps({"content": "Mock summary of the provided text.", "tags": ["mock", "summary"]})
+    return "mock, topics, list"
+
+
+def _malformed(content: str) -> str:
+    """A broken version of a completion, like the ones real models occasionally produce"""
+    return random.choice([
+        content[:len(content) // 2],  # cut off mid-JSON
+        "Sure! Here is what you asked for, based on the text provided.",  # no JSON at all
+        content.replace('"', "'"),  # Python-style quoting
+    ])
+
+
+def _decode_seconds(tokens: int) -> float:
+    return tokens / settings["tokens_per_second"] if settings["tokens_per_second"] > 0 else 0.0
+
+
+def _usage(messages: List[Dict], content: str) -> Dict:
+    """Token counts estimated at four characters per token"""
+    prompt_tokens = sum(len(_message_text(message)) for message in messages) // 4
+    cached_tokens = _cached_chars(messages) // 4
+    completion_tokens = len(content) // 4
+    stats["cached_prompt_tokens"] += cached_tokens
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+async def _stream_chunks(content: str, model: str, usage: Dict = None):
+    """Yield the completion as OpenAI-style server-sent events"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    size = settings["chunk_chars"]
+    chunk_delay = _decode_seconds(max(1, size // 4))
+    for start in range(0, len(content), size):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": content[start:start + size]}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(chunk_delay)
+    if usage:
+        yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'model': model, 'choices': [], 'usage': usage})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    stats["requests"] += 1
+    delay_ms = settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])
+    if delay_ms:
+        await asyncio.sleep(delay_ms / 1000)
+    if random.random() < settings["rate_limit_rate"]:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit exceeded", "code": 429}},
+            status_code=429,
+            headers={"Retry-After": str(settings["retry_after"])},
+        )
+    if random.random() < settings["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse({"error": {"message": "Upstream overloaded", "code": 503}}, status_code=503)
+
+    messages = payload.get("messages", [])
+    content = _canned_content(messages)
+    if random.random() < settings["malformed_rate"]:
+        stats["malformed"] += 1
+        content = _malformed(content)
+    usage = _usage(messages, content)
+    if payload.get("stream"):
+        include_usage = (payload.get("stream_options") or {}).get("include_usage")
+        return StreamingResponse(
+            _stream_chunks(content, payload.get("model", "mock"), usage if include_usage else None),
+            media_type="text/event-stream",
+        )
+    await asyncio.sleep(_decode_seconds(usage["completion_tokens"]))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+@app.get("/stats")
+async def mock_stats():
+    return stats
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra uniform random latency")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="output decode rate (0 = instant)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of completions with broken JSON or prose")
+    args = parser.parse_args()
+
+    settings.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        tokens_per_second=args.tokens_per_second,
+        malformed_rate=args.malformed_rate,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import httpx
+import pytest
+
+from app.ai_service import QuizForgeAI
+from app.cache import ResultCache
+from app.http_client import LLMHTTPClient
+from benchmarks import mock_llm_server
+
+
+@pytest.fixture
+def make_ai_service(monkeypatch):
+    """Build a QuizForgeAI talking to the in-process mock LLM server, with the result cache off"""
+    monkeypatch.setenv("LLM_API_URL", "http://127.0.0.1:9/v1/chat/completions")
+    monkeypatch.delenv("API_KEY", raising=False)
+
+    def make(**kwargs) -> QuizForgeAI:
+        http = LLMHTTPClient(transport=httpx.ASGITransport(app=mock_llm_server.app))
+        return QuizForgeAI(http_client=http, cache=ResultCache(enabled=False), **kwargs)
+
+    return make
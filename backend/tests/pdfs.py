@@ -0,0 +1,42 @@
+import io
+import zipfile
+from typing import Dict, List
+
+import fitz  # PyMuPDF
+from fastapi import UploadFile
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """A PDF with one page per string"""
+    document = fitz.open()
+    try:
+        for text in pages:
+            document.new_page().insert_text((50, 60), text, fontsize=11)
+        return document.tobytes()
+    finally:
+        document.close()
+
+
+def make_zip(members: Dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def upload(name: str, data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=name)
+
+
+def make_form_pdf(pages: List[str]) -> bytes:
+    """Like make_pdf, but each page draws its text through a form XObject, so every page has the same content stream"""
+    source = fitz.open(stream=make_pdf(pages), filetype="pdf")
+    document = fitz.open()
+    try:
+        for page_num in range(source.page_count):
+            document.new_page().show_pdf_page(fitz.Rect(0, 0, 595, 842), source, page_num)
+        return document.tobytes()
+    finally:
+        document.close()
+        source.close()
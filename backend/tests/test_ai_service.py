@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.scheduler import UpstreamOverloaded
+
+
+def test_shed_quiz_batches_fail_the_quiz_without_top_up(make_ai_service):
+    service = make_ai_service()
+    service.quiz_batch_size = 2
+    calls = 0
+
+    async def shed(*args):
+        nonlocal calls
+        calls += 1
+        raise UpstreamOverloaded("upstream queue is full")
+
+    service._quiz_batch_from_llm = shed
+    with pytest.raises(UpstreamOverloaded):
+        asyncio.run(service.generate_quiz("Enzymes lower activation energy. " * 200, 6, "Biology", "medium", use_cache=False))
+    assert calls == 3
+
+
+def test_shed_flashcard_batches_fail_the_deck_instead_of_falling_back(make_ai_service):
+    service = make_ai_service()
+    service.flashcard_batch_size = 2
+
+    async def shed(*args):
+        raise UpstreamOverloaded("upstream queue is full")
+
+    service._flashcard_batch_from_llm = shed
+    with pytest.raises(UpstreamOverloaded):
+        asyncio.run(service.generate_flashcards("Enzymes lower activation energy. " * 200, 6, "Biology", "basic", use_cache=False))
+
+
+def question(stem: str) -> dict:
+    return {"question": stem, "options": ["A", "B", "C", "D"], "correct_answer": "A"}
+
+
+def test_batched_quiz_dedupes_across_batches_and_tops_up_to_the_requested_count(make_ai_service):
+    service = make_ai_service()
+    service.quiz_batch_size = 4
+    enzymes = ["amylase", "lipase", "pepsin", "trypsin", "lactase", "maltase", "sucrase", "renin", "chymosin", "elastase"]
+    first_round = [
+        [question(f"Which substrate does {name} break down?") for name in enzymes[0:4]],
+        # Two near-duplicates of the first batch, as batches over one short document produce
+        [question("Which substrate does AMYLASE break down"), question("which substrate does lipase break down?")]
+        + [question(f"Which substrate does {name} break down?") for name in enzymes[4:6]],
+        [question(f"Which substrate does {enzymes[6]} break down?"), question("Which substrate does pepsin break down?!")],
+    ]
+    calls = []
+
+    async def batch(section, count, subject, difficulty, avoid, variant, cache_key):
+        calls.append((section, count, avoid, variant))
+        if avoid:
+            return {"questions": [question(f"Which substrate does {name} break down?") for name in enzymes[7:7 + count]]}
+        return {"questions": first_round[len(calls) - 1]}
+
+    service._quiz_batch_from_llm = batch
+    quiz = asyncio.run(service.generate_quiz("Enzymes lower activation energy. " * 200, 10, "Biology", "medium", use_cache=False))
+    stems = [item["question"] for item in quiz["questions"]]
+    assert stems == [f"Which substrate does {name} break down?" for name in enzymes]
+    # Three fan-out batches of 4 + 4 + 2, then one top-up for the three duplicates dropped
+    assert [count for _, count, _, _ in calls] == [4, 4, 2, 3]
+    # Fan-out batches never share a (section, variant), so none are coalesced into another
+    assert len({(section, variant) for section, _, _, variant in calls[:3]}) == 3
+    assert calls[3][2] == stems[:7]
@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import ExitStack
+
+import pytest
+
+from app.batch_upload import BatchUploader
+from app.document_store import DocumentStore
+from app.pdf_ingest import PDFIngestor, PDFLimitError
+
+from .pdfs import make_pdf, make_zip, upload
+
+
+@pytest.fixture
+def ingestor():
+    ingestor = PDFIngestor(workers=1)
+    yield ingestor
+    ingestor.shutdown()
+
+
+def test_batch_expands_archives_dedupes_and_closes_them(ingestor):
+    lecture = make_pdf(["Lecture one: cell membranes"])
+    files = [
+        upload("lecture.pdf", lecture),
+        upload("week1.zip", make_zip({"week1/copy.pdf": lecture, "week1/notes.pdf": make_pdf(["Enzymes lower activation energy"]), "week1/readme.txt": b"x"})),
+        upload("slides.pptx", b"not a pdf"),
+    ]
+
+    async def scenario():
+        uploader = BatchUploader(ingestor, DocumentStore())
+        with ExitStack() as archives:
+            entries, rejected = await uploader.entries(files, archives)
+            results = await uploader.ingest(entries)
+        return uploader, archives, results, rejected
+
+    uploader, archives, results, rejected = asyncio.run(scenario())
+    assert [result["filename"] for result in results] == ["lecture.pdf", "week1.zip/week1/copy.pdf", "week1.zip/week1/notes.pdf"]
+    assert [result["status"] for result in results] == ["ok", "duplicate", "ok"]
+    assert results[1]["document_id"] == results[0]["document_id"]
+    assert [result["filename"] for result in rejected] == ["slides.pptx"]
+    assert uploader.counters == {"batches": 1, "files": 4, "duplicates": 1, "failed": 1}
+
+
+def test_archive_members_are_read_lazily_until_the_stack_closes(ingestor):
+    async def scenario():
+        uploader = BatchUploader(ingestor, DocumentStore())
+        stack = ExitStack()
+        entries, _ = await uploader.entries([upload("one.zip", make_zip({"a.pdf": make_pdf(["page"])}))], stack)
+        name, read = entries[0]
+        assert name == "one.zip/a.pdf"
+        assert (await read()).startswith(b"%PDF")
+        stack.close()
+        # The archive was opened on the stack, so closing it ends access to its members
+        with pytest.raises(ValueError):
+            await read()
+
+    asyncio.run(scenario())
+
+
+def test_oversized_archive_member_is_rejected():
+    small = PDFIngestor(max_bytes=1024, workers=1)
+    big = make_pdf(["Photosynthesis converts light energy into chemical energy. " * 40] * 3)
+    assert len(big) > 1024
+
+    async def scenario():
+        uploader = BatchUploader(small, DocumentStore())
+        with ExitStack() as archives:
+            entries, _ = await uploader.entries([upload("big.zip", make_zip({"big.pdf": big}))], archives)
+            return await uploader.ingest(entries)
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        small.shutdown()
+    assert results[0]["filename"] == "big.zip/big.pdf"
+    assert results[0]["status"] == "error"
+    assert "upload limit" in results[0]["error"]
+
+
+def test_batch_with_too_many_members_is_rejected(ingestor):
+    archive = make_zip({f"lecture{i}.pdf": make_pdf([f"Lecture {i}"]) for i in range(3)})
+
+    async def scenario():
+        uploader = BatchUploader(ingestor, DocumentStore(), max_files=2)
+        with ExitStack() as archives:
+            await uploader.entries([upload("course.zip", archive)], archives)
+
+    with pytest.raises(PDFLimitError, match="3 PDFs; the limit is 2"):
+        asyncio.run(scenario())
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+from app.cache import MemoryCache, ResultCache, SQLiteCache, make_cache_key
+
+
+def test_cache_key_covers_kind_params_model_and_text():
+    key = make_cache_key("quiz", "text", {"num_questions": 5, "difficulty": "easy"}, "model")
+    assert key.startswith("quiz:")
+    assert key == make_cache_key("quiz", "text", {"difficulty": "easy", "num_questions": 5}, "model")
+    assert len({
+        key,
+        make_cache_key("summary", "text", {"num_questions": 5, "difficulty": "easy"}, "model"),
+        make_cache_key("quiz", "text!", {"num_questions": 5, "difficulty": "easy"}, "model"),
+        make_cache_key("quiz", "text", {"num_questions": 6, "difficulty": "easy"}, "model"),
+        make_cache_key("quiz", "text", {"num_questions": 5, "difficulty": "easy"}, "other-model"),
+    }) == 5
+
+
+def test_memory_cache_evicts_least_recently_used_within_bounds():
+    cache = MemoryCache(max_entries=2, max_bytes=10)
+    cache.set("a", "1111")
+    cache.set("b", "2222")
+    assert cache.get("a") == "1111"
+    cache.set("c", "3333")
+    assert cache.get("b") is None and cache.get("a") == "1111"
+    cache.set("d", "44444444")
+    assert len(cache) == 1 and cache.size_bytes == 8
+    cache.set("huge", "x" * 11)
+    assert cache.get("huge") is None
+    assert cache.evictions == 3
+
+
+def test_memory_cache_entries_expire():
+    cache = MemoryCache(ttl=0.01)
+    cache.set("a", "1")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_results_survive_a_restart_on_disk(tmp_path):
+    path = str(tmp_path / "cache" / "results.sqlite3")
+
+    async def scenario():
+        first = ResultCache(disk=SQLiteCache(path))
+        await first.set("key", {"questions": [1, 2]})
+        first.disk.close()
+        second = ResultCache(disk=SQLiteCache(path))
+        try:
+            value = await second.get("key")
+            value["questions"].append(3)
+            again = await second.get("key")
+        finally:
+            second.disk.close()
+        return second, value, again
+
+    cache, value, again = asyncio.run(scenario())
+    # Every hit is decoded afresh, so callers can't mutate the cached result
+    assert again == {"questions": [1, 2]}
+    assert (cache.hits, cache.disk_hits, cache.misses) == (2, 1, 0)
+
+
+def test_sqlite_tier_keeps_the_most_recently_used_rows(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "results.sqlite3"), max_entries=2)
+    try:
+        disk.set("a", "1")
+        time.sleep(0.01)
+        disk.set("b", "2")
+        time.sleep(0.01)
+        disk.get("a")
+        time.sleep(0.01)
+        disk.set("c", "3")
+        assert (disk.get("a"), disk.get("b"), disk.get("c")) == ("1", None, "3")
+        assert len(disk) == 2
+    finally:
+        disk.close()
+
+
+def test_disabled_cache_stores_nothing():
+    async def scenario():
+        cache = ResultCache(enabled=False)
+        await cache.set("key", {"a": 1})
+        return await cache.get("key"), len(cache.memory)
+
+    assert asyncio.run(scenario()) == (None, 0)
@@ -0,0 +1,99 @@
+import asyncio
+import random
+
+import httpx
+
+from app.ai_service import QuizForgeAI
+from app.cache import ResultCache
+from app.chunking import select_spread, split_into_chunks, stable_size
+from app.http_client import LLMHTTPClient
+from benchmarks import mock_llm_server
+
+_WORDS = "cell membrane protein energy enzyme reaction gradient transport signal molecule".split()
+
+
+def paragraphs(count: int, sentences: int = 8, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    return "\n\n".join(
+        " ".join(" ".join(rng.choices(_WORDS, k=10)).capitalize() + "." for _ in range(sentences))
+        for _ in range(count)
+    )
+
+
+class CountingTransport(httpx.ASGITransport):
+    """The in-process mock LLM server, counting the completions requested from it"""
+
+    def __init__(self):
+        super().__init__(app=mock_llm_server.app)
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return await super().handle_async_request(request)
+
+
+def test_chunks_respect_the_size_bound_and_overlap():
+    text = paragraphs(40)
+    chunks = split_into_chunks(text, max_chars=2000, overlap_chars=200)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # Each chunk opens with the tail of the one before it
+        assert previous.endswith(chunk.split("\n\n", 1)[0])
+    assert all(paragraph in text for chunk in chunks for paragraph in chunk.split("\n\n")[1:])
+
+
+def test_oversized_units_are_split_on_sentences():
+    text = paragraphs(1, sentences=60)
+    chunks = split_into_chunks(text, max_chars=1000, overlap_chars=0)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 1000 and chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_page_chunks_never_split_a_page_that_fits():
+    pages = paragraphs(30, sentences=4).split("\n\n")
+    chunks = split_into_chunks("", max_chars=3000, overlap_chars=0, pages=pages)
+    assert sum(chunk.count("\n\n") + 1 for chunk in chunks) == len(pages)
+    assert "\n\n".join(chunks) == "\n\n".join(pages)
+
+
+def test_select_spread_picks_across_the_document_and_is_stable():
+    chunks = [f"chunk {i}" for i in range(20)]
+    picked = select_spread(chunks, 4)
+    assert len(picked) == 4
+    assert [chunks.index(chunk) // 5 for chunk in picked] == [0, 1, 2, 3]
+    edited = chunks[:18] + ["edited", "chunk 19"]
+    assert select_spread(edited, 4)[:3] == picked[:3]
+    assert select_spread(chunks[:3], 4) == chunks[:3]
+
+
+def test_stable_size_rounds_down_to_a_coarse_ladder():
+    assert stable_size(800) == 800
+    assert stable_size(1000) == 1000
+    assert stable_size(1400) == 1000
+    assert stable_size(1500) == 1414
+    assert stable_size(12000) == stable_size(11500)
+
+
+def test_long_document_summary_maps_chunks_then_reduces(monkeypatch):
+    monkeypatch.setenv("API_KEY", "test")
+    monkeypatch.setenv("LLM_API_URL", "http://127.0.0.1:9/v1/chat/completions")
+    monkeypatch.setenv("SUMMARY_CHUNK_OVERLAP", "0")
+    transport = CountingTransport()
+    service = QuizForgeAI(http_client=LLMHTTPClient(transport=transport), cache=ResultCache(enabled=False))
+    # Longer than any single request takes, so it can't be summarized in one call
+    text = paragraphs(250)
+    chunks = split_into_chunks(text, service.summary_chunk_chars, 0)
+    assert len(chunks) > 1
+
+    async def scenario():
+        try:
+            return await service.generate_summary(text, "bullet_points", full_document=True)
+        finally:
+            await service.shutdown()
+
+    summary = asyncio.run(scenario())
+    assert summary["content"]
+    # One call per chunk, then one to merge the partial summaries
+    assert transport.requests == len(chunks) + 1
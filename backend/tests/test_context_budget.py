@@ -0,0 +1,43 @@
+from app.context_budget import ContextBudget, estimate_tokens, extract_to_budget, split_sentences
+
+
+def test_non_ascii_text_costs_more_tokens_per_character():
+    assert estimate_tokens("a" * 400) == 100
+    assert estimate_tokens("細胞膜" * 100) == 300
+    assert estimate_tokens("") == 0
+
+
+def test_input_budget_reserves_prompt_output_and_reasoning():
+    budget = ContextBudget(context_window=10000, reasoning_reserve=1000, safety_margin=0.1)
+    assert budget.input_tokens(output_tokens=2000, prompt_tokens=1000) == 5400
+    assert ContextBudget(context_window=10000, max_input_tokens=500).input_tokens(2000, 1000) == 500
+    # Never below a floor, however small the window
+    assert ContextBudget(context_window=1000).input_tokens(2000, 1000) == 256
+
+
+def test_fit_keeps_text_that_fits_and_shortens_text_that_does_not():
+    budget = ContextBudget(context_window=8192, max_input_tokens=300)
+    short = "Enzymes lower activation energy."
+    assert budget.fit(short, 100, 100) == short
+    sentences = [f"Topic {i} covers {word} in depth." for i, word in enumerate(["enzymes", "membranes", "osmosis", "proteins"] * 50)]
+    text = " ".join(sentences)
+    fitted = budget.fit(text, 100, 100)
+    assert budget.estimate(fitted) <= 300
+    assert budget.fits(fitted, 100, 100)
+
+
+def test_extract_keeps_whole_sentences_in_order_and_covers_distinct_terms():
+    sentences = ["Mitochondria produce energy."] * 20 + ["Ribosomes assemble proteins.", "Osmosis moves water across membranes."]
+    text = " ".join(sentences)
+    extracted = extract_to_budget(text, 25)
+    kept = split_sentences(extracted)
+    assert all(sentence in sentences for sentence in kept)
+    assert "Ribosomes assemble proteins." in kept and "Osmosis moves water across membranes." in kept
+    assert kept.index("Ribosomes assemble proteins.") < kept.index("Osmosis moves water across membranes.")
+    # Repeats of an already covered sentence are the first to go
+    assert kept.count("Mitochondria produce energy.") < 20
+
+
+def test_long_unpunctuated_runs_are_split_on_lines():
+    table = "\n".join(f"row {i} value {i * 2}" for i in range(200))
+    assert len(split_sentences(table)) == 200
@@ -0,0 +1,39 @@
+import asyncio
+
+from app.document_store import DocumentStore, diff_pages, page_fingerprint, version_changes
+
+
+def test_diff_pages_tracks_inserted_and_removed_pages():
+    assert diff_pages(["a", "b", "c"], ["a", "x", "b", "c"]) == {
+        "unchanged_pages": 3, "changed_pages": [], "added_pages": [2], "removed_pages": 0,
+    }
+    assert diff_pages(["a", "b", "c"], ["a", "B", "c"]) == {
+        "unchanged_pages": 2, "changed_pages": [2], "added_pages": [], "removed_pages": 0,
+    }
+    assert diff_pages(["a", "b", "c"], ["a", "c"]) == {
+        "unchanged_pages": 2, "changed_pages": [], "added_pages": [], "removed_pages": 1,
+    }
+
+
+def test_page_fingerprint_ignores_whitespace():
+    assert page_fingerprint("Cell  membranes\n") == page_fingerprint("Cell membranes")
+    assert page_fingerprint("Cell membranes") != page_fingerprint("Cell walls")
+
+
+def test_changes_only_against_the_named_previous_version():
+    async def scenario():
+        store = DocumentStore()
+        pages = ["Page one", "Page two"]
+        previous_id = await store.put("".join(pages), pages, "notes.pdf", sources=["s1", "s2"])
+        previous = await store.get(previous_id)
+        new_pages = ["Page one", "Page two, revised"]
+        # Another upload under the same filename knows nothing about the first
+        await store.put("".join(new_pages), new_pages, "notes.pdf")
+        return previous_id, previous, [page_fingerprint(page) for page in new_pages]
+
+    previous_id, previous, fingerprints = asyncio.run(scenario())
+    assert previous["sources"] == ["s1", "s2"]
+    assert version_changes(previous_id, previous, fingerprints) == {
+        "previous_document_id": previous_id, "unchanged_pages": 1, "changed_pages": [2], "added_pages": [], "removed_pages": 0,
+    }
+    assert version_changes(previous_id, None, fingerprints) is None
@@ -0,0 +1,156 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from app.grading import BulkGrader, grade_answers
+
+KEY = ["A", "c", " B", "d", "True", "a"]
+# Per question: the key answer in two spellings, then three wrong answers and a blank
+CHOICES = [
+    ["a", " A ", "B", "c", "d", ""],
+    ["c", " C ", "a", "B", "d", ""],
+    ["b", " B ", "a", "c", "d", ""],
+    ["d", " D ", "a", "B", "c", ""],
+    ["true", "TRUE ", "false", "Maybe", "no", ""],
+    ["a", " A ", "B", "c", "d", ""],
+]
+
+
+def reference_grade(key, batches, pass_score=60):
+    """Plain-Python grading of every batch, for checking BulkGrader's vectorized version"""
+    key = [answer.strip().lower() for answer in key]
+    results, scores, rights, rejected = [], [], [], 0
+    wrong = [Counter() for _ in key]
+    for batch in batches:
+        for student_id, answers in batch:
+            if len(answers) != len(key):
+                rejected += 1
+                results.append({"student_id": student_id, "error": f"Expected {len(key)} answers, got {len(answers)}"})
+                continue
+            answers = [answer.strip().lower() for answer in answers]
+            right = [answer == expected for answer, expected in zip(answers, key)]
+            score = sum(right) * (100.0 / len(key))
+            for question, (answer, ok) in enumerate(zip(answers, right)):
+                if not ok:
+                    wrong[question][answer or "(blank)"] += 1
+            scores.append(score)
+            rights.append(right)
+            results.append({
+                "student_id": student_id,
+                "score": score,
+                "correct_answers": sum(right),
+                "total_questions": len(key),
+                "passed": score >= pass_score,
+                "incorrect_questions": [question for question, ok in enumerate(right) if not ok],
+            })
+
+    graded = len(scores)
+    mean = sum(scores) / graded
+    std = math.sqrt(sum((score - mean) ** 2 for score in scores) / graded)
+    histogram = [0] * 10
+    for score in scores:
+        histogram[min(int(score // 10), 9)] += 1
+    items = []
+    for question in range(len(key)):
+        right_scores = [score for score, right in zip(scores, rights) if right[question]]
+        p = len(right_scores) / graded
+        discrimination = None
+        if std > 0 and 0 < len(right_scores) < graded:
+            discrimination = (sum(right_scores) / len(right_scores) - mean) / std * math.sqrt(p / (1 - p))
+        items.append({"difficulty_index": p, "discrimination": discrimination, "distractors": dict(wrong[question])})
+    statistics = {
+        "graded": graded,
+        "rejected": rejected,
+        "mean_score": mean,
+        "std_score": std,
+        "pass_rate": sum(score >= pass_score for score in scores) / graded,
+        "histogram": histogram,
+        "items": items,
+    }
+    return results, statistics
+
+
+def make_batches(seed=7):
+    rng = random.Random(seed)
+    batches = []
+    student = 0
+    for size in (1, 17, 40, 3):
+        batch = []
+        for _ in range(size):
+            student += 1
+            answers = [rng.choice(choices) for choices in CHOICES]
+            batch.append((f"s{student}", answers))
+        batches.append(batch)
+    batches[1].append(("perfect", list(KEY)))
+    batches[1].append(("short", ["A", "c"]))
+    batches[2].append(("long", list(KEY) + ["extra"]))
+    # Nobody in this batch gives the key's "true", so its key code is -1
+    batches[3] = [(student_id, answers[:4] + ["false", answers[5]]) for student_id, answers in batches[3]]
+    batches.append([("only-rejected", [])])
+    return batches
+
+
+def test_bulk_grader_matches_a_plain_python_grader_across_batches():
+    batches = make_batches()
+    grader = BulkGrader(KEY)
+    results = [result for batch in batches for result in grader.grade_batch(batch)]
+    statistics = grader.statistics()
+    expected_results, expected = reference_grade(KEY, batches)
+
+    assert results == expected_results
+    assert statistics["graded"] == expected["graded"]
+    assert statistics["rejected"] == expected["rejected"] == 3
+    assert statistics["mean_score"] == pytest.approx(expected["mean_score"], abs=0.01)
+    assert statistics["std_score"] == pytest.approx(expected["std_score"], abs=0.01)
+    assert statistics["pass_rate"] == pytest.approx(expected["pass_rate"], abs=1e-4)
+    assert [bucket["count"] for bucket in statistics["score_histogram"]] == expected["histogram"]
+    for item, reference in zip(statistics["items"], expected["items"]):
+        assert item["difficulty_index"] == pytest.approx(reference["difficulty_index"], abs=1e-4)
+        if reference["discrimination"] is None:
+            assert item["discrimination"] is None
+        else:
+            assert item["discrimination"] == pytest.approx(reference["discrimination"], abs=1e-4)
+        # At most four distinct wrong answers per question, so none are cut by TOP_DISTRACTORS
+        assert {d["answer"]: d["count"] for d in item["distractors"]} == reference["distractors"]
+
+
+def test_perfect_scores_land_in_the_last_histogram_bucket():
+    grader = BulkGrader(["a", "b"])
+    grader.grade_batch([("1", ["A", "b"]), ("2", ["a", "x"]), ("3", ["x", "y"])])
+    histogram = grader.statistics()["score_histogram"]
+    assert histogram[-1] == {"min": 90, "max": 100, "count": 1}
+    assert histogram[5]["count"] == 1
+    assert histogram[0]["count"] == 1
+    assert sum(bucket["count"] for bucket in histogram) == 3
+
+
+def test_blank_answers_are_reported_as_a_distractor():
+    grader = BulkGrader(["a"])
+    grader.grade_batch([("1", [" "]), ("2", [""]), ("3", ["a"])])
+    item = grader.statistics()["items"][0]
+    assert item["distractors"] == [{"answer": "(blank)", "count": 2, "rate": round(2 / 3, 4)}]
+
+
+def test_encode_interns_normalized_answers():
+    codes, values = BulkGrader._encode([[" A", "b"], ["a", "B "], ["c", "b"]])
+    assert values == ["a", "b", "c"]
+    assert codes.tolist() == [[0, 1], [0, 1], [2, 1]]
+
+
+def test_key_answers_missing_from_a_batch_get_code_minus_one():
+    grader = BulkGrader(["A", " c", "b"])
+    assert grader._key_codes(["b", "a"]).tolist() == [1, -1, 0]
+
+
+def test_single_submission_grading_matches_the_bulk_grader():
+    result = BulkGrader(KEY).grade_batch([("s", ["a", "C", "x", "d", "true", " A "])])[0]
+    single = grade_answers(["a", "C", "x", "d", "true", " A "], KEY)
+    assert (result["score"], result["correct_answers"], result["passed"]) == (single["score"], single["correct_answers"], single["passed"])
+    assert result["incorrect_questions"] == [2]
+
+
+def test_empty_key_is_rejected():
+    with pytest.raises(ValueError):
+        BulkGrader([])
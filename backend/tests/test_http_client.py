@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.http_client import LLMHTTPClient, is_local_url
+
+
+class KeepAliveServer:
+    """A minimal HTTP/1.1 JSON server that counts connections and concurrent requests"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __aenter__(self) -> "KeepAliveServer":
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/v1/chat/completions"
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = next(int(line.split(b":", 1)[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length:"))
+                payload = json.loads(await reader.readexactly(length))
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                await asyncio.sleep(self.delay)
+                self.in_flight -= 1
+                body = json.dumps({"echo": payload}).encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def test_sequential_calls_reuse_one_connection():
+    async def scenario():
+        async with KeepAliveServer() as server:
+            client = LLMHTTPClient()
+            try:
+                for i in range(5):
+                    assert await client.post_json(server.url, {}, {"n": i}) == {"echo": {"n": i}}
+                assert server.connections == 1
+            finally:
+                await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_close_drops_the_pool_and_the_next_call_reopens_it():
+    async def scenario():
+        async with KeepAliveServer() as server:
+            client = LLMHTTPClient()
+            await client.start()
+            await client.start()
+            assert client.started
+            await client.post_json(server.url, {}, {})
+            await client.aclose()
+            assert not client.started
+            await client.aclose()
+            # A closed pool is reopened lazily, on a fresh connection
+            await client.post_json(server.url, {}, {})
+            assert client.started
+            assert server.connections == 2
+            await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_per_host_limit_caps_concurrent_requests():
+    async def scenario():
+        async with KeepAliveServer(delay=0.05) as server:
+            client = LLMHTTPClient(per_host_limit=2)
+            try:
+                await asyncio.gather(*(client.post_json(server.url, {}, {"n": i}) for i in range(6)))
+            finally:
+                await client.aclose()
+            assert server.max_in_flight == 2
+            assert server.connections == 2
+
+    asyncio.run(scenario())
+
+
+def test_close_closes_an_injected_transport():
+    class Transport(httpx.AsyncBaseTransport):
+        closed = False
+
+        async def handle_async_request(self, request):
+            return httpx.Response(500, json={"error": "down"})
+
+        async def aclose(self):
+            self.closed = True
+
+    async def scenario():
+        transport = Transport()
+        client = LLMHTTPClient(transport=transport)
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.post_json("http://upstream.test/v1", {}, {})
+        await client.aclose()
+        return transport
+
+    assert asyncio.run(scenario()).closed
+
+
+def test_local_urls_are_recognised():
+    assert is_local_url("http://127.0.0.1:8001/v1/chat/completions")
+    assert is_local_url("http://localhost/v1")
+    assert not is_local_url("https://openrouter.ai/api/v1/chat/completions")
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.jobs import JobQueue, JobQueueFull, JobStore, MemoryJobStore, SQLiteJobStore, public_job
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    stores = []
+
+    def make(**kwargs) -> JobStore:
+        if request.param == "memory":
+            kwargs.pop("stale_after", None)
+            store = MemoryJobStore(**kwargs)
+        else:
+            store = SQLiteJobStore(str(tmp_path / "jobs.db"), **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def test_incomplete_store_fails_at_instantiation():
+    class NoPurge(JobStore):
+        async def create(self, kind, params, priority): ...
+        async def get(self, job_id): ...
+        async def claim(self): ...
+        async def finish(self, job_id, status, result=None, error=None): ...
+        async def queued(self): ...
+        async def stats(self): ...
+
+    with pytest.raises(TypeError):
+        NoPurge()
+
+
+def test_claims_by_priority_then_age(make_store):
+    async def scenario():
+        store = make_store()
+        low = await store.create("quiz", {"n": 1}, 0)
+        high = await store.create("quiz", {"n": 2}, 5)
+        later = await store.create("quiz", {"n": 3}, 0)
+        claimed = [(await store.claim())["id"] for _ in range(3)]
+        assert claimed == [high["id"], low["id"], later["id"]]
+        assert await store.claim() is None
+        assert (await store.get(low["id"]))["status"] == "running"
+
+    asyncio.run(scenario())
+
+
+def test_finish_stores_result_and_drops_params(make_store):
+    async def scenario():
+        store = make_store()
+        job = await store.create("summary", {"document_id": "abc"}, 0)
+        await store.claim()
+        await store.finish(job["id"], "succeeded", result={"content": "done"})
+        finished = await store.get(job["id"])
+        assert finished["status"] == "succeeded"
+        assert finished["result"] == {"content": "done"}
+        assert finished["params"] == {}
+        assert "params" not in public_job(finished)
+        assert (await store.stats())["succeeded"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_stats_run_off_the_event_loop(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    query_threads = []
+    count_statuses = store._stats
+
+    def stats():
+        query_threads.append(threading.get_ident())
+        return count_statuses()
+
+    store._stats = stats
+
+    async def scenario():
+        await store.create("quiz", {}, 0)
+        queue = JobQueue(store)
+        return await queue.stats()
+
+    try:
+        stats = asyncio.run(scenario())
+    finally:
+        store.close()
+    assert stats["queued"] == 1 and stats["workers"] >= 1
+    assert query_threads and threading.get_ident() not in query_threads
+
+
+def test_expired_results_are_hidden_and_purged(make_store):
+    async def scenario():
+        store = make_store(result_ttl=0)
+        job = await store.create("quiz", {}, 0)
+        await store.claim()
+        await store.finish(job["id"], "failed", error="boom")
+        assert await store.get(job["id"]) is None
+        assert await store.purge() == 1
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_store_reclaims_stale_running_jobs(tmp_path):
+    async def scenario():
+        store = SQLiteJobStore(str(tmp_path / "jobs.db"), stale_after=0)
+        try:
+            job = await store.create("quiz", {}, 0)
+            assert (await store.claim())["id"] == job["id"]
+            # Its worker is presumed dead, so another worker picks it up again
+            assert (await store.claim())["id"] == job["id"]
+        finally:
+            store.close()
+
+    asyncio.run(scenario())
+
+
+def test_queue_runs_handlers_and_reports_failures():
+    async def scenario():
+        queue = JobQueue(MemoryJobStore(), workers=2, max_queued=10, poll_interval=0.05)
+
+        async def double(params):
+            return {"value": params["value"] * 2}
+
+        async def broken(params):
+            raise ValueError("bad input")
+
+        queue.register("double", double)
+        queue.register("broken", broken)
+        await queue.start()
+        try:
+            ok = await queue.submit("double", {"value": 21})
+            failed = await queue.submit("broken", {})
+            ok = await queue.wait(ok["id"], 5)
+            failed = await queue.wait(failed["id"], 5)
+        finally:
+            await queue.shutdown()
+        assert ok["status"] == "succeeded" and ok["result"] == {"value": 42}
+        assert failed["status"] == "failed" and failed["error"] == "bad input"
+
+    asyncio.run(scenario())
+
+
+def test_queue_rejects_unknown_kinds_and_overflow():
+    async def scenario():
+        queue = JobQueue(MemoryJobStore(), max_queued=1)
+
+        async def noop(params):
+            return {}
+
+        queue.register("noop", noop)
+        with pytest.raises(ValueError):
+            await queue.submit("missing", {})
+        await queue.submit("noop", {})
+        with pytest.raises(JobQueueFull):
+            await queue.submit("noop", {})
+
+    asyncio.run(scenario())
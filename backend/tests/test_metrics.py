@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.metrics import MetricsMiddleware, MetricsRegistry
+
+
+def test_counter_renders_text_exposition_format():
+    registry = MetricsRegistry()
+    lookups = registry.counter("lookups_total", "Cache lookups", ("kind", "result"))
+    lookups.inc(kind="quiz", result="miss")
+    lookups.inc(2, kind="quiz", result="hit")
+    lookups.inc(0.5, kind='say "hi"\n', result="hit")
+    assert lookups.value(kind="quiz", result="hit") == 2
+    assert asyncio.run(registry.render()) == (
+        "# HELP lookups_total Cache lookups\n"
+        "# TYPE lookups_total counter\n"
+        'lookups_total{kind="quiz",result="hit"} 2\n'
+        'lookups_total{kind="quiz",result="miss"} 1\n'
+        'lookups_total{kind="say \\"hi\\"\\n",result="hit"} 0.5\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("task",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, task="quiz")
+    assert latency.count(task="quiz") == 4
+    assert latency.count(task="summary") == 0
+    assert asyncio.run(registry.render()).splitlines() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{task="quiz",le="0.1"} 2',
+        'latency_seconds_bucket{task="quiz",le="1"} 3',
+        'latency_seconds_bucket{task="quiz",le="+Inf"} 4',
+        'latency_seconds_sum{task="quiz"} 3.65',
+        'latency_seconds_count{task="quiz"} 4',
+    ]
+
+
+def test_collectors_are_read_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = {"queued": 1}
+    registry.register_collector(lambda: [("jobs_queued", "gauge", "Queued jobs", depth["queued"])])
+    depth["queued"] = 7
+    assert asyncio.run(registry.render()) == "# HELP jobs_queued Queued jobs\n# TYPE jobs_queued gauge\njobs_queued 7\n"
+
+
+def test_async_collectors_are_awaited():
+    registry = MetricsRegistry()
+
+    async def jobs():
+        await asyncio.sleep(0)
+        return [("jobs_running", "gauge", "Running jobs", 2)]
+
+    registry.register_collector(jobs)
+    assert asyncio.run(registry.render()).endswith("jobs_running 2\n")
+
+
+def test_middleware_labels_requests_by_route_template():
+    registry = MetricsRegistry()
+    latency = registry.histogram("http_seconds", "HTTP latency", ("method", "route", "status"))
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, histogram=latency)
+
+    @app.get("/documents/{document_id}")
+    async def document(document_id: str):
+        return {"id": document_id}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            yield b"a"
+            await asyncio.sleep(0.05)
+            yield b"b"
+        return StreamingResponse(chunks())
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for document_id in ("a1", "b2", "c3"):
+                assert (await client.get(f"/documents/{document_id}")).status_code == 200
+            assert (await client.get("/missing")).status_code == 404
+            assert (await client.get("/stream")).text == "ab"
+
+    asyncio.run(scenario())
+    # One series per route template, never per raw path
+    assert latency.count(method="GET", route="/documents/{document_id}", status="200") == 3
+    assert latency.count(method="GET", route="unmatched", status="404") == 1
+    assert "a1" not in asyncio.run(registry.render())
+    # Streamed responses are timed to the last body byte
+    series = latency._series[("GET", "/stream", "200")]
+    assert series[1] >= 0.05
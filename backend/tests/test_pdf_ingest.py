@@ -0,0 +1,72 @@
+import asyncio
+
+import fitz  # PyMuPDF
+import pytest
+
+from app.pdf_ingest import PDFIngestor, PDFLimitError, _page_sources
+
+from .pdfs import make_form_pdf, make_pdf
+
+
+@pytest.fixture
+def ingestor():
+    ingestor = PDFIngestor(workers=1)
+    yield ingestor
+    ingestor.shutdown()
+
+
+def test_pages_drawn_through_form_xobjects_do_not_collide(ingestor):
+    first = make_form_pdf(["Photosynthesis happens in chloroplasts"])
+    second = make_form_pdf(["The French Revolution began in 1789"])
+    assert _page_sources(first, 10) != _page_sources(second, 10)
+
+    async def scenario():
+        previous = await ingestor.ingest(first)
+        return await ingestor.ingest(second, previous)
+
+    result = asyncio.run(scenario())
+    assert result["reused_pages"] == 0
+    assert "French Revolution" in result["text_content"]
+    assert "Photosynthesis" not in result["text_content"]
+
+
+def test_identical_pages_match_and_edited_pages_do_not():
+    first = make_pdf(["Same glyphs"])
+    assert _page_sources(first, 10) == _page_sources(make_pdf(["Same glyphs"]), 10)
+    assert _page_sources(first, 10) != _page_sources(make_pdf(["Other glyphs"]), 10)
+
+
+def test_new_version_reuses_unchanged_pages_of_the_version_it_replaces(ingestor):
+    original = make_pdf(["Page one", "Page two", "Page three"])
+    edited = make_pdf(["Page one", "Page two, revised", "Page three"])
+
+    async def scenario():
+        previous = await ingestor.ingest(original)
+        return await ingestor.ingest(edited, previous)
+
+    result = asyncio.run(scenario())
+    assert result["reused_pages"] == 2
+    assert [page.strip() for page in result["pages"]] == ["Page one", "Page two, revised", "Page three"]
+    assert ingestor.stats() == {"pages_extracted": 4, "pages_reused": 2}
+
+
+def test_pages_are_not_reused_across_unrelated_uploads(ingestor):
+    data = make_pdf(["Shared slide"])
+
+    async def scenario():
+        await ingestor.ingest(data)
+        return await ingestor.ingest(data)
+
+    assert asyncio.run(scenario())["reused_pages"] == 0
+
+
+def test_page_limit_is_checked_before_any_page_is_read(ingestor, monkeypatch):
+    ingestor.max_pages = 2
+    data = make_pdf(["One", "Two", "Three"])
+
+    def load_page(self, page_num):
+        raise AssertionError("page read before the page limit was checked")
+
+    monkeypatch.setattr(fitz.Document, "load_page", load_page)
+    with pytest.raises(PDFLimitError, match="3 pages; the limit is 2"):
+        asyncio.run(ingestor.ingest(data))
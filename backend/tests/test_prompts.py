@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from app.prompts import (
+    DOCUMENT_HEADER,
+    SYSTEM_MESSAGE,
+    PromptCachePolicy,
+    PromptTemplate,
+    TokenUsage,
+    cached_tokens,
+    flashcard_prompt,
+    quiz_prompt,
+    summary_prompt,
+)
+
+DOCUMENT = "Mitochondria produce ATP through oxidative phosphorylation."
+
+
+def task_prompts(document):
+    return [
+        summary_prompt(document, "short", "Biology"),
+        summary_prompt(document, "detailed", None),
+        quiz_prompt(document, 5, "Biology", "hard"),
+        flashcard_prompt(document, 10, "Biology", "definition"),
+    ]
+
+
+def test_tasks_on_one_document_share_the_prompt_prefix():
+    prefix = f"{DOCUMENT_HEADER}{DOCUMENT}\n\n"
+    for prompt in task_prompts(DOCUMENT):
+        system, user = prompt.messages()
+        assert system == {"role": "system", "content": SYSTEM_MESSAGE}
+        assert user["content"].startswith(prefix)
+        assert DOCUMENT not in prompt.task
+
+
+def test_cache_control_marks_the_document_as_a_breakpoint():
+    prompt = quiz_prompt(DOCUMENT, 5, "Biology", "easy")
+    document, task = prompt.messages(cache_control=True)[1]["content"]
+    assert document == {"type": "text", "text": DOCUMENT_HEADER + DOCUMENT, "cache_control": {"type": "ephemeral"}}
+    assert task == {"type": "text", "text": prompt.task}
+    assert "easy level quiz with 5" in task["text"]
+
+
+def test_extend_only_changes_the_task():
+    prompt = flashcard_prompt(DOCUMENT, 3, "Biology", "fact")
+    before = prompt.messages()[1]["content"]
+    prompt.extend("Avoid these fronts: ATP")
+    after = prompt.messages()[1]["content"]
+    assert after.startswith(before)
+    assert after.endswith("\n\nAvoid these fronts: ATP")
+
+
+def test_template_renders_fields_and_format():
+    template = PromptTemplate("  Quiz on {subject} ({count}).  ", "Respond with JSON.")
+    prompt = template.render("text", subject="cells", count=3)
+    assert prompt.task == "Quiz on cells (3).\n\nRespond with JSON."
+    with pytest.raises(KeyError):
+        template.render("text", subject="cells")
+
+
+def test_template_without_fields_renders_as_is():
+    template = PromptTemplate("Extract topics.")
+    assert template.fields == set()
+    assert template.render("text").task == "Extract topics."
+
+
+def test_cache_policy_modes():
+    auto = PromptCachePolicy("auto")
+    assert auto.cache_control("anthropic/claude-sonnet-4")
+    assert auto.cache_control("google/gemini-2.5-flash")
+    assert not auto.cache_control("qwen/qwen3-32b")
+    assert PromptCachePolicy("always").cache_control("qwen/qwen3-32b")
+    assert not PromptCachePolicy("never").cache_control("anthropic/claude-sonnet-4")
+    with pytest.raises(ValueError):
+        PromptCachePolicy("sometimes")
+
+
+def test_token_usage_totals_per_task():
+    usage = TokenUsage()
+    usage.record("quiz", {"prompt_tokens": 1000, "completion_tokens": 200, "prompt_tokens_details": {"cached_tokens": 800}})
+    usage.record("quiz", {"prompt_tokens": 1000, "completion_tokens": 100})
+    usage.record("quiz", None)
+    stats = usage.stats()["tasks"]["quiz"]
+    assert stats["calls"] == 2
+    assert stats["cached_prompt_tokens"] == 800
+    assert stats["cached_prompt_ratio"] == 0.4
+    assert stats["completion_tokens_per_call"] == 150.0
+    assert cached_tokens({"prompt_tokens_details": None}) == 0
+
+
+def long_document(sentences: int) -> str:
+    return " ".join(f"Topic {i} explains how enzyme{i} binds substrate{i * 7} in pathway{i % 13}." for i in range(sentences))
+
+
+def test_tasks_fit_a_long_document_to_the_same_text(make_ai_service, monkeypatch):
+    monkeypatch.setenv("LLM_CONTEXT_WINDOW", "8000")
+    service = make_ai_service()
+    document = long_document(800)
+
+    async def scenario():
+        summary, _ = await service._prepare("summary", document, 1500, {})
+        quiz, _ = await service._prepare("quiz", document, 5 * 150, {})
+        flashcards, _ = await service._prepare("flashcards", document, 3 * 80, {})
+        bigger, _ = await service._prepare("quiz", document, 30 * 150, {})
+        return summary, quiz, flashcards, bigger
+
+    summary, quiz, flashcards, bigger = asyncio.run(scenario())
+    assert len(summary) < len(document)
+    assert summary == quiz == flashcards
+    # A task that needs more output room than the shared budget still gets it
+    assert len(bigger) < len(summary)
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.question_bank import QuestionBank, section_topics
+
+
+def question(text: str) -> dict:
+    return {"question": text, "options": ["A) yes", "B) no"], "correct_answer": "A", "explanation": None}
+
+
+# Distinct wording per question so none is dropped as a near-duplicate
+QUESTIONS = {
+    "cells": ["Which organelle produces cellular energy?", "What surrounds every animal cell?", "Where are proteins assembled inside cells?"],
+    "history": ["When did the French Revolution begin?", "Who crowned himself emperor in 1804?", "Which treaty ended the First World War?"],
+}
+
+
+@pytest.fixture
+def bank():
+    bank = QuestionBank(":memory:", min_attempts=2)
+    for topic, texts in QUESTIONS.items():
+        bank._add("doc", "Biology", "medium", [(topic, question(text)) for text in texts])
+    yield bank
+    bank.close()
+
+
+def test_exclusions_are_only_repeated_once_the_rest_is_used(bank):
+    first = bank._assemble("doc", "Biology", 4, "medium", [])
+    assert first["remaining"] == 2
+    second = bank._assemble("doc", "Biology", 4, "medium", first["question_ids"])
+    fresh = [question_id for question_id in second["question_ids"] if question_id not in first["question_ids"]]
+    assert len(fresh) == 2
+    assert second["question_ids"][:2] == fresh
+    assert bank._available("doc", "Biology", "medium", first["question_ids"] + fresh) == 0
+
+
+def test_quiz_is_spread_across_topics(bank):
+    quiz = bank._assemble("doc", "Biology", 2, "medium", [])
+    texts = [item["question"] for item in quiz["questions"]]
+    assert {topic for topic, questions in QUESTIONS.items() for text in texts if text in questions} == {"cells", "history"}
+
+
+def test_banks_are_per_subject(bank):
+    assert bank._available("doc", "History", "medium", []) == 0
+    assert bank._assemble("doc", "History", 3, "medium", [])["questions"] == []
+    assert bank._add("doc", "History", "medium", [("history", question(QUESTIONS["history"][0]))]) == 1
+    assert bank._available("doc", "History", "medium", []) == 1
+    assert bank._stats("doc")["by_subject"] == {"Biology": 6, "History": 1}
+
+
+def test_graded_attempts_move_questions_between_levels(bank):
+    ids = bank._assemble("doc", "Biology", 6, "medium", [])["question_ids"]
+    assert bank._record("doc", ids[:1], [4], [4]) == 1
+    assert bank._record("doc", ids[1:2], [4], [0]) == 1
+    assert bank._record("other", ids[2:3], [4], [4]) == 0
+    assert bank._available("doc", "Biology", "easy", []) == 1
+    assert bank._available("doc", "Biology", "hard", []) == 1
+    assert bank._available("doc", "Biology", "medium", []) == 4
+    # An easy quiz takes the easy question first, then falls back to medium ones
+    easy = bank._assemble("doc", "Biology", 2, "easy", [])
+    assert easy["question_ids"][0] == ids[0]
+    assert ids[1] not in easy["question_ids"]
+
+
+def test_least_served_questions_come_first(bank):
+    served = set()
+    for _ in range(3):
+        quiz = bank._assemble("doc", "Biology", 2, "medium", [])
+        assert not served & set(quiz["question_ids"])
+        served.update(quiz["question_ids"])
+    assert len(served) == 6
+
+
+def test_add_skips_near_duplicates(bank):
+    assert bank._add("doc", "Biology", "medium", [("cells", question("Which organelle produces the cellular energy?"))]) == 0
+    assert asyncio.run(bank.questions("doc", "Biology")) == [text for texts in QUESTIONS.values() for text in texts]
+
+
+def test_section_topics_prefer_distinctive_terms():
+    topics = section_topics(["Mitochondria produce energy for the cell", "Treaties ended the war in Europe"])
+    assert topics["Mitochondria produce energy for the cell"] != topics["Treaties ended the war in Europe"]
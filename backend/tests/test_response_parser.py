@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from app.models import QuizQuestion
+from app.response_parser import StreamingArrayParser, StreamingStringField, parse_items, parse_json_object
+
+
+def question(number: int) -> dict:
+    return {"question": f"Question {number}? {{braces}} and \"quotes\"", "options": ["A) a", "B) b"], "correct_answer": "A", "explanation": "ok"}
+
+
+COMPLETION = json.dumps({"questions": [question(1), question(2), question(3)]})
+
+
+def feed_in_chunks(parser, text: str, size: int) -> list:
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return items
+
+
+def test_parse_json_object_skips_reasoning_fences_and_prose():
+    text = '<think>maybe {"not": "this"}</think>Sure! Here it is:\n```json\n{"answer": 42,}\n```\nHope that helps {'
+    assert parse_json_object(text) == {"answer": 42}
+
+
+def test_parse_json_object_recovers_a_truncated_object():
+    truncated = COMPLETION[:COMPLETION.index("Question 3")]
+    assert parse_json_object(truncated) == {"questions": [question(1), question(2)]}
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "{{{{", '{"questions": [{"question": "cut', "]]}}"])
+def test_parse_json_object_gives_up_on_garbage(text):
+    assert parse_json_object(text) is None
+
+
+def test_parse_items_keeps_only_items_that_validate():
+    text = json.dumps({"questions": [question(1), {"question": "no options"}, "junk", question(2), question(3)]})
+    assert [item["question"] for item in parse_items(text, "questions", QuizQuestion)] == [question(1)["question"], question(2)["question"], question(3)["question"]]
+    assert len(parse_items(text, "questions", QuizQuestion, limit=2)) == 2
+    assert parse_items('{"cards": []}', "questions", QuizQuestion) is None
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, len(COMPLETION)])
+def test_streaming_array_parser_is_independent_of_chunking(size):
+    parser = StreamingArrayParser("questions")
+    assert feed_in_chunks(parser, "<think>plan {[\"questions\": [</think>" + COMPLETION + " trailing {}", size) == [question(1), question(2), question(3)]
+
+
+def test_streaming_array_parser_skips_garbled_items_and_stops_at_truncation():
+    text = '{"questions": [' + json.dumps(question(1)) + ', {"question": nope}, ' + json.dumps(question(2)) + ', {"question": "cut o'
+    parser = StreamingArrayParser("questions")
+    assert feed_in_chunks(parser, text, 5) == [question(1), question(2)]
+    assert parser.feed("ff") == []
+
+
+def test_streaming_array_parser_accepts_raw_newlines_inside_strings():
+    # Models often emit literal line breaks inside explanations; the non-streaming parser tolerates them too
+    raw = '{"question": "Which gas?", "options": ["O2", "CO2"], "correct_answer": "CO2", "explanation": "Plants take in\nCO2."}'
+    parser = StreamingArrayParser("questions")
+    items = feed_in_chunks(parser, '{"questions": [' + raw + "]}", 3)
+    assert items == [{"question": "Which gas?", "options": ["O2", "CO2"], "correct_answer": "CO2", "explanation": "Plants take in\nCO2."}]
+
+
+def test_streaming_string_field_decodes_escapes_split_across_deltas():
+    text = json.dumps({"summary_type": "short", "content": "Line one\nCafé \"quoted\" \\ done"}, ensure_ascii=True)
+    field = StreamingStringField("content")
+    decoded = "".join(field.feed(char) for char in text)
+    assert decoded == "Line one\nCafé \"quoted\" \\ done"
+    assert field.finished
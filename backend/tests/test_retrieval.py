@@ -0,0 +1,86 @@
+import asyncio
+import os
+
+import pytest
+
+from app.retrieval import RetrievalIndex, RetrievalIndexStore, index_terms, page_chunks
+
+PAGES = [
+    "Chapter 1 Cells\nThe cell membrane controls transport of molecules.",
+    "Mitochondria produce energy for the cell through respiration.",
+    "Chapter 2 Genetics\nDNA carries the genetic code in chromosomes.",
+    "Genes are copied into RNA before proteins are made.",
+    "Chapter 3 Ecology\nEcosystems cycle energy and nutrients between organisms.",
+]
+TEXT = "\n\n".join(PAGES)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RetrievalIndexStore(str(tmp_path / "index"), chunk_chars=200, top_k=2)
+
+
+def test_index_terms_drop_stopwords_but_keep_numbers():
+    assert index_terms("The Chapter 4 of a DNA primer") == ["chapter", "4", "dna", "primer"]
+
+
+def test_page_chunks_carry_page_numbers_and_zero_without_pages():
+    assert [page for page, _ in page_chunks(TEXT, PAGES, 200)] == [1, 2, 3, 4, 5]
+    assert {page for page, _ in page_chunks(TEXT, None, 200)} == {0}
+
+
+def test_search_ranks_matching_chunks_first(tmp_path):
+    RetrievalIndex.build(str(tmp_path), page_chunks(TEXT, PAGES, 200))
+    index = RetrievalIndex(str(tmp_path))
+    assert index.search("mitochondria energy", 5)[0] == 1
+    assert index.search("photosynthesis", 5) == []
+    assert index.page_range(2, 3) == [1, 2]
+
+
+def test_focus_selects_pages_sections_and_topics(store):
+    async def scenario():
+        by_pages = await store.focus(TEXT, PAGES, "pages 2-3")
+        by_section = await store.focus(TEXT, PAGES, "chapter 2")
+        by_topic = await store.focus(TEXT, PAGES, "RNA proteins")
+        with pytest.raises(ValueError, match="Nothing in the document matches"):
+            await store.focus(TEXT, PAGES, "photosynthesis")
+        return by_pages, by_section, by_topic
+
+    by_pages, by_section, by_topic = asyncio.run(scenario())
+    assert by_pages[1] == PAGES[1:3]
+    assert by_section[1] == PAGES[2:4]
+    assert PAGES[3] in by_topic[1]
+
+
+def test_text_only_index_is_not_reused_for_a_paged_request(store):
+    async def scenario():
+        await store.focus(TEXT, None, "energy")
+        return await store.focus(TEXT, PAGES, "pages 2-3")
+
+    assert asyncio.run(scenario())[1] == PAGES[1:3]
+    # The paged index also survives a restart, next to the text-only one
+    reopened = RetrievalIndexStore(store.directory, chunk_chars=200, top_k=2)
+    assert asyncio.run(reopened.focus(TEXT, PAGES, "page 5"))[1] == PAGES[4:]
+    assert len(os.listdir(store.directory)) == 2
+
+
+def test_failed_build_leaves_no_staging_directory(store, monkeypatch):
+    def build(directory, chunks):
+        raise ValueError("disk full of surprises")
+
+    monkeypatch.setattr(RetrievalIndex, "build", staticmethod(build))
+    with pytest.raises(ValueError):
+        asyncio.run(store.get(TEXT, PAGES))
+    assert os.listdir(store.directory) == []
+
+
+def test_least_recently_used_indexes_are_evicted(tmp_path):
+    store = RetrievalIndexStore(str(tmp_path), max_documents=2, open_indexes=1)
+
+    async def scenario():
+        for number in range(3):
+            await store.get(f"Document {number} about enzymes.")
+
+    asyncio.run(scenario())
+    assert len(os.listdir(str(tmp_path))) == 2
+    assert len(store._open) == 1
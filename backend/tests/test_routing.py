@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from app.routing import ModelRouter, Route
+from app.scheduler import UpstreamOverloaded
+
+PRIMARY = Route("primary", "Fast")
+BACKUP = Route("backup", "Slow")
+
+
+def make_router(warm: bool = True, **kwargs) -> ModelRouter:
+    options = {"min_samples": 2, "explore_ratio": 0, "hedge_min_delay": 0.01, "max_hedge_ratio": 1.0}
+    options.update(kwargs)
+    router = ModelRouter({"default": [PRIMARY, BACKUP]}, **options)
+    # Enough samples that PRIMARY ranks first and both routes can be hedged
+    for _ in range(2 if warm else 0):
+        router.record_success(PRIMARY, 0.01)
+        router.record_success(BACKUP, 0.02)
+    return router
+
+
+def fake_call(behaviour):
+    """A `call(route)` that runs behaviour[route.model] and logs which routes it was sent to"""
+    calls = []
+
+    async def call(route: Route):
+        calls.append(route.model)
+        return await behaviour[route.model]()
+
+    return call, calls
+
+
+def after(seconds: float, result: str):
+    async def respond():
+        await asyncio.sleep(seconds)
+        return result
+    return respond
+
+
+def failing(error: Exception):
+    async def respond():
+        raise error
+    return respond
+
+
+def test_hedge_wins_over_a_slow_primary():
+    async def scenario():
+        router = make_router()
+        call, calls = fake_call({"primary": after(1.0, "slow"), "backup": after(0, "fast")})
+        assert await router.run("quiz", call) == "fast"
+        assert calls == ["primary", "backup"]
+        assert router.counters["hedged"] == 1
+        assert router.counters["hedge_wins"] == 1
+        # The cancelled primary is neither a success nor a failure
+        assert router.routes[PRIMARY.name].requests == 2
+        assert router.routes[PRIMARY.name].errors == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_call_fails_over_to_the_next_route():
+    async def scenario():
+        router = make_router(max_hedge_ratio=0)
+        call, calls = fake_call({"primary": failing(RuntimeError("boom")), "backup": after(0, "ok")})
+        assert await router.run("quiz", call) == "ok"
+        assert calls == ["primary", "backup"]
+        assert router.counters["failovers"] == 1
+        assert router.routes[PRIMARY.name].errors == 1
+
+    asyncio.run(scenario())
+
+
+def test_last_route_error_is_raised():
+    async def scenario():
+        router = make_router(max_hedge_ratio=0)
+        call, calls = fake_call({"primary": failing(RuntimeError("first")), "backup": failing(ValueError("second"))})
+        with pytest.raises(ValueError):
+            await router.run("quiz", call)
+        assert calls == ["primary", "backup"]
+
+    asyncio.run(scenario())
+
+
+def test_failing_route_is_benched_during_cooldown():
+    async def scenario():
+        # Unsampled routes are tried first, so PRIMARY keeps getting calls until it is benched
+        router = make_router(warm=False, max_hedge_ratio=0, cooldown=60)
+        call, calls = fake_call({"primary": failing(RuntimeError("boom")), "backup": after(0, "ok")})
+        for _ in range(2):
+            assert await router.run("quiz", call) == "ok"
+        assert calls == ["primary", "backup"] * 2
+        assert not router.routes[PRIMARY.name].healthy()
+        assert router.candidates("quiz") == [BACKUP, PRIMARY]
+        calls.clear()
+        assert await router.run("quiz", call) == "ok"
+        assert calls == ["backup"]
+        assert router.stats()["routes"][PRIMARY.name]["healthy"] is False
+
+    asyncio.run(scenario())
+
+
+def test_hedge_budget_stops_extra_launches():
+    async def scenario():
+        router = make_router(max_hedge_ratio=0.5)
+        call, calls = fake_call({"primary": after(0.05, "primary"), "backup": after(0.5, "backup")})
+        assert await router.run("quiz", call) == "primary"
+        assert calls == ["primary", "backup"]
+        calls.clear()
+        # One hedge in two calls already uses the 50% budget
+        assert await router.run("quiz", call) == "primary"
+        assert calls == ["primary"]
+        assert router.counters == {"calls": 2, "hedged": 1, "hedge_wins": 0, "failovers": 0}
+
+    asyncio.run(scenario())
+
+
+def test_shed_calls_are_not_failed_over():
+    async def scenario():
+        router = make_router(max_hedge_ratio=0)
+        call, calls = fake_call({"primary": failing(UpstreamOverloaded("queue is full")), "backup": after(0, "ok")})
+        with pytest.raises(UpstreamOverloaded):
+            await router.run("quiz", call)
+        assert calls == ["primary"]
+        assert router.counters["failovers"] == 0
+        # Shedding says nothing about the route
+        assert router.routes[PRIMARY.name].errors == 0
+
+    asyncio.run(scenario())
+
+
+def test_pools_fall_back_to_their_parent():
+    router = ModelRouter({"default": [PRIMARY], "quiz": [BACKUP]})
+    assert router.pool("quiz_hard") == [BACKUP]
+    assert router.pool("summary_short") == [PRIMARY]
+    assert Route.parse(" qwen@Cerebras ").payload() == {"model": "qwen", "provider": {"only": ["Cerebras"]}}
@@ -0,0 +1,233 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.scheduler import CircuitBreaker, CircuitOpenError, TokenBucket, UpstreamOverloaded, UpstreamScheduler
+
+
+def tripped_breaker(reset_timeout: float = 0.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def upstream_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://upstream/v1/chat/completions")
+    return httpx.HTTPStatusError("upstream error", request=request, response=httpx.Response(status, request=request))
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_half_open_probe_success_closes():
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = tripped_breaker(reset_timeout=60)
+    breaker.opened_at -= 60
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_released_probe_lets_the_next_call_probe():
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_cancelled_probe_does_not_wedge_the_breaker():
+    async def scenario():
+        scheduler = UpstreamScheduler(rate=0, max_retries=0, breaker=tripped_breaker())
+        started = asyncio.Event()
+
+        async def slow_call():
+            started.set()
+            await asyncio.sleep(10)
+
+        probe = asyncio.create_task(scheduler.run("quiz", slow_call))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async def ok_call():
+            return "ok"
+
+        assert await scheduler.run("quiz", ok_call) == "ok"
+        assert scheduler.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_shed_probe_does_not_wedge_the_breaker():
+    async def scenario():
+        scheduler = UpstreamScheduler(rate=0, max_queue=0, breaker=tripped_breaker())
+
+        async def call():
+            return "ok"
+
+        with pytest.raises(UpstreamOverloaded):
+            await scheduler.run("quiz", call)
+        scheduler.max_queue = 10
+        assert await scheduler.run("quiz", call) == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_retried_probe_can_probe_again():
+    async def scenario():
+        scheduler = UpstreamScheduler(rate=0, max_retries=2, backoff_base=0, breaker=tripped_breaker())
+        attempts = []
+
+        async def flaky_call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise upstream_error(503)
+            return "ok"
+
+        assert await scheduler.run("quiz", flaky_call) == "ok"
+        assert len(attempts) == 2
+        assert scheduler.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_sheds_and_releases_held_slots():
+    async def scenario():
+        scheduler = UpstreamScheduler(rate=0, max_concurrency=1, endpoint_concurrency=2, queue_timeout=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("quiz"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        # Gets the endpoint slot, then times out waiting for the global one
+        with pytest.raises(UpstreamOverloaded):
+            async with scheduler.slot("quiz"):
+                pass
+        assert scheduler.counters["shed"] == 1
+        assert scheduler.waiting == 0
+        release.set()
+        await holder
+        async with scheduler.slot("quiz"):
+            assert scheduler.active == 1
+        assert scheduler._endpoint_semaphore("quiz")._value == 2
+
+    asyncio.run(scenario())
+
+
+def test_run_rejects_while_open():
+    async def scenario():
+        scheduler = UpstreamScheduler(rate=0, breaker=tripped_breaker(reset_timeout=60))
+
+        async def call():
+            return "ok"
+
+        with pytest.raises(CircuitOpenError):
+            await scheduler.run("quiz", call)
+        assert scheduler.counters["circuit_rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_exhausted_retries_record_a_failure():
+    async def scenario():
+        scheduler = UpstreamScheduler(rate=0, max_retries=1, backoff_base=0, breaker=CircuitBreaker(failure_threshold=1))
+
+        async def failing_call():
+            raise upstream_error(502)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await scheduler.run("quiz", failing_call)
+        assert scheduler.counters["retries"] == 1
+        assert scheduler.breaker.state == "open"
+
+    asyncio.run(scenario())
+
+
+def test_client_errors_are_not_retried():
+    async def scenario():
+        scheduler = UpstreamScheduler(rate=0, backoff_base=0)
+        attempts = []
+
+        async def bad_request():
+            attempts.append(1)
+            raise upstream_error(400)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await scheduler.run("quiz", bad_request)
+        assert len(attempts) == 1
+        assert scheduler.breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_client_error_during_half_open_does_not_close_the_breaker():
+    async def scenario():
+        scheduler = UpstreamScheduler(rate=0, backoff_base=0, breaker=tripped_breaker())
+
+        async def bad_request():
+            raise upstream_error(400)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await scheduler.run("quiz", bad_request)
+        assert scheduler.breaker.state == "half_open"
+        assert scheduler.breaker.failures == 2
+        # The probe slot is free again for the next caller
+        assert scheduler.breaker.allow()
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=3)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        burst = time.monotonic() - started
+        for _ in range(2):
+            await bucket.acquire()
+        return burst, time.monotonic() - started
+
+    burst, total = asyncio.run(scenario())
+    assert burst < 0.02
+    # Two more tokens at 50/s take about 40 ms
+    assert total >= 0.035
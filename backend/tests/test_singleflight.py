@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flights = SingleFlight()
+        runs = 0
+
+        async def work():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            return {"value": runs}
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)), flights.do("other", work))
+        return flights, runs, results
+
+    flights, runs, results = asyncio.run(scenario())
+    assert runs == 2
+    assert results[:5] == [results[0]] * 5
+    assert flights.stats() == {"calls": 6, "executions": 2, "coalesced": 4, "failures": 0, "abandoned": 0, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    async def scenario():
+        flights = SingleFlight()
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            await asyncio.sleep(0.01)
+            if attempts == 1:
+                raise RuntimeError("upstream down")
+            return "ok"
+
+        first = await asyncio.gather(flights.do("key", flaky), flights.do("key", flaky), return_exceptions=True)
+        second = await flights.do("key", flaky)
+        return flights, first, second
+
+    flights, first, second = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in first)
+    assert second == "ok"
+    assert flights.failures == 1
+
+
+def test_work_survives_a_cancelled_waiter_and_stops_with_the_last():
+    async def scenario():
+        flights = SingleFlight()
+        started = asyncio.Event()
+        release = asyncio.Event()
+        cancelled = False
+
+        async def work():
+            nonlocal cancelled
+            started.set()
+            try:
+                await release.wait()
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            return "done"
+
+        leaver = asyncio.ensure_future(flights.do("key", work))
+        stayer = asyncio.ensure_future(flights.do("key", work))
+        await started.wait()
+        leaver.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        result = await stayer
+        with pytest.raises(asyncio.CancelledError):
+            await leaver
+
+        release.clear()
+        started.clear()
+        alone = asyncio.ensure_future(flights.do("again", work))
+        await started.wait()
+        alone.cancel()
+        await asyncio.sleep(0.01)
+        return flights, result, cancelled
+
+    flights, result, cancelled = asyncio.run(scenario())
+    assert result == "done"
+    assert cancelled
+    assert flights.abandoned == 1
+    assert flights.in_flight == 0
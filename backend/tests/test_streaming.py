@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app.http_client import aclosing
+
+TEXT = "Photosynthesis converts light energy into chemical energy stored in glucose. " * 40
+
+
+def test_closing_a_stream_early_releases_the_upstream_slot(make_ai_service):
+    async def scenario():
+        service = make_ai_service()
+        await service.startup()
+        try:
+            stream = service.stream_quiz(TEXT, 5, "Biology", "easy", use_cache=False)
+            first = await stream.__anext__()
+            assert first["event"] == "question"
+            assert service.scheduler.active == 1
+            # A client disconnect closes the outermost generator only
+            await stream.aclose()
+            assert service.scheduler.active == 0
+        finally:
+            await service.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_stream_stops_reading_once_enough_items_arrived(make_ai_service):
+    async def scenario():
+        service = make_ai_service()
+        await service.startup()
+        try:
+            events = [event async for event in service.stream_flashcards(TEXT, 2, "Biology", "fact", use_cache=False)]
+        finally:
+            await service.shutdown()
+        assert [event["index"] for event in events] == [0, 1]
+        assert service.scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_aclosing_closes_the_generator_when_the_block_raises():
+    closed = []
+
+    async def numbers():
+        try:
+            yield 1
+            yield 2
+        finally:
+            closed.append(True)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            async with aclosing(numbers()) as stream:
+                async for number in stream:
+                    raise ValueError(number)
+        # Closed on exit from the block, not later by loop shutdown
+        assert closed == [True]
+
+    asyncio.run(scenario())
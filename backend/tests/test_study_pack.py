@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.models import FlashcardResponse, SummaryResponse
+from app.scheduler import UpstreamOverloaded
+
+TEXT = "Photosynthesis converts light energy into chemical energy stored in glucose. " * 20
+
+
+@pytest.fixture
+def main(monkeypatch, tmp_path):
+    """The API module with the study pack's artifact builders replaced by fakes"""
+    monkeypatch.setenv("LLM_API_URL", "http://127.0.0.1:9/v1/chat/completions")
+    monkeypatch.setenv("QUESTION_BANK_PATH", str(tmp_path / "bank.sqlite3"))
+    monkeypatch.setenv("RETRIEVAL_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.delenv("API_KEY", raising=False)
+    from app import main
+
+    async def summary(text_content, pages, summary_type, *args):
+        return SummaryResponse(summary="Plants make glucose.", tags=["biology"], summary_type=summary_type, word_count=3)
+
+    async def flashcards(text_content, pages, num_cards, subject, card_type, *args):
+        return FlashcardResponse(flashcards=[{"front": "ATP?", "back": "Energy carrier"}], total_cards=1, subject=subject, card_type=card_type)
+
+    monkeypatch.setattr(main, "build_summary", summary)
+    monkeypatch.setattr(main, "build_flashcards", flashcards)
+    return main
+
+
+def failing(error: Exception):
+    async def build(*args):
+        raise error
+    return build
+
+
+def post(main, path: str, **form) -> httpx.Response:
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, data={"text_content": TEXT, **form})
+    return asyncio.run(scenario())
+
+
+def test_failed_artifact_is_reported_while_the_others_are_returned(main, monkeypatch):
+    monkeypatch.setattr(main, "document_quiz", failing(ValueError("quiz did not parse")))
+    response = post(main, "/generate-study-pack", summary_type="short")
+    assert response.status_code == 200
+    pack = response.json()
+    assert pack["summary"]["summary"] == "Plants make glucose."
+    assert pack["flashcards"]["total_cards"] == 1
+    assert pack["quiz"] is None
+    assert pack["errors"] == {"quiz": "quiz did not parse"}
+
+
+def test_only_requested_artifacts_are_built(main, monkeypatch):
+    monkeypatch.setattr(main, "document_quiz", failing(AssertionError("not requested")))
+    pack = post(main, "/generate-study-pack", artifacts="flashcards, summary,summary").json()
+    assert pack["quiz"] is None and pack["errors"] == {}
+    assert post(main, "/generate-study-pack", artifacts="summary,exam").status_code == 400
+
+
+def test_pack_fails_only_when_every_artifact_failed(main, monkeypatch):
+    monkeypatch.setattr(main, "build_summary", failing(ValueError("bad summary")))
+    monkeypatch.setattr(main, "document_quiz", failing(UpstreamOverloaded("queue is full", 5.0)))
+    response = post(main, "/generate-study-pack", artifacts="summary,quiz")
+    assert response.status_code == 500
+    assert "summary: bad summary" in response.json()["detail"]
+    assert "quiz: queue is full" in response.json()["detail"]
+
+
+def test_pack_is_shed_with_503_when_every_artifact_was_shed(main, monkeypatch):
+    monkeypatch.setattr(main, "build_flashcards", failing(UpstreamOverloaded("queue is full", 5.0)))
+    monkeypatch.setattr(main, "document_quiz", failing(UpstreamOverloaded("queue is full", 5.0)))
+    response = post(main, "/generate-study-pack", artifacts="quiz,flashcards")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+def test_stream_reports_the_failed_artifact_and_ends_with_the_pack(main, monkeypatch):
+    monkeypatch.setattr(main, "document_quiz", failing(ValueError("quiz did not parse")))
+    response = post(main, "/generate-study-pack/stream")
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert {event["artifact"] for event in events if event["event"] == "artifact"} == {"summary", "flashcards"}
+    assert [event for event in events if event["event"] == "artifact_error"] == [
+        {"event": "artifact_error", "artifact": "quiz", "detail": "quiz did not parse"}
+    ]
+    done = events[-1]
+    assert done["event"] == "done"
+    assert done["data"]["errors"] == {"quiz": "quiz did not parse"}
+    assert done["data"]["summary"]["tags"] == ["biology"]
@@ -47,9 +47,11 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
   // State management
   const [file, setFile] = useState<File | null>(null)
   const [textContent, setTextContent] = useState<string>('')
+  const [documentId, setDocumentId] = useState<string>('')
   const [pastedText, setPastedText] = useState<string>('')
   const [flashcardPdfFile, setFlashcardPdfFile] = useState<File | null>(null)
   const [flashcardPdfContent, setFlashcardPdfContent] = useState<string>('')
+  const [flashcardDocumentId, setFlashcardDocumentId] = useState<string>('')
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string>('')
   const [summary, setSummary] = useState<SummaryResponse | null>(null)
@@ -83,17 +85,21 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
       return
     }
 
+    // Picking the same file again uploads a new version of the current document
+    const previousDocumentId = file?.name === selectedFile.name && documentId ? documentId : undefined
+
     setFile(selectedFile)
     setError('')
     setLoading(true)
 
     try {
       console.log('📡 Starting PDF upload to backend...')
-      const result = await api.uploadPDF(selectedFile)
+      const result = await api.uploadPDF(selectedFile, previousDocumentId)
       console.log('✅ PDF upload successful:', result)
       console.log('📝 Text content length:', result.text_content?.length)
       
       setTextContent(result.text_content)
+      setDocumentId(result.document_id)
       setCurrentStep('configure')
     } catch (err) {
       console.error('❌ PDF upload failed:', err)
@@ -105,7 +111,7 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
     } finally {
       setLoading(false)
     }
-  }, [])
+  }, [file, documentId])
 
   const handleGenerate = useCallback(async () => {
     console.log('🔥 Generate button clicked!')
@@ -123,20 +129,25 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
 
     try {
       console.log('📡 Making API calls to backend...')
-      // Generate summary and quiz in parallel
-      const [summaryResult, quizResult] = await Promise.all([
-        api.generateSummary(textContent, formData.summaryType, formData.subject),
-        api.generateQuiz(
-          textContent, 
-          formData.numQuestions, 
-          formData.subject, 
-          formData.difficulty
-        )
-      ])
-
-      console.log('✅ API calls successful:', { summaryResult, quizResult })
-      setSummary(summaryResult)
-      setQuiz(quizResult)
+      // Reference the server-side copy of an uploaded PDF instead of re-sending its text
+      const source = documentId ? { documentId, textContent } : textContent
+      // Generate summary and quiz concurrently in a single request
+      const pack = await api.generateStudyPack(source, ['summary', 'quiz'], {
+        subject: formData.subject,
+        summaryType: formData.summaryType,
+        numQuestions: formData.numQuestions,
+        difficulty: formData.difficulty
+      })
+
+      console.log('✅ API calls successful:', pack)
+      const failed = Object.entries(pack.errors)
+      if (failed.length > 0) {
+        console.warn('⚠️ Some artifacts failed:', pack.errors)
+        // The rest of the pack is still shown; say which part is missing and why
+        setError(`Some content could not be generated (${failed.map(([artifact, detail]) => `${artifact}: ${detail}`).join('; ')})`)
+      }
+      setSummary(pack.summary)
+      setQuiz(pack.quiz)
       setCurrentStep('results')
       setUserAnswers([])
       setQuizResult(null)
@@ -149,7 +160,7 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
     } finally {
       setLoading(false)
     }
-  }, [textContent, formData, router])
+  }, [textContent, documentId, formData, router])
 
   const handleAnswerSelect = useCallback((questionIndex: number, selectedOption: string) => {
     setUserAnswers(prev => {
@@ -170,21 +181,53 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
       })
 
       const correctAnswers = quiz.questions.map(q => q.correct_answer)
-      const result = await api.checkAnswers(answers, correctAnswers)
+      const bank = documentId && quiz.question_ids
+        ? { documentId, questionIds: quiz.question_ids }
+        : undefined
+      const result = await api.checkAnswers(answers, correctAnswers, bank)
       setQuizResult(result)
     } catch (err) {
       setError(err instanceof APIError ? err.message : 'Failed to check answers')
     } finally {
       setLoading(false)
     }
-  }, [quiz, userAnswers])
+  }, [quiz, userAnswers, documentId])
+
+  // A fresh quiz from the document's question bank, leaving out the questions just answered
+  const handleNewQuestions = useCallback(async () => {
+    if (!quiz || !documentId) return
+
+    setLoading(true)
+    setError('')
+
+    try {
+      const nextQuiz = await api.generateQuiz(
+        { documentId, textContent },
+        formData.numQuestions,
+        formData.subject,
+        formData.difficulty,
+        quizResult?.score,
+        quiz.question_ids ?? undefined
+      )
+      setQuiz(nextQuiz)
+      setQuizResult(null)
+      setUserAnswers([])
+      setCurrentQuestionIndex(0)
+    } catch (err) {
+      setError(err instanceof APIError ? err.message : 'Failed to generate quiz')
+    } finally {
+      setLoading(false)
+    }
+  }, [quiz, quizResult, documentId, textContent, formData])
 
   const resetApp = useCallback(() => {
     setFile(null)
     setTextContent('')
+    setDocumentId('')
     setPastedText('')
     setFlashcardPdfFile(null)
     setFlashcardPdfContent('')
+    setFlashcardDocumentId('')
     setSummary(null)
     setQuiz(null)
     setFlashcards(null)
@@ -204,6 +247,7 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
     setPastedText('')
     setFlashcardPdfFile(null)
     setFlashcardPdfContent('')
+    setFlashcardDocumentId('')
     setError('')
   }, [])
 
@@ -503,6 +547,7 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
                 onClick={() => {
                   console.log('📝 Loading sample text...');
                   setTextContent('Photosynthesis is the process by which plants, algae, and some bacteria convert light energy, usually from the sun, into chemical energy stored in glucose. This process occurs in two main stages: the light-dependent reactions and the Calvin cycle. The light-dependent reactions take place in the thylakoid membranes of chloroplasts. During this stage, chlorophyll absorbs light energy, which excites electrons. These high-energy electrons are passed through an electron transport chain, ultimately producing ATP and NADPH. Oxygen is released as a byproduct when water molecules are split. The Calvin cycle occurs in the stroma of chloroplasts. In this stage, carbon dioxide from the atmosphere is fixed into organic molecules using the ATP and NADPH produced in the light-dependent reactions. The key enzyme in this process is RuBisCO.');
+                  setDocumentId('');
                   setCurrentStep('configure');
                 }}
                 className="text-sm"
@@ -582,6 +627,7 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
                           try {
                             const result = await api.uploadPDF(selectedFile)
                             setFlashcardPdfContent(result.text_content)
+                            setFlashcardDocumentId(result.document_id)
                           } catch (err) {
                             setError(err instanceof Error ? err.message : 'Failed to upload PDF')
                           } finally {
@@ -704,6 +750,7 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
                           onClick={() => {
                             setFlashcardPdfFile(null)
                             setFlashcardPdfContent('')
+                            setFlashcardDocumentId('')
                             setFlashcards(null)
                           }}
                         >
@@ -718,7 +765,9 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
 
                             try {
                               const flashcardsResult = await api.generateFlashcards(
-                                flashcardPdfContent,
+                                flashcardDocumentId
+                                  ? { documentId: flashcardDocumentId, textContent: flashcardPdfContent }
+                                  : flashcardPdfContent,
                                 formData.numCards,
                                 formData.subject,
                                 formData.cardType
@@ -1050,6 +1099,7 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
 
                         // Set the text content and move to configure step
                         setTextContent(pastedText.trim())
+                        setDocumentId('')
                         setCurrentStep('configure')
                         router.push('/upload?step=configure')
                       }}
@@ -1753,6 +1803,16 @@ export default function QuizForgeApp({ initialStep = 'upload' }: QuizForgeAppPro
                           <RotateCcw className="h-4 w-4 mr-2" />
                           Retake Quiz
                         </Button>
+                        {documentId && quiz.question_ids && (
+                          <Button
+                            variant="outline"
+                            onClick={handleNewQuestions}
+                            disabled={loading}
+                            className="flex-1"
+                          >
+                            New Questions
+                          </Button>
+                        )}
                         <Button onClick={resetApp} className="flex-1">
                           Create New Quiz
                         </Button>
@@ -1,12 +1,16 @@
 import { 
   PDFUploadResponse, 
+  BatchUploadResponse, 
   SummaryResponse, 
   QuizResponse, 
   QuizResult, 
   SummaryType, 
   Difficulty,
   FlashcardResponse,
-  CardType
+  CardType,
+  DocumentSource,
+  StudyPackArtifact,
+  StudyPackResponse
 } from '@/types';
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
@@ -18,10 +22,44 @@ class APIError extends Error {
   }
 }
 
+// Posts a generation form for a document source. A stored document that has
+// expired (404) is retried once with the raw text when the caller has it.
+async function postWithSource(
+  path: string,
+  source: DocumentSource,
+  buildForm: () => FormData
+): Promise<Response> {
+  const send = (useDocumentId: boolean) => {
+    const formData = buildForm();
+    if (typeof source === 'string') {
+      formData.append('text_content', source);
+    } else if (useDocumentId) {
+      formData.append('document_id', source.documentId);
+    } else if (source.textContent) {
+      formData.append('text_content', source.textContent);
+    }
+    return fetch(`${API_BASE_URL}${path}`, {
+      method: 'POST',
+      body: formData,
+    });
+  };
+
+  const response = await send(true);
+  if (response.status === 404 && typeof source !== 'string' && source.textContent) {
+    return send(false);
+  }
+  return response;
+}
+
 export const api = {
-  async uploadPDF(file: File): Promise<PDFUploadResponse> {
+  // previousDocumentId names the version this upload replaces: unchanged
+  // pages are reused and the response reports which pages changed.
+  async uploadPDF(file: File, previousDocumentId?: string): Promise<PDFUploadResponse> {
     const formData = new FormData();
     formData.append('file', file);
+    if (previousDocumentId) {
+      formData.append('previous_document_id', previousDocumentId);
+    }
 
     const response = await fetch(`${API_BASE_URL}/upload-pdf`, {
       method: 'POST',
@@ -36,23 +74,41 @@ export const api = {
     return response.json();
   },
 
-  async generateSummary(
-    textContent: string,
-    summaryType: SummaryType,
-    subject?: string
-  ): Promise<SummaryResponse> {
+  // Many PDFs and/or zip archives of PDFs in one request; per-file failures
+  // are reported in the result rather than failing the whole batch.
+  async uploadPDFs(files: File[]): Promise<BatchUploadResponse> {
     const formData = new FormData();
-    formData.append('text_content', textContent);
-    formData.append('summary_type', summaryType);
-    if (subject) {
-      formData.append('subject', subject);
+    for (const file of files) {
+      formData.append('files', file);
     }
 
-    const response = await fetch(`${API_BASE_URL}/generate-summary`, {
+    const response = await fetch(`${API_BASE_URL}/upload-pdfs`, {
       method: 'POST',
       body: formData,
     });
 
+    if (!response.ok) {
+      const error = await response.text();
+      throw new APIError(`Failed to upload PDFs: ${error}`, response.status);
+    }
+
+    return response.json();
+  },
+
+  async generateSummary(
+    source: DocumentSource,
+    summaryType: SummaryType,
+    subject?: string
+  ): Promise<SummaryResponse> {
+    const response = await postWithSource('/generate-summary', source, () => {
+      const formData = new FormData();
+      formData.append('summary_type', summaryType);
+      if (subject) {
+        formData.append('subject', subject);
+      }
+      return formData;
+    });
+
     if (!response.ok) {
       const error = await response.text();
       throw new APIError(`Failed to generate summary: ${error}`, response.status);
@@ -62,37 +118,96 @@ export const api = {
   },
 
   async generateQuiz(
-    textContent: string,
+    source: DocumentSource,
     numQuestions: number,
     subject: string,
     difficulty: Difficulty,
-    previousScore?: number
+    previousScore?: number,
+    excludeQuestionIds?: number[]
   ): Promise<QuizResponse> {
-    const formData = new FormData();
-    formData.append('text_content', textContent);
-    formData.append('num_questions', numQuestions.toString());
-    formData.append('subject', subject);
-    formData.append('difficulty', difficulty);
-    if (previousScore !== undefined) {
-      formData.append('previous_score', previousScore.toString());
+    const response = await postWithSource('/generate-quiz', source, () => {
+      const formData = new FormData();
+      formData.append('num_questions', numQuestions.toString());
+      formData.append('subject', subject);
+      formData.append('difficulty', difficulty);
+      if (previousScore !== undefined) {
+        formData.append('previous_score', previousScore.toString());
+      }
+      // Keeps a retake from repeating the previous bank quiz's questions
+      excludeQuestionIds?.forEach((id) => {
+        formData.append('exclude_question_ids', id.toString());
+      });
+      return formData;
+    });
+
+    if (!response.ok) {
+      const error = await response.text();
+      throw new APIError(`Failed to generate quiz: ${error}`, response.status);
     }
 
-    const response = await fetch(`${API_BASE_URL}/generate-quiz`, {
-      method: 'POST',
-      body: formData,
+    return response.json();
+  },
+
+  // One request for several artifacts of the same document; the backend
+  // generates them concurrently and reports failed ones in `errors`.
+  async generateStudyPack(
+    source: DocumentSource,
+    artifacts: StudyPackArtifact[],
+    options: {
+      subject?: string;
+      summaryType?: SummaryType;
+      numQuestions?: number;
+      difficulty?: Difficulty;
+      previousScore?: number;
+      excludeQuestionIds?: number[];
+      numCards?: number;
+      cardType?: CardType;
+    }
+  ): Promise<StudyPackResponse> {
+    const response = await postWithSource('/generate-study-pack', source, () => {
+      const formData = new FormData();
+      formData.append('artifacts', artifacts.join(','));
+      if (options.subject) {
+        formData.append('subject', options.subject);
+      }
+      if (options.summaryType) {
+        formData.append('summary_type', options.summaryType);
+      }
+      if (options.numQuestions !== undefined) {
+        formData.append('num_questions', options.numQuestions.toString());
+      }
+      if (options.difficulty) {
+        formData.append('difficulty', options.difficulty);
+      }
+      if (options.previousScore !== undefined) {
+        formData.append('previous_score', options.previousScore.toString());
+      }
+      options.excludeQuestionIds?.forEach((id) => {
+        formData.append('exclude_question_ids', id.toString());
+      });
+      if (options.numCards !== undefined) {
+        formData.append('num_cards', options.numCards.toString());
+      }
+      if (options.cardType) {
+        formData.append('card_type', options.cardType);
+      }
+      return formData;
     });
 
     if (!response.ok) {
       const error = await response.text();
-      throw new APIError(`Failed to generate quiz: ${error}`, response.status);
+      throw new APIError(`Failed to generate study pack: ${error}`, response.status);
     }
 
     return response.json();
   },
 
+  // With the quiz's question_ids and document id the attempt also updates
+  // the question bank's per-question statistics.
   async checkAnswers(
     userAnswers: string[],
-    correctAnswers: string[]
+    correctAnswers: string[],
+    bank?: { documentId: string; questionIds: number[] }
   ): Promise<QuizResult> {
     const formData = new FormData();
     userAnswers.forEach((answer) => {
@@ -101,6 +216,12 @@ export const api = {
     correctAnswers.forEach((answer) => {
       formData.append('correct_answers', answer);
     });
+    if (bank) {
+      formData.append('document_id', bank.documentId);
+      bank.questionIds.forEach((id) => {
+        formData.append('question_ids', id.toString());
+      });
+    }
 
     const response = await fetch(`${API_BASE_URL}/check-answers`, {
       method: 'POST',
@@ -126,20 +247,17 @@ export const api = {
   },
 
   async generateFlashcards(
-    textContent: string,
+    source: DocumentSource,
     numCards: number,
     subject: string,
     cardType: CardType
   ): Promise<FlashcardResponse> {
-    const formData = new FormData();
-    formData.append('text_content', textContent);
-    formData.append('num_cards', numCards.toString());
-    formData.append('subject', subject);
-    formData.append('card_type', cardType);
-
-    const response = await fetch(`${API_BASE_URL}/generate-flashcards`, {
-      method: 'POST',
-      body: formData,
+    const response = await postWithSource('/generate-flashcards', source, () => {
+      const formData = new FormData();
+      formData.append('num_cards', numCards.toString());
+      formData.append('subject', subject);
+      formData.append('card_type', cardType);
+      return formData;
     });
 
     if (!response.ok) {
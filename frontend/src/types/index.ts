@@ -18,6 +18,8 @@ export interface QuizResponse {
   difficulty: string;
   subject: string;
   estimated_time: number;
+  // Set when the quiz was assembled from a stored document's question bank
+  question_ids?: number[] | null;
 }
 
 export interface QuizResult {
@@ -31,10 +33,48 @@ export interface QuizResult {
 
 export interface PDFUploadResponse {
   filename: string;
+  document_id: string;
   text_content: string;
   word_count: number;
+  page_count?: number;
+  reused_pages?: number;
+  changes?: DocumentChanges | null;
 }
 
+// Page diff against the version named by previous_document_id
+export interface DocumentChanges {
+  previous_document_id: string;
+  unchanged_pages: number;
+  changed_pages: number[];
+  added_pages: number[];
+  removed_pages: number;
+}
+
+export interface BatchUploadFileResult {
+  filename: string;
+  status: 'ok' | 'duplicate' | 'error';
+  document_id?: string;
+  page_count?: number;
+  word_count?: number;
+  sha256?: string;
+  duplicate_of?: string;
+  error?: string;
+  timings?: Record<string, number>;
+}
+
+export interface BatchUploadResponse {
+  files: BatchUploadFileResult[];
+  ingested: number;
+  duplicates: number;
+  failed: number;
+  timings: { total_ms: number };
+}
+
+// Generation calls either send the text itself or reference a document
+// already stored server-side; the text is kept as a fallback for when the
+// stored document has been evicted.
+export type DocumentSource = string | { documentId: string; textContent?: string };
+
 export type SummaryType = 'short' | 'bullet_points' | 'detailed';
 export type Difficulty = 'easy' | 'medium' | 'hard';
 
@@ -63,4 +103,13 @@ export interface FlashcardResponse {
   card_type: string;
 }
 
-export type CardType = 'definition' | 'concept' | 'fact' | 'mixed'; 
\ No newline at end of file
+export type CardType = 'definition' | 'concept' | 'fact' | 'mixed';
+
+export type StudyPackArtifact = 'summary' | 'quiz' | 'flashcards';
+
+export interface StudyPackResponse {
+  summary: SummaryResponse | null;
+  quiz: QuizResponse | null;
+  flashcards: FlashcardResponse | null;
+  errors: Partial<Record<StudyPackArtifact, string>>;
+} 
\ No newline at end of file